@@ -1,22 +1,32 @@
-
 import sys
 import os
+import multiprocessing
 
 project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-try:
-    from src.app import main as run_app
-except ImportError as e:
-    print("Error: Could not import the application.")
-    print(f"Attempted to load from: {project_root}")
-    print("Ensure 'src' directory exists under '{APP_DIR_NAME}' and contains all modules.")
-    print(f"Details: {e}")
-    sys.exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred during import: {e}")
-    sys.exit(1)
+def run_cli(argv):
+    # Subcommands go to the headless CLI, which never imports the Tk app
+    from src.cli import main as cli_main
+    return cli_main(argv)
+
+def load_app():
+    try:
+        from src.app import main as run_app
+    except ImportError as e:
+        print("Error: Could not import the application.")
+        print(f"Attempted to load from: {project_root}")
+        print("Ensure 'src' directory exists under '{APP_DIR_NAME}' and contains all modules.")
+        print(f"Details: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred during import: {e}")
+        sys.exit(1)
+    return run_app
 
 if __name__ == "__main__":
-    run_app()
+    multiprocessing.freeze_support() # Background statistics run in worker processes, also in bundled builds
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    load_app()()
@@ -0,0 +1,61 @@
+# HyperPomo/src/analytics.py
+# Long-running statistics over the whole history. Every job is a plain module-level function of
+# snapshots (lists of dicts) returning plain data, so it can run in a worker process.
+import datetime
+
+from . import session_log as sl
+from .session_index import open_index
+
+def long_term_stats(session_log, work_duration):
+    days = {}
+    for entry in session_log:
+        date_str = entry.get("session_for_date")
+        if date_str: days.setdefault(date_str, []).append(entry)
+    return _stats_from_days({date_str: sl.summarize_entries(entries, work_duration) for date_str, entries in days.items()})
+
+def long_term_stats_from_index(log_path, index_path, work_duration):
+    # Same result as long_term_stats() over the log on disk, read through the session index
+    with open_index(log_path, index_path) as index:
+        span = index.date_span()
+        days = index.day_summaries(*span, work_duration) if span else {}
+    return _stats_from_days({datetime.date.fromordinal(day).isoformat(): summary for day, summary in days.items()})
+
+def _stats_from_days(days):
+    # days: date string -> summarize_entries() result, for the days with entries
+    totals = {"pomodoros": 0, "focus_minutes": 0.0, "break_minutes": 0.0, "skipped": 0}
+    by_year, by_month = {}, {}
+    best_day = None
+    active_dates = []
+    for date_str in sorted(days):
+        summary = days[date_str]
+        for key in totals: totals[key] += summary[key]
+        for bucket, key in ((by_year, date_str[:4]), (by_month, date_str[:7])):
+            period = bucket.setdefault(key, {"pomodoros": 0, "focus_minutes": 0.0, "active_days": 0})
+            period["pomodoros"] += summary["pomodoros"]
+            period["focus_minutes"] += summary["focus_minutes"]
+            if summary["pomodoros"]: period["active_days"] += 1
+        if summary["pomodoros"]:
+            active_dates.append(datetime.date.fromisoformat(date_str))
+            if best_day is None or summary["focus_minutes"] > best_day["focus_minutes"]:
+                best_day = {"date": date_str, "pomodoros": summary["pomodoros"], "focus_minutes": summary["focus_minutes"]}
+
+    longest_streak = current_streak = 0
+    run = 0
+    previous = None
+    for day in active_dates:
+        run = run + 1 if previous and (day - previous).days == 1 else 1
+        longest_streak = max(longest_streak, run)
+        previous = day
+    if previous and (datetime.date.today() - previous).days <= 1:
+        current_streak = run # A streak still counts until the end of the day after its last session
+
+    return {
+        "totals": totals,
+        "active_days": len(active_dates),
+        "average_focus_minutes": totals["focus_minutes"] / len(active_dates) if active_dates else 0.0,
+        "best_day": best_day,
+        "longest_streak": longest_streak,
+        "current_streak": current_streak,
+        "by_year": by_year,
+        "by_month": by_month,
+    }
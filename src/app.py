@@ -5,9 +5,25 @@ import time
 import os
 import datetime
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from .config_manager import ConfigManager
 from .task_manager import TaskManager, Task
+from .paths import resource_path
+from .timer import PomodoroTimer
+from .control import ControlServer, default_socket_path
+from .file_watcher import FileWatcher
+from .sync import SyncManager
+from . import session_log as sl
+from . import analytics
+from . import planner
+from . import export as ex
+from .day_index import month_activity
+from .daily_summary import DailySummary, SummaryView
+from . import recurrence as rec
+from .tags import parse_tags, format_tags, normalize_tags
+from .jobs import JobRunner
+from . import session_index
 
 TKCALENDAR_AVAILABLE = False
 try:
@@ -23,22 +39,29 @@ try:
 except ImportError:
     print("Warning: 'playsound' module not found. Sound notifications will be disabled.")
 
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        # Not running in a PyInstaller bundle
-        # Path relative to this app.py file (which is in src/)
-        # We want the parent of src/, which is the application root (HyperPomo/)
-        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-    return os.path.join(base_path, relative_path)
+def _timer_state(name):
+    # PomodoroApp keeps its old attribute names; the state itself lives on the shared PomodoroTimer
+    return property(lambda self: getattr(self.timer, name),
+                    lambda self, value: setattr(self.timer, name, value))
+
+def _blend(color_a, color_b, amount):
+    # "#rrggbb" colour amount (0..1) of the way from color_a to color_b
+    a = [int(color_a[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(color_b[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * amount):02x}" for x, y in zip(a, b))
 
 class PomodoroApp:
-    WORK = "Work"
-    SHORT_BREAK = "Short Break"
-    LONG_BREAK = "Long Break"
+    WORK = PomodoroTimer.WORK
+    SHORT_BREAK = PomodoroTimer.SHORT_BREAK
+    LONG_BREAK = PomodoroTimer.LONG_BREAK
+
+    current_session_type = _timer_state("current_session_type")
+    pomodoros_completed_cycle = _timer_state("pomodoros_completed_cycle")
+    is_running = _timer_state("is_running")
+    paused = _timer_state("paused")
+    time_left = _timer_state("time_left")
+    current_task_id = _timer_state("current_task_id")
+    session_log = _timer_state("session_log")
 
     COLOR_BG = "#2D323B" 
     COLOR_FG = "#E0E0E0" 
@@ -60,6 +83,16 @@ class PomodoroApp:
     COLOR_CALENDAR_HEADER = "#4A505A"
     COLOR_CALENDAR_WEEKEND = "#FF7070" 
 
+    EXTERNAL_CHANGE_POLL_MS = 3000 # Used only where inotify isn't available
+    DUE_SOON_DAYS = 2 # Rows due today through this many days ahead are highlighted
+    CALENDAR_FOCUS_LEVELS = (1, 4, 8) # Pomodoros' worth of focus at which a day's marker gets a shade deeper
+    LOAD_POLL_MS = 20 # How often the Tk loop checks on the startup loaders
+    TASK_PAGE_SIZE = 100 # Task rows are created a page at a time, as the list is scrolled towards its end
+    SUMMARY_TASK_LIMIT = 50 # Active tasks listed by name in the daily summary
+    ALL_TAGS = "All tags"
+    REPEAT_CHOICES = {"No repeat": None, "Daily": rec.DAILY, "Weekdays": rec.WEEKDAYS,
+                      "Weekly": rec.WEEKLY, "Every N days...": rec.INTERVAL}
+
     def __init__(self, root):
         self.root = root
         self.root.title("HyperPomo") 
@@ -70,17 +103,27 @@ class PomodoroApp:
         # for specific assets, you could define it:
         # self.app_root_path = resource_path("") # Gets the root bundle/script directory
 
+        # Only settings are read before the window is built; tasks and sessions load on worker
+        # threads meanwhile (see _start_loading_data) and fill in the window when they arrive
         self.config_manager = ConfigManager(data_dir=resource_path("data"))
-        self.task_manager = TaskManager(self.config_manager)
-        self.session_log = self.config_manager.load_session_log()
-
-        self.current_session_type = self.WORK
-        self.pomodoros_completed_cycle = 0
-        self.is_running = False
-        self.paused = False
-        self.time_left = self.config_manager.get("work_duration") * 60
+        self.task_manager = TaskManager(self.config_manager, load=False)
+        self.timer = PomodoroTimer(self.config_manager, self.task_manager, session_log=[])
+        self._data_loaded = False
+        self._start_loading_data()
+        self.jobs = JobRunner(self.root.after)
+        self._estimate_set_by_user = False
+        self._suggestion_after_id = None
+        self._expanded_task_ids = set() # Parent rows the user has opened, kept open across refreshes
+        self._task_rows = [] # Top-level tasks of the list, filtered and sorted; only a prefix has Treeview rows
+        self._task_rows_shown = 0
+        self._task_items = {} # Task id -> Treeview item, for rows created so far
+        self._listed_keys = {} # Task id -> _task_view_key() for every listed task, shown or not yet paged in
+        self._tree_query = None # TaskQuery the list shows
+        self._task_list_tag = None
+        self._session_index_job = None
+        self._task_sort = None # (column, descending) or None for the natural order
+
         self.timer_id = None
-        self.current_task_id = None
         self.always_on_top_var = tk.BooleanVar(value=self.config_manager.get("always_on_top", False))
         self.selected_calendar_date = datetime.date.today() 
 
@@ -88,11 +131,59 @@ class PomodoroApp:
         self._setup_styles()
         self._setup_ui() 
         self.update_timer_display()
-        self.refresh_task_list_and_daily_summary() 
+        self._show_loading_state()
         self.update_always_on_top()
-        self._bind_shortcuts()
         self.update_current_datetime_display() 
 
+    def _start_loading_data(self):
+        # The task snapshot/journal and the session log are independent files, read side by side.
+        # Nothing touches task_manager or the session log until _finish_loading_data has run.
+        self._loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hyperpomo-load")
+        self._tasks_loaded = self._loader.submit(self.task_manager.load)
+        self._sessions_loaded = self._loader.submit(self.config_manager.load_session_log, False)
+        self.root.after(self.LOAD_POLL_MS, self._poll_data_loading)
+
+    def _show_loading_state(self):
+        self.task_tree.heading("text", text="Loading tasks...")
+        for widget in (self.task_entry, self.add_task_button, self.start_button):
+            widget.config(state=tk.DISABLED)
+
+    def _poll_data_loading(self):
+        if self._tasks_loaded.done() and self._sessions_loaded.done():
+            self._finish_loading_data()
+        else:
+            self.root.after(self.LOAD_POLL_MS, self._poll_data_loading)
+
+    def _finish_loading_data(self):
+        self._loader.shutdown(wait=False)
+        self._tasks_loaded.result() # Re-raises a loader error here, on the Tk thread
+        self.timer.session_log = self._sessions_loaded.result()
+        self.timer.session_log_changed()
+        self._data_loaded = True
+        for widget in (self.task_entry, self.add_task_button, self.start_button):
+            widget.config(state=tk.NORMAL)
+        if self.timer.restore_checkpoint():
+            self.update_timer_display()
+            self._show_restored_session()
+        # From here on, data changes reach the screen through _on_data_changed, once per burst of work
+        self.config_manager.events.set_scheduler(self.root.after_idle)
+        self.config_manager.events.subscribe(self._on_data_changed)
+        self._refresh_session_index()
+        self.refresh_task_list_and_daily_summary()
+        self._bind_shortcuts()
+        self._start_control_server()
+        self._start_file_watcher()
+
+    def _show_restored_session(self):
+        task = self.timer.current_task()
+        if task:
+            self.current_task_display_label.config(text=f"Working on: {task.text[:40]}{'...' if len(task.text) > 40 else ''}")
+        if self.is_running and self.paused:
+            self.start_button.config(text="Resume", state=tk.NORMAL)
+            self.pause_button.config(state=tk.DISABLED)
+            self.skip_button.config(state=tk.NORMAL if self.current_session_type != self.WORK else tk.DISABLED)
+        self.update_pomodoro_count_display()
+
     def _apply_initial_settings(self):
         self.root.attributes('-topmost', self.always_on_top_var.get())
 
@@ -184,13 +275,27 @@ class PomodoroApp:
         self.task_entry = ttk.Entry(task_input_frame, width=30)
         self.task_entry.grid(row=0, column=0, sticky="ew", padx=(0,5))
         self.task_entry.bind("<Return>", lambda event: self.add_task_gui())
+        self.task_entry.bind("<KeyRelease>", self._schedule_estimate_suggestion)
         self.task_pomodoro_est_label = ttk.Label(task_input_frame, text="Est:")
         self.task_pomodoro_est_label.grid(row=0, column=1, padx=(5,0))
-        self.task_pomodoro_est_spinbox = ttk.Spinbox(task_input_frame, from_=1, to=20, width=3, justify=tk.CENTER)
+        self.task_pomodoro_est_spinbox = ttk.Spinbox(task_input_frame, from_=1, to=20, width=3, justify=tk.CENTER,
+                                                     command=self._on_estimate_changed_by_user)
+        self.task_pomodoro_est_spinbox.bind("<Key>", self._on_estimate_changed_by_user)
         self.task_pomodoro_est_spinbox.set("1")
         self.task_pomodoro_est_spinbox.grid(row=0, column=2, padx=(0,5))
+        self.task_repeat_combobox = ttk.Combobox(task_input_frame, values=list(self.REPEAT_CHOICES), state="readonly", width=12)
+        self.task_repeat_combobox.set("No repeat")
+        self.task_repeat_combobox.grid(row=0, column=3, padx=(0,5))
         self.add_task_button = ttk.Button(task_input_frame, text="Add Task", command=self.add_task_gui)
-        self.add_task_button.grid(row=0, column=3)
+        self.add_task_button.grid(row=0, column=4)
+        # "#word" in the task text becomes a tag; the list can be narrowed to one tag
+        tag_filter_frame = ttk.Frame(task_input_frame)
+        tag_filter_frame.grid(row=1, column=0, columnspan=5, sticky="w", pady=(5,0))
+        ttk.Label(tag_filter_frame, text="Show tag:").pack(side=tk.LEFT)
+        self.tag_filter_combobox = ttk.Combobox(tag_filter_frame, values=[self.ALL_TAGS], state="readonly", width=18)
+        self.tag_filter_combobox.set(self.ALL_TAGS)
+        self.tag_filter_combobox.bind("<<ComboboxSelected>>", lambda event: self.refresh_task_list_and_daily_summary())
+        self.tag_filter_combobox.pack(side=tk.LEFT, padx=5)
 
         task_display_notebook = ttk.Notebook(task_section_frame)
         task_display_notebook.grid(row=1, column=0, sticky="nsew", pady=5, padx=5)
@@ -200,19 +305,25 @@ class PomodoroApp:
         tasks_tab_frame.rowconfigure(0, weight=1)
         task_display_notebook.add(tasks_tab_frame, text="Scheduled Tasks")
 
-        self.task_tree = ttk.Treeview(tasks_tab_frame, columns=("text", "est", "done_p"), show="headings", selectmode="browse")
-        self.task_tree.heading("text", text="Task (for selected date)")
-        self.task_tree.heading("est", text="Est.")
-        self.task_tree.heading("done_p", text="Done")
+        self.task_tree = ttk.Treeview(tasks_tab_frame, columns=("text", "est", "done_p"), show="tree headings", selectmode="browse")
+        self.task_tree.column("#0", width=28, stretch=tk.NO) # Expand/collapse arrows for subtasks
+        self.task_tree.heading("text", text="Task (for selected date)", command=lambda: self._sort_task_list("text"))
+        self.task_tree.heading("est", text="Est.", command=lambda: self._sort_task_list("est"))
+        self.task_tree.heading("done_p", text="Done", command=lambda: self._sort_task_list("done_p"))
         self.task_tree.column("text", width=250, stretch=tk.YES)
         self.task_tree.column("est", width=40, anchor="center")
         self.task_tree.column("done_p", width=50, anchor="center")
         self.task_tree.grid(row=0, column=0, sticky="nsew")
         self.task_tree.bind("<<TreeviewSelect>>", self.on_task_select)
+        self.task_tree.bind("<<TreeviewOpen>>", self._on_task_tree_open)
+        self.task_tree.bind("<<TreeviewClose>>", self._on_task_tree_close)
+        # Row tags are (task id, due status): tags[0] is always the id
+        self.task_tree.tag_configure("overdue", foreground=self.COLOR_CALENDAR_WEEKEND)
+        self.task_tree.tag_configure("due_soon", foreground=self.COLOR_LONG_BREAK_BG)
         
-        task_tree_scrollbar = ttk.Scrollbar(tasks_tab_frame, orient="vertical", command=self.task_tree.yview)
-        self.task_tree.configure(yscrollcommand=task_tree_scrollbar.set)
-        task_tree_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.task_tree_scrollbar = ttk.Scrollbar(tasks_tab_frame, orient="vertical", command=self.task_tree.yview)
+        self.task_tree.configure(yscrollcommand=self._on_task_tree_scroll)
+        self.task_tree_scrollbar.grid(row=0, column=1, sticky="ns")
 
         notes_tab_frame = ttk.Frame(task_display_notebook)
         notes_tab_frame.columnconfigure(0, weight=1)
@@ -237,6 +348,11 @@ class PomodoroApp:
         self.delete_task_button.pack(side=tk.LEFT, padx=2)
         self.schedule_task_button = ttk.Button(task_button_frame, text="Schedule", command=self.open_schedule_dialog_for_selected_task, state=tk.DISABLED, width=10)
         self.schedule_task_button.pack(side=tk.LEFT, padx=2)
+        self.add_subtask_button = ttk.Button(task_button_frame, text="+ Subtask", command=self.add_subtask_gui, state=tk.DISABLED, width=10)
+        self.add_subtask_button.pack(side=tk.LEFT, padx=2)
+        ttk.Button(task_button_frame, text="Plan Days", command=self.open_day_planner, width=10).pack(side=tk.LEFT, padx=2)
+        self.deadline_badge_label = ttk.Label(task_button_frame, text="", foreground=self.COLOR_CALENDAR_WEEKEND)
+        self.deadline_badge_label.pack(side=tk.RIGHT, padx=5)
 
         right_pane_frame = ttk.Frame(main_paned_window, padding=5) 
         right_pane_frame.columnconfigure(0, weight=1)
@@ -263,6 +379,13 @@ class PomodoroApp:
                                 font=("Segoe UI", 9), firstweekday='monday')
             self.cal.pack(fill="x", expand=True, padx=5, pady=5)
             self.cal.bind("<<CalendarSelected>>", self.on_calendar_date_selected)
+            self.cal.bind("<<CalendarMonthChanged>>", lambda event: self.refresh_calendar_markers())
+            # Day markers: focus days in deepening green, otherwise due or scheduled tasks
+            for level in range(1, len(self.CALENDAR_FOCUS_LEVELS) + 2):
+                shade = _blend(self.COLOR_TREEVIEW_BG, self.COLOR_WORK, level / (len(self.CALENDAR_FOCUS_LEVELS) + 1))
+                self.cal.tag_config(f"focus{level}", background=shade, foreground="black" if level > 2 else "white")
+            self.cal.tag_config("due", background=self.COLOR_TREEVIEW_BG, foreground=self.COLOR_ACCENT)
+            self.cal.tag_config("scheduled", background=self.COLOR_CALENDAR_HEADER, foreground="white")
         else:
             ttk.Label(calendar_outer_frame, text="Calendar feature disabled (tkcalendar not found).", foreground="orange").pack(padx=5, pady=10)
 
@@ -277,6 +400,8 @@ class PomodoroApp:
                                                             font=("Segoe UI", 9), relief=tk.FLAT, borderwidth=1)
         self.daily_summary_text.pack(expand=True, fill=tk.BOTH, padx=2, pady=2)
         self.daily_summary_text.config(state=tk.DISABLED)
+        self.summary_view = SummaryView(self.daily_summary_text)
+        self._daily_summary = None # DailySummary on display, patched as sessions are logged and tasks change
 
         bottom_controls_frame = ttk.Frame(right_pane_frame)
         bottom_controls_frame.grid(row=3, column=0, sticky="ew", pady=(10,0), padx=5)
@@ -285,6 +410,12 @@ class PomodoroApp:
         self.reset_cycle_button = ttk.Button(bottom_controls_frame, text="Reset Cycle Count", command=self.reset_pomodoro_cycle_count, width=18)
         self.reset_cycle_button.grid(row=0, column=0, sticky="w", padx=(0,10))
         
+        stats_sync_frame = ttk.Frame(bottom_controls_frame)
+        stats_sync_frame.grid(row=0, column=1, sticky="e", padx=(0,10))
+        ttk.Button(stats_sync_frame, text="📊 Stats", command=self.open_statistics, width=10).pack(side=tk.LEFT, padx=(0,5))
+        ttk.Button(stats_sync_frame, text="⤓ Export", command=self.open_export, width=10).pack(side=tk.LEFT, padx=(0,5))
+        ttk.Button(stats_sync_frame, text="⇅ Sync", command=self.sync_now, width=10).pack(side=tk.LEFT)
+
         settings_button = ttk.Button(bottom_controls_frame, text="⚙️ Settings", command=self.open_settings, width=12)
         settings_button.grid(row=0, column=2, sticky="e")
         
@@ -313,97 +444,374 @@ class PomodoroApp:
 
 
     def refresh_task_list_and_daily_summary(self):
-        for i in self.task_tree.get_children():
-            self.task_tree.delete(i)
-        
-        active_tasks_for_date = self.task_manager.get_tasks_by_scheduled_date(self.selected_calendar_date)
-        
-        display_tasks = list(active_tasks_for_date) 
+        # Redraws everything for the selected date: used when the view itself changes (date, tag
+        # filter, sort). Data changes arrive through _on_data_changed and patch only what they affect.
+        if not self._data_loaded: return # Calendar clicks etc. while loading; _finish_loading_data refreshes
+        display_tasks = self._rebuild_task_list()
+        self.update_deadline_badge()
+        self.refresh_calendar_markers()
+        self._refresh_daily_summary(display_tasks)
+        self.on_task_select()
+
+    def _day_query(self):
+        # The selected day's active tasks; today also lists unscheduled ones
         is_today = (self.selected_calendar_date == datetime.date.today())
-        
-        if is_today:
-            unscheduled_active = self.task_manager.get_unscheduled_active_tasks()
-            existing_ids = {t.id for t in display_tasks}
-            for ut in unscheduled_active:
-                if ut.id not in existing_ids:
-                    display_tasks.append(ut) 
-
-        if display_tasks:
-            header_text = f"Tasks for {self.selected_calendar_date.strftime('%b %d, %Y')}" if not is_today else "Today's & Unscheduled Tasks"
-            self.task_tree.heading("text", text=header_text)
-            for task in display_tasks:
-                self.task_tree.insert("", tk.END, values=(task.text, task.estimated_pomodoros, task.completed_pomodoros), tags=(task.id,))
+        return self.task_manager.query().active().scheduled_on(self.selected_calendar_date, or_unscheduled=is_today)
+
+    def _rebuild_task_list(self):
+        # Returns the day's active tasks (before the tag filter), for the summary
+        self.task_tree.delete(*self.task_tree.get_children())
+        self._task_items = {}
+        day_query = self._day_query()
+        display_tasks = day_query.list()
+
+        tag_filter = self._task_list_tag = self._update_tag_filter_choices()
+        self._tree_query = day_query.tagged(tag_filter) if tag_filter else day_query
+        tree_tasks = self._tree_query.list() if tag_filter else display_tasks
+
+        # Subtasks are listed under their parent when the parent is shown too
+        shown_ids = {task.id for task in tree_tasks}
+        self._task_rows = self._sorted_task_rows([task for task in tree_tasks if task.parent_id not in shown_ids])
+        self._task_rows_shown = 0
+        self._listed_keys = {task.id: self._task_view_key(task) for task in self._task_rows}
+        self._update_task_list_heading()
+        self._append_task_rows()
+        return display_tasks
+
+    def _update_task_list_heading(self):
+        date_text = self.selected_calendar_date.strftime('%b %d, %Y')
+        if not self._task_rows:
+            self.task_tree.heading("text", text=f"No active tasks for {date_text}")
+            return
+        is_today = (self.selected_calendar_date == datetime.date.today())
+        header_text = f"Tasks for {date_text}" if not is_today else "Today's & Unscheduled Tasks"
+        if self._task_list_tag: header_text += f" #{self._task_list_tag}"
+        if len(self._task_rows) > self.TASK_PAGE_SIZE: header_text += f" ({len(self._task_rows)})"
+        self.task_tree.heading("text", text=header_text)
+
+    def _task_view_key(self, task):
+        # What decides whether and where a listed task appears; if it changes, the list is rebuilt
+        sort_value = task.text.lower() if self._task_sort and self._task_sort[0] == "text" else None
+        return (task.done, task.scheduled_date, tuple(task.tags), task.parent_id, sort_value)
+
+    def _on_data_changed(self, changes):
+        # One call per idle cycle with everything tasks, sessions and settings changed meanwhile
+        display_tasks = None # The day's active tasks, when the list had to be rebuilt
+        if changes.tasks_changed():
+            self._update_current_task_label(changes)
+            if not self._patch_task_list(changes): display_tasks = self._rebuild_task_list()
+            self._update_selection_after_change(changes)
+            self.update_deadline_badge()
+        for entry in changes.sessions: self._add_session_to_summary(entry)
+        if display_tasks is not None:
+            self._refresh_daily_summary(display_tasks)
+        elif changes.tasks_changed():
+            self._patch_daily_summary(changes)
+        elif changes.sessions or changes.session_log_changed or "work_duration" in changes.settings:
+            self._refresh_daily_summary()
+        if changes.tasks_changed() or changes.sessions or changes.session_log_changed or "work_duration" in changes.settings:
+            self.refresh_calendar_markers()
+        if changes.session_log_changed: self._refresh_session_index()
+
+    def _patch_task_list(self, changes):
+        # Updates the rows a change touches in place. Returns False when the list has to be rebuilt:
+        # a task joined or left it, moved within the sort order, or a recurring series changed.
+        if changes.tasks_reloaded: return False
+        if self._update_tag_filter_choices() != self._task_list_tag: return False
+        if self._task_sort and self._task_sort[0] != "text": return False # Rolled-up totals may reorder any row
+        redraw_subtasks_of = set()
+        for task_id in changes.removed_ids:
+            key = self._listed_keys.pop(task_id, None)
+            if key is None: continue
+            if key[3] in self._listed_keys: redraw_subtasks_of.add(key[3])
+            item = self._task_items.pop(task_id, None)
+            if item and self.task_tree.exists(item): self._delete_task_row(item)
+            position = next((i for i, task in enumerate(self._task_rows) if task.id == task_id), None)
+            if position is not None:
+                del self._task_rows[position]
+                if position < self._task_rows_shown: self._task_rows_shown -= 1
+        for task_id in changes.added_ids.keys() | changes.updated_ids.keys():
+            task = self.task_manager.get_task_by_id(task_id)
+            if not task: continue
+            if task.recurrence: return False # Its occurrences may have come or gone
+            key = self._listed_keys.get(task_id)
+            if key is not None and key[3] in self._listed_keys:
+                redraw_subtasks_of.add(key[3]) # A subtask row: its parent's rows are redrawn
+            if task.parent_id in self._listed_keys:
+                redraw_subtasks_of.add(task.parent_id)
+            elif key is not None and key != self._task_view_key(task):
+                return False
+            elif key is None and self._tree_query.matches(task):
+                return False
+        for parent_id in redraw_subtasks_of:
+            item = self._task_items.get(parent_id)
+            if not item or not self.task_tree.exists(item) or parent_id not in self._expanded_task_ids: continue
+            for child_item in self.task_tree.get_children(item): self._delete_task_row(child_item)
+            self._insert_subtask_rows(item, parent_id)
+            self.task_tree.item(item, open=True)
+        # Rows of changed tasks, and of every parent since its rolled-up totals may have moved
+        for task_id, item in list(self._task_items.items()):
+            if task_id in changes.updated_ids or task_id in changes.added_ids or self.task_manager.subtasks.has_children(task_id) \
+                    or self.task_tree.get_children(item):
+                self._update_task_row(task_id, item)
+        self._update_task_list_heading()
+        return True
+
+    def _update_current_task_label(self, changes):
+        if not self.current_task_id or (self.current_task_id not in changes.task_ids() and not changes.tasks_reloaded): return
+        task = self.task_manager.get_task_by_id(self.current_task_id)
+        if not task or task.done:
+            self.current_task_id = None
+            self.current_task_display_label.config(text="Current Task: None")
         else:
-             self.task_tree.heading("text", text=f"No active tasks for {self.selected_calendar_date.strftime('%b %d, %Y')}")
+            self.current_task_display_label.config(text=f"Working on: {task.text[:40]}{'...' if len(task.text) > 40 else ''}")
 
-        completed_tasks_for_date = self.task_manager.get_completed_tasks(scheduled_date_obj=self.selected_calendar_date)
+    def _update_selection_after_change(self, changes):
+        selected_item = self.task_tree.focus()
+        if not selected_item or not self.task_tree.exists(selected_item):
+            self._clear_task_selection_ui()
+            return
+        tags = self.task_tree.item(selected_item, "tags")
+        if tags and (tags[0] in changes.task_ids() or changes.tasks_reloaded):
+            task = self.task_manager.get_task_by_id(tags[0])
+            if task: self._update_selection_buttons(task)
+            else: self._clear_task_selection_ui()
 
-        self.daily_summary_text.config(state=tk.NORMAL)
-        self.daily_summary_text.delete(1.0, tk.END)
-        
-        summary_content = []
-        pomos_for_date = 0
-        focus_minutes_for_date = 0.0 
+    def _refresh_daily_summary(self, display_tasks=None):
+        # Rebuilt for a new date or after the session log changed underneath it; otherwise only the
+        # task sections are recomputed (display_tasks given: the day's active tasks), and SummaryView
+        # redraws just the sections that differ
+        date_str = self.selected_calendar_date.isoformat()
         work_duration = self.config_manager.get("work_duration")
-
-        log_entries_for_date = [
-            entry for entry in self.session_log 
-            if entry.get("session_for_date") == self.selected_calendar_date.isoformat() 
-        ]
-
-        if log_entries_for_date:
-            summary_content.append("--- Pomodoro Sessions ---")
-            for entry in log_entries_for_date:
-                if entry["type"] == self.WORK and not entry.get("skipped", False):
-                    pomos_for_date += 1
-                    logged_duration = entry.get("duration_minutes")
-                    duration_to_add = work_duration 
-                    if isinstance(logged_duration, (int, float)) and logged_duration >= 0:
-                        duration_to_add = logged_duration
-                    
-                    focus_minutes_for_date += duration_to_add
-                    task_info = f" (Task: {entry.get('task_text', 'N/A')[:30]})" if entry.get('task_text') else ""
-                    summary_content.append(f"  - Work: {duration_to_add:.1f} min{task_info}")
-
-                elif entry["type"] != self.WORK and not entry.get("skipped", False):
-                    logged_break_duration = entry.get("duration_minutes", 0)
-                    break_duration_to_display = logged_break_duration if isinstance(logged_break_duration, (int,float)) and logged_break_duration >=0 else 0
-                    summary_content.append(f"  - {entry['type']}: {break_duration_to_display:.1f} min")
-            summary_content.append("\n")
-
-
-        summary_content.append(f"Total Pomodoros Completed: {pomos_for_date}")
-        total_hours = int(focus_minutes_for_date // 60)
-        total_minutes_rem = int(round(focus_minutes_for_date % 60)) 
-        summary_content.append(f"Total Focus Time: {total_hours}h {total_minutes_rem}m")
-        summary_content.append("\n--- Tasks Completed on this Day ---")
-        
-        # Filter completed_tasks_for_date to only show tasks truly completed ON this day
-        truly_completed_this_day = [
-            task for task in completed_tasks_for_date 
-            if task.completed_at and task.completed_at.startswith(self.selected_calendar_date.isoformat())
-        ]
-
-        if truly_completed_this_day:
-            for task in truly_completed_this_day:
-                 summary_content.append(f"  [X] {task.text} (Actual Pomos: {task.completed_pomodoros})")
+        summary = self._daily_summary
+        if not self._summary_is_current():
+            if summary is None or summary.date_str != date_str: self.summary_view.clear()
+            summary = self._daily_summary = DailySummary(date_str, work_duration, self.timer.session_log_version)
+            summary.set_sessions(self._session_entries_on(self.selected_calendar_date))
+            summary.set_tag_focus(self.task_manager.tags.focus_on(date_str))
+            if display_tasks is None: display_tasks = self._day_query().list()
+        if display_tasks is None: return
+        summary.set_completed(self.task_manager.get_completed_tasks(scheduled_date_obj=self.selected_calendar_date))
+        summary.set_active(display_tasks, self.SUMMARY_TASK_LIMIT)
+        summary.set_estimates(self.task_manager.estimate_stats.describe())
+        self.summary_view.show(summary)
+
+    def _session_entries_on(self, day):
+        # The day's log entries, picked out through the session index when it describes the log held
+        # here (the last one read or written); otherwise by a scan while _refresh_session_index catches up
+        date_str = day.isoformat()
+        try:
+            with session_index.SessionIndex(self.config_manager.get_session_index_path()) as index:
+                log_stamp = self.config_manager.known_stamp(self.config_manager.get_session_log_path())
+                if index.describes(log_stamp, len(self.session_log)):
+                    entries = [self.session_log[position] for position in index.positions_between(day, day)]
+                    if all(entry.get("session_for_date") == date_str for entry in entries): return entries
+        except (OSError, ValueError):
+            pass
+        self._refresh_session_index()
+        return sl.entries_for_date(self.session_log, date_str)
+
+    def _refresh_session_index(self):
+        # Rebuilds a stale index (after compaction or a merge) in a worker; sessions logged here keep it current
+        if self._session_index_job is not None: return
+        log_path, index_path = self.config_manager.get_session_log_path(), self.config_manager.get_session_index_path()
+        if session_index.is_current(log_path, index_path): return
+        def finished(result):
+            self._session_index_job = None
+            if isinstance(result, Exception): print(f"Warning: Could not build session index: {result}")
+        self._session_index_job = self.jobs.submit(session_index.build, log_path, index_path, on_done=finished, on_error=finished)
+
+    def _summary_is_current(self):
+        summary = self._daily_summary
+        return summary is not None and (summary.date_str, summary.work_duration, summary.session_log_version) == \
+            (self.selected_calendar_date.isoformat(), self.config_manager.get("work_duration"), self.timer.session_log_version)
+
+    def _patch_daily_summary(self, changes):
+        # Moves just the changed tasks in or out of the task sections; no query over the day's tasks
+        if not self._summary_is_current():
+            self._refresh_daily_summary(self._day_query().list())
+            return
+        query = self._day_query()
+        changed = []
+        for task_id in changes.task_ids():
+            task = self.task_manager.get_task_by_id(task_id)
+            changed.append((task_id, task, task is not None and query.matches(task)))
+        summary = self._daily_summary
+        summary.update_tasks(changed)
+        summary.set_estimates(self.task_manager.estimate_stats.describe())
+        self.summary_view.show(summary, ("completed", "active", "estimates"))
+
+    def _add_session_to_summary(self, entry):
+        # One more line under "Pomodoro Sessions" and new totals, when the session counts for the day shown
+        summary = self._daily_summary
+        if summary is None or summary.session_log_version != self.timer.session_log_version: return # Rebuilt on refresh
+        if summary.date_str != entry.get("session_for_date"): return
+        new_lines = summary.add_session(entry)
+        if new_lines is None: self.summary_view.show(summary, ("sessions",))
+        else: self.summary_view.append("sessions", new_lines)
+        summary.set_tag_focus(self.task_manager.tags.focus_on(summary.date_str))
+        self.summary_view.show(summary, ("totals", "active", "tags"))
+
+    def _update_tag_filter_choices(self):
+        # Returns the tag the list is filtered by, or None; a tag with no active tasks left drops back to all
+        choices = [self.ALL_TAGS] + [f"#{tag}" for tag in self.task_manager.tags.active_tags()]
+        self.tag_filter_combobox.config(values=choices)
+        if self.tag_filter_combobox.get() not in choices: self.tag_filter_combobox.set(self.ALL_TAGS)
+        selected = self.tag_filter_combobox.get()
+        return None if selected == self.ALL_TAGS else selected[1:]
+
+    def _sorted_task_rows(self, tasks):
+        if not self._task_sort: return tasks
+        column, descending = self._task_sort
+        if column == "text":
+            key = lambda task: task.text.lower()
         else:
-            summary_content.append("  No tasks marked complete for this day.")
-            
-        summary_content.append("\n--- Active Tasks Scheduled for this Day ---")
-        active_task_texts_in_log = {entry.get('task_text') for entry in log_entries_for_date if entry.get('task_text') and entry["type"] == self.WORK}
-        
-        active_for_day_not_in_log = [task for task in display_tasks if not task.done and task.text not in active_task_texts_in_log]
+            # Parents sort by their rolled-up totals, as displayed
+            field = "estimated" if column == "est" else "completed"
+            key = lambda task: self.task_manager.get_rollup(task.id)[field]
+        return sorted(tasks, key=key, reverse=descending)
+
+    def _sort_task_list(self, column):
+        # Click a heading to sort by it, again to reverse, a third time for the natural order
+        if not self._task_sort or self._task_sort[0] != column: self._task_sort = (column, False)
+        elif not self._task_sort[1]: self._task_sort = (column, True)
+        else: self._task_sort = None
+        self.refresh_task_list_and_daily_summary()
 
-        if active_for_day_not_in_log:
-            for task in active_for_day_not_in_log:
-                 summary_content.append(f"  [ ] {task.text} (Est: {task.estimated_pomodoros})")
-        elif not display_tasks: 
-            summary_content.append("  None.")
-        
-        self.daily_summary_text.insert(tk.END, "\n".join(summary_content))
-        self.daily_summary_text.config(state=tk.DISABLED)
-        self.on_task_select() 
+    def _append_task_rows(self):
+        # Creates Treeview rows for the next page of the list
+        end = min(self._task_rows_shown + self.TASK_PAGE_SIZE, len(self._task_rows))
+        for task in self._task_rows[self._task_rows_shown:end]:
+            self._insert_task_row("", self.task_manager.get_task_by_id(task.id) or task) # An occurrence may have been stored since
+        self._task_rows_shown = end
+
+    def _on_task_tree_scroll(self, first, last):
+        self.task_tree_scrollbar.set(first, last)
+        if self._task_rows_shown < len(self._task_rows) and float(last) > 0.9:
+            self.root.after_idle(self._append_task_rows_if_needed)
+
+    def _append_task_rows_if_needed(self):
+        # Re-checked on idle: several scroll events can queue up before the first page lands
+        if self._task_rows_shown < len(self._task_rows) and self.task_tree.yview()[1] > 0.9:
+            self._append_task_rows()
+
+    def _task_row_look(self, task):
+        # (values, tags, has_children) for a task's row
+        due_status = self.task_manager.deadlines.due_status(task.id, self.DUE_SOON_DAYS)
+        text = f"↻ {task.text}" if task.recurrence_id else task.text
+        if task.tags: text = f"{text}  {format_tags(task.tags)}"
+        est, done_p = task.estimated_pomodoros, task.completed_pomodoros
+        has_children = self.task_manager.subtasks.has_children(task.id)
+        if has_children:
+            rollup = self.task_manager.get_rollup(task.id)
+            text = f"{text}  [{rollup['children_done']}/{rollup['children']}]"
+            est, done_p = rollup["estimated"], rollup["completed"]
+        return (text, est, done_p), ((task.id, due_status) if due_status else (task.id,)), has_children
+
+    def _insert_task_row(self, parent_item, task):
+        values, tags, has_children = self._task_row_look(task)
+        item = self.task_tree.insert(parent_item, tk.END, values=values, tags=tags)
+        self._task_items[task.id] = item
+        if parent_item: self._listed_keys[task.id] = self._task_view_key(task)
+        if has_children:
+            if task.id in self._expanded_task_ids:
+                self._insert_subtask_rows(item, task.id)
+                self.task_tree.item(item, open=True)
+            else:
+                self.task_tree.insert(item, tk.END, values=("", "", "")) # Placeholder so the row can be opened
+        return item
+
+    def _update_task_row(self, task_id, item):
+        task = self.task_manager.get_task_by_id(task_id)
+        if not task or not self.task_tree.exists(item): return
+        values, tags, has_children = self._task_row_look(task)
+        self.task_tree.item(item, values=values, tags=tags)
+        children = self.task_tree.get_children(item)
+        if has_children and not children:
+            if task_id in self._expanded_task_ids: self._insert_subtask_rows(item, task_id)
+            else: self.task_tree.insert(item, tk.END, values=("", "", "")) # Placeholder so the row can be opened
+        elif not has_children and children:
+            for child_item in children: self._delete_task_row(child_item)
+
+    def _delete_task_row(self, item):
+        # Deletes a row and its subtask rows, forgetting the task ids they showed
+        stack = [item]
+        while stack:
+            current = stack.pop()
+            stack.extend(self.task_tree.get_children(current))
+            tags = self.task_tree.item(current, "tags")
+            if tags and self._task_items.get(tags[0]) == current:
+                del self._task_items[tags[0]]
+                self._listed_keys.pop(tags[0], None)
+        self.task_tree.delete(item)
+
+    def _insert_subtask_rows(self, item, task_id):
+        for child in self.task_manager.get_subtasks(task_id):
+            if not child.done: self._insert_task_row(item, child)
+
+    def _on_task_tree_open(self, event=None):
+        # Subtask rows are only built the first time their parent is opened
+        item = self.task_tree.focus()
+        tags = self.task_tree.item(item, "tags") if item else ()
+        if not tags: return
+        self._expanded_task_ids.add(tags[0])
+        children = self.task_tree.get_children(item)
+        if len(children) == 1 and not self.task_tree.item(children[0], "tags"):
+            self.task_tree.delete(children[0])
+            self._insert_subtask_rows(item, tags[0])
+
+    def _on_task_tree_close(self, event=None):
+        item = self.task_tree.focus()
+        tags = self.task_tree.item(item, "tags") if item else ()
+        if tags: self._expanded_task_ids.discard(tags[0])
+
+    def add_subtask_gui(self):
+        selected_item = self.task_tree.focus()
+        tags = self.task_tree.item(selected_item, "tags") if selected_item else ()
+        if not tags: return
+        parent = self.task_manager.get_task_by_id(tags[0])
+        if not parent or parent.recurrence_id: return
+        text = simpledialog.askstring("Add Subtask", f"Subtask of '{parent.text}':", parent=self.root)
+        if not text: return
+        text, task_tags = parse_tags(text)
+        if not text: return
+        estimate, _ = self.task_manager.suggest_estimate(text)
+        self.task_manager.add_task(text, estimate or 1, scheduled_date=parent.scheduled_date, parent_id=parent.id,
+                                   tags=task_tags or parent.tags)
+        self._expanded_task_ids.add(parent.id)
+
+    def refresh_calendar_markers(self):
+        # Redraws the markers of the month on display only, from the per-day indexes
+        if not TKCALENDAR_AVAILABLE or not self._data_loaded: return
+        month, year = self.cal.get_displayed_month()
+        activity = month_activity(self.task_manager, self.timer.daily_focus, year, month)
+        thresholds = [pomodoros * self.config_manager.get("work_duration") for pomodoros in self.CALENDAR_FOCUS_LEVELS]
+        self.cal.calevent_remove("all")
+        for day, info in activity.items():
+            parts = []
+            if info["pomodoros"]: parts.append(f"{info['pomodoros']} pomodoro(s), {sl.format_minutes(info['focus_minutes'])} focus")
+            if info["scheduled"]: parts.append(f"{info['scheduled']} scheduled")
+            if info["due"]: parts.append(f"{info['due']} due")
+            if info["pomodoros"]:
+                tag = f"focus{1 + sum(1 for minutes in thresholds if info['focus_minutes'] >= minutes)}"
+            else:
+                tag = "due" if info["due"] else "scheduled"
+            self.cal.calevent_create(day, ", ".join(parts), tag)
+
+    def update_deadline_badge(self):
+        deadlines = self.task_manager.deadlines
+        parts = []
+        overdue = deadlines.overdue_count()
+        if overdue: parts.append(f"⚠ {overdue} overdue")
+        due_soon = deadlines.due_within_count(self.DUE_SOON_DAYS)
+        if due_soon: parts.append(f"{due_soon} due soon")
+        next_entry = deadlines.next_deadline()
+        if next_entry:
+            next_task = self.task_manager.get_task_by_id(next_entry[1])
+            due_date = datetime.date.fromisoformat(next_entry[0])
+            when = "today" if due_date == datetime.date.today() else due_date.strftime("%b %d")
+            parts.append(f"Next: {next_task.text[:20]}{'...' if len(next_task.text) > 20 else ''} ({when})")
+        self.deadline_badge_label.config(text="  ·  ".join(parts))
 
     def open_schedule_dialog_for_selected_task(self):
         selected_item = self.task_tree.focus()
@@ -422,12 +830,10 @@ class PomodoroApp:
             if date_str is not None: 
                 if not date_str.strip(): 
                     self.task_manager.update_task(task.id, scheduled_date=None)
-                    self.refresh_task_list_and_daily_summary()
                 else:
                     try:
                         datetime.datetime.strptime(date_str, "%Y-%m-%d")
                         self.task_manager.update_task(task.id, scheduled_date=date_str)
-                        self.refresh_task_list_and_daily_summary()
                     except ValueError:
                         messagebox.showerror("Invalid Date", "Date format must be YYYY-MM-DD.", parent=self.root)
             return
@@ -463,7 +869,6 @@ class PomodoroApp:
         def _save_schedule():
             new_scheduled_date_obj = date_entry.get_date() 
             self.task_manager.update_task(task.id, scheduled_date=new_scheduled_date_obj)
-            self.refresh_task_list_and_daily_summary()
             dialog.destroy()
             
         btn_frame = ttk.Frame(dialog)
@@ -472,20 +877,120 @@ class PomodoroApp:
         ttk.Button(btn_frame, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
 
+    def open_day_planner(self):
+        if not self._data_loaded: return
+        unscheduled = self.task_manager.get_unscheduled_active_tasks()
+        if not unscheduled:
+            messagebox.showinfo("Plan Days", "There are no unscheduled active tasks to plan.", parent=self.root)
+            return
+        existing_load = planner.scheduled_load(self.task_manager.tasks)
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Plan Days")
+        dialog.configure(bg=self.COLOR_BG)
+        dialog.transient(self.root)
+        dialog.grab_set()
+        dialog.geometry("560x460")
+
+        top_frame = ttk.Frame(dialog, padding=10)
+        top_frame.pack(fill=tk.X)
+        ttk.Label(top_frame, text="Pomodoros per day:").pack(side=tk.LEFT)
+        capacity_var = tk.IntVar(value=self.config_manager.get("daily_pomodoro_capacity", 8))
+        ttk.Spinbox(top_frame, from_=1, to=30, textvariable=capacity_var, width=4).pack(side=tk.LEFT, padx=5)
+        summary_label = ttk.Label(top_frame, text="")
+        summary_label.pack(side=tk.LEFT, padx=10)
+
+        tree_frame = ttk.Frame(dialog, padding=(10,0))
+        tree_frame.pack(expand=True, fill=tk.BOTH)
+        preview_tree = ttk.Treeview(tree_frame, columns=("date", "text", "pomos", "due"), show="headings")
+        for column, heading, width, anchor in (("date", "Date", 90, tk.W), ("text", "Task", 260, tk.W), ("pomos", "Pomos", 50, tk.CENTER), ("due", "Due", 90, tk.W)):
+            preview_tree.heading(column, text=heading)
+            preview_tree.column(column, width=width, anchor=anchor, stretch=(column == "text"))
+        preview_tree.tag_configure("late", foreground=self.COLOR_CALENDAR_WEEKEND)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=preview_tree.yview)
+        preview_tree.configure(yscrollcommand=scrollbar.set)
+        preview_tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        plan = {}
+        PREVIEW_ROWS = 300 # The plan itself covers every task; the preview only shows the first days
+
+        def _preview():
+            try: capacity = int(capacity_var.get())
+            except (ValueError, tk.TclError): return
+            assignments, late, unplanned = planner.plan_days(unscheduled, capacity, datetime.date.today(), existing_load)
+            plan.update(assignments=assignments, capacity=capacity)
+            late_ids = {task.id for task, _ in late}
+            preview_tree.delete(*preview_tree.get_children())
+            planned = sorted((assignments[task.id], task.due_date or "~", task.text, task) for task in unscheduled if task.id in assignments)
+            for date_str, _, _, task in planned[:PREVIEW_ROWS]:
+                preview_tree.insert("", tk.END, values=(date_str, task.text, planner.remaining_pomodoros(task), task.due_date or ""),
+                                    tags=("late",) if task.id in late_ids else ())
+            days = len({date_str for date_str in assignments.values()})
+            summary = f"{len(assignments)} task(s) over {days} day(s)"
+            if late: summary += f", {len(late)} past due"
+            if unplanned: summary += f", {len(unplanned)} don't fit"
+            summary_label.config(text=summary)
+
+        def _apply():
+            self.config_manager.set("daily_pomodoro_capacity", plan["capacity"])
+            self.task_manager.schedule_tasks(plan["assignments"])
+            dialog.destroy()
+
+        capacity_var.trace_add("write", lambda *args: _preview())
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Apply Plan", command=_apply).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        _preview()
+
     def add_task_gui(self):
-        text = self.task_entry.get()
+        if not self._data_loaded: return
+        text, task_tags = parse_tags(self.task_entry.get())
         try: est_pomos = int(self.task_pomodoro_est_spinbox.get())
         except ValueError: est_pomos = 1
             
         if text:
             schedule_to_date = self.selected_calendar_date
-            self.task_manager.add_task(text, est_pomos, scheduled_date=schedule_to_date)
+            freq = self.REPEAT_CHOICES.get(self.task_repeat_combobox.get())
+            recurrence = None
+            if freq == rec.INTERVAL:
+                interval = simpledialog.askinteger("Repeat", "Repeat every how many days?", parent=self.root, minvalue=2, maxvalue=365)
+                if not interval: return
+                recurrence = rec.make_rule(freq, schedule_to_date, interval=interval)
+            elif freq:
+                recurrence = rec.make_rule(freq, schedule_to_date)
+            self.task_manager.add_task(text, est_pomos, scheduled_date=schedule_to_date, recurrence=recurrence, tags=task_tags)
             self.task_entry.delete(0, tk.END)
+            self.task_repeat_combobox.set("No repeat")
             self.task_pomodoro_est_spinbox.set("1")
-            self.refresh_task_list_and_daily_summary()
+            self._estimate_set_by_user = False
+            self.task_pomodoro_est_label.config(text="Est:")
         else:
             messagebox.showwarning("Input Error", "Task text cannot be empty.", parent=self.root)
 
+    def _on_estimate_changed_by_user(self, event=None):
+        # Once the user picks an estimate, suggestions stop overwriting it
+        if event is not None and event.keysym in ("Tab", "Return"): return
+        self._estimate_set_by_user = True
+        self.task_pomodoro_est_label.config(text="Est:")
+
+    def _schedule_estimate_suggestion(self, event=None):
+        # Debounced so fast typing costs one lookup
+        if self._suggestion_after_id: self.root.after_cancel(self._suggestion_after_id)
+        self._suggestion_after_id = self.root.after(150, self._update_estimate_suggestion)
+
+    def _update_estimate_suggestion(self):
+        self._suggestion_after_id = None
+        if self._estimate_set_by_user: return
+        estimate, matches = self.task_manager.suggest_estimate(self.task_entry.get())
+        if estimate is None:
+            self.task_pomodoro_est_spinbox.set("1")
+            self.task_pomodoro_est_label.config(text="Est:")
+        else:
+            self.task_pomodoro_est_spinbox.set(str(min(estimate, 20)))
+            self.task_pomodoro_est_label.config(text=f"Est (from {len(matches)} similar):")
+
     def on_task_select(self, event=None):
         selected_item = self.task_tree.focus()
         if selected_item:
@@ -496,23 +1001,27 @@ class PomodoroApp:
             task = self.task_manager.get_task_by_id(task_id)
 
             if task:
-                self.mark_done_button.config(state=tk.NORMAL)
-                self.delete_task_button.config(state=tk.NORMAL)
-                self.edit_task_button.config(state=tk.NORMAL)
-                self.schedule_task_button.config(state=tk.NORMAL)
-                self.select_work_task_button.config(state=tk.NORMAL if not task.done else tk.DISABLED)
-                
+                self._update_selection_buttons(task)
                 self.task_notes_text.config(state=tk.NORMAL)
                 self.task_notes_text.delete(1.0, tk.END)
                 self.task_notes_text.insert(tk.END, task.notes or "")
             else: self._clear_task_selection_ui()
         else: self._clear_task_selection_ui()
 
+    def _update_selection_buttons(self, task):
+        self.mark_done_button.config(state=tk.NORMAL)
+        self.delete_task_button.config(state=tk.NORMAL)
+        self.edit_task_button.config(state=tk.NORMAL)
+        self.schedule_task_button.config(state=tk.NORMAL)
+        self.add_subtask_button.config(state=tk.DISABLED if task.recurrence_id else tk.NORMAL)
+        self.select_work_task_button.config(state=tk.NORMAL if not task.done else tk.DISABLED)
+
     def _clear_task_selection_ui(self):
         self.mark_done_button.config(state=tk.DISABLED)
         self.delete_task_button.config(state=tk.DISABLED)
         self.edit_task_button.config(state=tk.DISABLED)
         self.schedule_task_button.config(state=tk.DISABLED)
+        self.add_subtask_button.config(state=tk.DISABLED)
         self.select_work_task_button.config(state=tk.DISABLED)
         self.task_notes_text.delete(1.0, tk.END)
         self.task_notes_text.config(state=tk.DISABLED)
@@ -534,13 +1043,7 @@ class PomodoroApp:
         if not selected_item: return
         tags = self.task_tree.item(selected_item, "tags")
         if not tags: return
-        task_id = tags[0]
-        self.task_manager.toggle_task_done(task_id)
-        task = self.task_manager.get_task_by_id(task_id)
-        if self.current_task_id == task_id and task and task.done:
-            self.current_task_id = None
-            self.current_task_display_label.config(text="Current Task: None")
-        self.refresh_task_list_and_daily_summary()
+        self.task_manager.toggle_task_done(tags[0])
 
     def edit_task_gui(self):
         selected_item = self.task_tree.focus()
@@ -563,9 +1066,13 @@ class PomodoroApp:
         edit_est_var = tk.StringVar(value=str(task.estimated_pomodoros))
         ttk.Spinbox(edit_dialog, from_=1, to=20, textvariable=edit_est_var, width=5).grid(row=1, column=1, padx=10, pady=5, sticky="w")
 
+        ttk.Label(edit_dialog, text="Tags:").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        edit_tags_var = tk.StringVar(value=format_tags(task.tags))
+        ttk.Entry(edit_dialog, textvariable=edit_tags_var, width=40).grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+
         sched_date_entry = None 
         if TKCALENDAR_AVAILABLE:
-            ttk.Label(edit_dialog, text="Scheduled Date:").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+            ttk.Label(edit_dialog, text="Scheduled Date:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
             initial_sched_date_obj = None
             today = datetime.date.today()
             if task.scheduled_date:
@@ -584,7 +1091,7 @@ class PomodoroApp:
             else:
                 sched_date_entry.delete(0, tk.END) 
 
-            sched_date_entry.grid(row=2, column=1, padx=10, pady=5, sticky="w")
+            sched_date_entry.grid(row=3, column=1, padx=10, pady=5, sticky="w")
 
         def save_edit():
             new_text = edit_text_var.get().strip()
@@ -596,13 +1103,13 @@ class PomodoroApp:
                 new_sched_date_to_save = sched_date_entry.get_date() 
             
             if new_text:
-                self.task_manager.update_task(task_id, text=new_text, estimated_pomodoros=new_est, scheduled_date=new_sched_date_to_save)
-                self.refresh_task_list_and_daily_summary()
-                if self.current_task_id == task_id: self.current_task_display_label.config(text=f"Working on: {new_text[:40]}...")
+                new_tags = normalize_tags(edit_tags_var.get().replace(",", " ").split())
+                self.task_manager.update_task(task_id, text=new_text, estimated_pomodoros=new_est, scheduled_date=new_sched_date_to_save,
+                                              tags=new_tags)
                 edit_dialog.destroy()
             else: messagebox.showerror("Input Error", "Task text cannot be empty.", parent=edit_dialog)
 
-        button_frame = ttk.Frame(edit_dialog); button_frame.grid(row=3 if TKCALENDAR_AVAILABLE else 2, column=0, columnspan=2, pady=10)
+        button_frame = ttk.Frame(edit_dialog); button_frame.grid(row=4 if TKCALENDAR_AVAILABLE else 3, column=0, columnspan=2, pady=10)
         ttk.Button(button_frame, text="Save", command=save_edit).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Cancel", command=edit_dialog.destroy).pack(side=tk.LEFT, padx=5)
         edit_dialog.columnconfigure(1, weight=1)
@@ -614,14 +1121,22 @@ class PomodoroApp:
         if not tags: return
         task_id = tags[0]
         task = self.task_manager.get_task_by_id(task_id)
-        if task and messagebox.askyesno("Confirm Delete", f"Delete task: '{task.text}'?", parent=self.root):
+        if not task: return
+        if task.recurrence_id:
+            # Yes: the whole series, No: just this day's occurrence
+            answer = messagebox.askyesnocancel("Delete Recurring Task",
+                                               f"'{task.text}' repeats. Delete the whole series?\n\n"
+                                               "Yes: delete every future occurrence\nNo: delete only this one", parent=self.root)
+            if answer is None: return
+            if answer: self.task_manager.remove_task(task.recurrence_id)
             self.task_manager.remove_task(task_id)
-            if self.current_task_id == task_id:
-                self.current_task_id = None
-                self.current_task_display_label.config(text="Current Task: None")
-            self.refresh_task_list_and_daily_summary()
-            self._clear_task_selection_ui()
+        elif messagebox.askyesno("Confirm Delete", f"Delete task: '{task.text}'?" + self._subtask_delete_note(task_id), parent=self.root):
+            self.task_manager.remove_task(task_id)
+
 
+    def _subtask_delete_note(self, task_id):
+        count = len(self.task_manager.subtasks.descendant_ids(task_id))
+        return f"\n\nIts {count} subtask(s) will be deleted too." if count else ""
 
     def set_current_work_task(self):
         selected_item = self.task_tree.focus()
@@ -633,20 +1148,21 @@ class PomodoroApp:
         if task and not task.done:
             self.current_task_id = task.id
             self.current_task_display_label.config(text=f"Working on: {task.text[:40]}{'...' if len(task.text) > 40 else ''}")
+            self._on_timer_event("state")
             
             if not task.scheduled_date:
                  if messagebox.askyesno("Schedule Task?", f"Task '{task.text}' is unscheduled. Schedule it for today to track focus on this day?", parent=self.root):
                     self.task_manager.update_task(task.id, scheduled_date=datetime.date.today())
-                    self.refresh_task_list_and_daily_summary() 
         elif task and task.done:
             messagebox.showinfo("Task Done", "This task is already completed.", parent=self.root)
 
 
-    def start_timer(self, event=None): 
+    def start_timer(self, event=None, ask_about_task=True): 
         if self.is_running and self.paused: 
             self.paused = False
             self.start_button.config(text="Start", state=tk.DISABLED)
             self.pause_button.config(text="Pause", state=tk.NORMAL)
+            self._on_timer_event("state")
             self.countdown()
         elif not self.is_running: 
             self.is_running = True; self.paused = False
@@ -655,19 +1171,14 @@ class PomodoroApp:
             self.reset_button.config(state=tk.NORMAL)
             self.skip_button.config(state=tk.NORMAL if self.current_session_type != self.WORK else tk.DISABLED)
             
-            if self.current_session_type == self.WORK and self.current_task_id is None:
-                 active_tasks_for_display = self.task_manager.get_tasks_by_scheduled_date(self.selected_calendar_date)
-                 if self.selected_calendar_date == datetime.date.today(): 
-                    # Create a new list before extending to avoid modifying the original if it's a direct reference
-                    active_tasks_for_display = list(active_tasks_for_display)
-                    active_tasks_for_display.extend([t for t in self.task_manager.get_unscheduled_active_tasks() if t.id not in {task.id for task in active_tasks_for_display}])
-
-
-                 if active_tasks_for_display: 
+            if self.current_session_type == self.WORK and self.current_task_id is None and ask_about_task:
+                 is_today = self.selected_calendar_date == datetime.date.today()
+                 if self.task_manager.query().active().scheduled_on(self.selected_calendar_date, or_unscheduled=is_today).exists(): 
                     if not messagebox.askyesno("No Task Selected", "No task is set as current. Continue anyway?", parent=self.root):
                         self.is_running = False; self.paused = True 
                         self.start_button.config(state=tk.NORMAL); self.pause_button.config(state=tk.DISABLED)
                         return
+            self._on_timer_event("state")
             self.countdown()
             
     def pause_timer(self, event=None): 
@@ -676,20 +1187,18 @@ class PomodoroApp:
             if self.timer_id: self.root.after_cancel(self.timer_id)
             self.start_button.config(text="Resume", state=tk.NORMAL)
             self.pause_button.config(state=tk.DISABLED)
+            self._on_timer_event("state")
 
     def reset_current_session(self, event=None): 
         if self.timer_id: self.root.after_cancel(self.timer_id)
-        self.is_running = False; self.paused = False
-        
-        dur_key_map = {self.WORK:"work_duration", self.SHORT_BREAK:"short_break_duration", self.LONG_BREAK:"long_break_duration"}
-        dur_key = dur_key_map.get(self.current_session_type, "work_duration") 
-        self.time_left = self.config_manager.get(dur_key) * 60
+        self.timer.reset()
         
         self.update_timer_display()
         self.start_button.config(text="Start", state=tk.NORMAL)
         self.pause_button.config(state=tk.DISABLED)
         self.skip_button.config(state=tk.NORMAL if self.current_session_type != self.WORK else tk.DISABLED)
         self.update_ui_for_session()
+        self._on_timer_event("state")
 
     def skip_break(self, event=None): 
         if self.current_session_type != self.WORK:
@@ -702,11 +1211,13 @@ class PomodoroApp:
         if messagebox.askyesno("Reset Cycle", "Reset Pomodoro cycle count to 0?", parent=self.root):
             self.pomodoros_completed_cycle = 0
             self.update_pomodoro_count_display()
+            self._on_timer_event("state")
 
     def countdown(self):
         if self.is_running and not self.paused and self.time_left > 0:
             self.time_left -= 1
             self.update_timer_display()
+            self._on_timer_event("tick")
             self.timer_id = self.root.after(1000, self.countdown)
         elif self.time_left <= 0:
             self.is_running = False
@@ -714,41 +1225,7 @@ class PomodoroApp:
             self.next_session()
 
     def log_session(self, skipped=False):
-        task_text = ""
-        current_task_obj = None
-        session_for_date_str = datetime.date.today().isoformat() 
-
-        if self.current_session_type == self.WORK and self.current_task_id:
-            current_task_obj = self.task_manager.get_task_by_id(self.current_task_id)
-            if current_task_obj: 
-                task_text = current_task_obj.text
-                if current_task_obj.scheduled_date: 
-                    session_for_date_str = current_task_obj.scheduled_date
-        
-        dur_key_map = {self.WORK:"work_duration", self.SHORT_BREAK:"short_break_duration", self.LONG_BREAK:"long_break_duration"}
-        dur_key = dur_key_map.get(self.current_session_type, "work_duration")
-        session_config_duration = self.config_manager.get(dur_key)
-        
-        actual_duration_minutes = 0.0 
-        if skipped:
-            actual_duration_minutes = 0.0
-        elif self.time_left > 0 : 
-            completed_seconds = (session_config_duration * 60) - self.time_left
-            actual_duration_minutes = round(completed_seconds / 60.0, 1)
-        else: 
-            actual_duration_minutes = float(session_config_duration)
-
-        log_entry = {
-            "timestamp": datetime.datetime.now().isoformat(), "type": self.current_session_type,
-            "duration_minutes": actual_duration_minutes,
-            "task_id": self.current_task_id if self.current_session_type == self.WORK else None,
-            "task_text": task_text if self.current_session_type == self.WORK else None,
-            "skipped": skipped,
-            "session_for_date": session_for_date_str
-        }
-        self.session_log.append(log_entry)
-        self.config_manager.save_session_log(self.session_log)
-        self.refresh_task_list_and_daily_summary() 
+        self.timer.log_session(skipped=skipped)
 
     def next_session(self, skipped_break=False):
         if self.timer_id: self.root.after_cancel(self.timer_id)
@@ -756,23 +1233,8 @@ class PomodoroApp:
         sound_config_key = self.WORK if self.current_session_type == self.WORK else "Break"
         self._play_sound(sound_config_key)
 
-        if self.current_session_type == self.WORK:
-            self.pomodoros_completed_cycle += 1
-            if self.current_task_id:
-                self.task_manager.increment_pomodoro_for_task(self.current_task_id)
-
-            if self.pomodoros_completed_cycle % self.config_manager.get("pomodoros_per_long_break") == 0:
-                self.current_session_type = self.LONG_BREAK
-                self.time_left = self.config_manager.get("long_break_duration") * 60
-            else:
-                self.current_session_type = self.SHORT_BREAK
-                self.time_left = self.config_manager.get("short_break_duration") * 60
-        else: 
-            self.current_session_type = self.WORK
-            self.time_left = self.config_manager.get("work_duration") * 60
-            if skipped_break and self.pomodoros_completed_cycle > 0 and \
-               (self.pomodoros_completed_cycle % self.config_manager.get("pomodoros_per_long_break") == 0):
-                 self.pomodoros_completed_cycle = 0
+        self.timer.advance(skipped_break=skipped_break)
+        self._on_timer_event("transition")
         
         self.update_pomodoro_count_display()
         self.update_timer_display()
@@ -830,12 +1292,7 @@ class PomodoroApp:
         self.timer_label.config(text=f"{int(minutes):02d}:{int(seconds):02d}")
 
     def update_pomodoro_count_display(self):
-        pomos_per_cycle = self.config_manager.get("pomodoros_per_long_break")
-        current_cycle_pomos = self.pomodoros_completed_cycle % pomos_per_cycle
-        if self.current_session_type == self.LONG_BREAK and current_cycle_pomos == 0 and self.pomodoros_completed_cycle > 0:
-             current_cycle_pomos = pomos_per_cycle
-        elif self.current_session_type != self.WORK and current_cycle_pomos == 0 and self.pomodoros_completed_cycle > 0 and (self.pomodoros_completed_cycle % pomos_per_cycle == 0):
-             current_cycle_pomos = pomos_per_cycle
+        current_cycle_pomos, pomos_per_cycle = self.timer.cycle_progress()
         self.pomodoro_count_label.config(text=f"Cycle: {current_cycle_pomos} / {pomos_per_cycle}")
 
 
@@ -954,6 +1411,75 @@ class PomodoroApp:
         ttk.Button(button_frame, text="Save & Close", command=save_and_close).pack(side=tk.LEFT, padx=10)
         ttk.Button(button_frame, text="Cancel", command=settings_window.destroy).pack(side=tk.LEFT, padx=10)
     
+    def open_statistics(self):
+        if not self._data_loaded: return
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Statistics")
+        stats_window.configure(bg=self.COLOR_BG)
+        stats_window.transient(self.root)
+        stats_window.geometry("520x560")
+
+        stats_text = scrolledtext.ScrolledText(stats_window, wrap=tk.WORD, bg=self.COLOR_ENTRY_BG, fg=self.COLOR_FG,
+                                               font=("Segoe UI", 10), relief=tk.FLAT, padx=10, pady=10)
+        stats_text.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+        sections = {"history": ["Calculating history..."], "estimates": self._format_estimate_stats()}
+
+        def render():
+            stats_text.config(state=tk.NORMAL)
+            stats_text.delete(1.0, tk.END)
+            stats_text.insert(tk.END, "\n\n".join("\n".join(lines) for lines in sections.values()))
+            stats_text.config(state=tk.DISABLED)
+
+        def show(section, lines):
+            sections[section] = lines
+            render()
+
+        # The history job works on a snapshot (read through the session index on disk), so the timer keeps
+        # ticking (and logging) while it runs
+        self.jobs.submit(analytics.long_term_stats_from_index, self.config_manager.get_session_log_path(),
+                         self.config_manager.get_session_index_path(), self.config_manager.get("work_duration"),
+                         group=stats_window, on_done=lambda result: show("history", self._format_history_stats(result)),
+                         on_error=lambda e: show("history", [f"Could not compute history: {e}"]))
+        stats_window.bind("<Destroy>", lambda event: event.widget is stats_window and self.jobs.cancel_group(stats_window))
+        render()
+
+    def _format_history_stats(self, stats):
+        totals = stats["totals"]
+        lines = ["--- All Time ---",
+                 f"Pomodoros: {totals['pomodoros']}   Focus: {sl.format_minutes(totals['focus_minutes'])}   Skipped breaks: {totals['skipped']}",
+                 f"Active days: {stats['active_days']}   Average focus per active day: {sl.format_minutes(stats['average_focus_minutes'])}",
+                 f"Current streak: {stats['current_streak']} day(s)   Longest streak: {stats['longest_streak']} day(s)"]
+        if stats["best_day"]:
+            best = stats["best_day"]
+            lines.append(f"Best day: {best['date']} ({best['pomodoros']} pomodoros, {sl.format_minutes(best['focus_minutes'])})")
+        if stats["by_year"]:
+            lines.append("\n--- By Year ---")
+            for year, period in sorted(stats["by_year"].items(), reverse=True):
+                lines.append(f"  {year}: {period['pomodoros']} pomodoros, {sl.format_minutes(period['focus_minutes'])} over {period['active_days']} day(s)")
+        if stats["by_month"]:
+            lines.append("\n--- Last 12 Months ---")
+            for month, period in sorted(stats["by_month"].items(), reverse=True)[:12]:
+                lines.append(f"  {month}: {period['pomodoros']} pomodoros, {sl.format_minutes(period['focus_minutes'])}")
+        return lines
+
+    def _format_estimate_stats(self):
+        # Read from the running totals TaskManager keeps, so nothing is scanned here
+        estimate_stats = self.task_manager.estimate_stats
+        stats = estimate_stats.summary()
+        lines = ["--- Estimate Accuracy (completed tasks) ---"]
+        if not stats["tasks"]:
+            lines.append("No completed tasks with logged pomodoros yet.")
+            return lines
+        lines.append(f"Tasks: {stats['tasks']}   On target: {stats['on_target']}   "
+                     f"Took longer: {stats['underestimated']}   Took less: {stats['overestimated']}")
+        lines.append(f"Actual / estimated: {stats['mean_ratio']:.2f} on average, {stats['median_ratio']:.2f} median")
+        worst = estimate_stats.furthest_off(self.task_manager.get_task_by_id)
+        if worst:
+            lines.append("Furthest off:")
+            for task in worst:
+                lines.append(f"  {task.text[:40]} (Est: {task.estimated_pomodoros}, Actual: {task.completed_pomodoros})")
+        return lines
+
     def _browse_sound_file(self, string_var_to_update, parent_window):
         # resource_path("") gives the application root (HyperPomo folder)
         initial_dir_sounds = resource_path("sounds") 
@@ -985,6 +1511,192 @@ class PomodoroApp:
                  string_var_to_update.set(normalized_filepath.replace(os.sep, "/"))
 
 
+    def _start_control_server(self):
+        self.control_server = None
+        if not self.config_manager.get("control_socket_enabled"): return
+        path = self.config_manager.get("control_socket_path") or default_socket_path(self.config_manager.data_dir)
+        server = ControlServer(path, {
+            "status": lambda arg: self.timer.status(),
+            "start": self._control_start,
+            "pause": self._control_pause,
+            "reset": self._control_reset,
+            "skip": self._control_skip,
+            "set-task": self._control_set_task,
+        })
+        if not server.start(): return
+        self.control_server = server
+        self._control_fd = server.fileno()
+        if self._control_fd is not None and hasattr(self.root.tk, "createfilehandler"):
+            # Tk wakes us only when a client connects or sends something; no polling
+            self.root.tk.createfilehandler(self._control_fd, tk.READABLE, lambda *args: server.poll())
+        else:
+            self._control_fd = None
+            self._poll_control_server()
+
+    def _poll_control_server(self):
+        if not self.control_server: return
+        self.control_server.poll()
+        self.root.after(200, self._poll_control_server)
+
+    def _on_timer_event(self, event_name):
+        # Every tick, transition and state change passes through here
+        self.timer.save_checkpoint(force=event_name != "tick")
+        if self.control_server and self.control_server.subscriber_count:
+            self.control_server.publish(event_name, self.timer.status())
+
+    def _control_start(self, arg):
+        if self.is_running and not self.paused: raise ValueError("timer is already running")
+        self.start_timer(ask_about_task=False)
+        return self.timer.status()
+
+    def _control_pause(self, arg):
+        if not (self.is_running and not self.paused): raise ValueError("timer is not running")
+        self.pause_timer()
+        return self.timer.status()
+
+    def _control_reset(self, arg):
+        self.reset_current_session()
+        return self.timer.status()
+
+    def _control_skip(self, arg):
+        if self.current_session_type == self.WORK: raise ValueError("only breaks can be skipped")
+        self.skip_break()
+        return self.timer.status()
+
+    def _control_set_task(self, arg):
+        task = self.timer.find_task(arg)
+        if not task: raise ValueError(f"no task matches '{arg}'")
+        if task.done: raise ValueError("task is already completed")
+        self.current_task_id = task.id
+        self.current_task_display_label.config(text=f"Working on: {task.text[:40]}{'...' if len(task.text) > 40 else ''}")
+        self._on_timer_event("state")
+        return self.timer.status()
+
+    def _start_file_watcher(self):
+        # Notices edits to the data files made by another HyperPomo instance (or by hand)
+        self._external_check_pending = False
+        watched = [os.path.basename(path) for path in self.config_manager.watched_files()]
+        self.file_watcher = FileWatcher(self.config_manager.data_dir, watched)
+        self._watcher_fd = self.file_watcher.fileno()
+        if self._watcher_fd is not None and hasattr(self.root.tk, "createfilehandler"):
+            self.root.tk.createfilehandler(self._watcher_fd, tk.READABLE, self._on_data_files_event)
+        else:
+            self._watcher_fd = None
+            self.root.after(self.EXTERNAL_CHANGE_POLL_MS, self._poll_external_changes)
+
+    def _on_data_files_event(self, *args):
+        if self.file_watcher.read_events() and not self._external_check_pending:
+            # Our own saves also trigger events; the stamp comparison in the check filters them out.
+            # Waiting a moment coalesces the burst of events a single save produces.
+            self._external_check_pending = True
+            self.root.after(250, self.check_external_changes)
+
+    def _poll_external_changes(self):
+        self.check_external_changes()
+        self.root.after(self.EXTERNAL_CHANGE_POLL_MS, self._poll_external_changes)
+
+    def check_external_changes(self):
+        self._external_check_pending = False
+        changed_keys = self.config_manager.reload_settings()
+        if changed_keys:
+            if "always_on_top" in changed_keys:
+                self.always_on_top_var.set(self.config_manager.get("always_on_top", False))
+                self.root.attributes('-topmost', self.always_on_top_var.get())
+            if not self.is_running and changed_keys & {"work_duration", "short_break_duration", "long_break_duration"}:
+                self.reset_current_session()
+            self.update_pomodoro_count_display()
+
+        # Both publish what they merged; _on_data_changed updates the screen
+        self.task_manager.reload_external_changes()
+        if self.config_manager.reload_session_log(self.session_log): self.timer.session_log_changed()
+
+    def open_export(self):
+        if not self._data_loaded: return
+        export_window = tk.Toplevel(self.root)
+        export_window.title("Export")
+        export_window.configure(bg=self.COLOR_BG)
+        export_window.transient(self.root)
+        export_window.grab_set()
+        export_window.resizable(False, False)
+
+        frame = ttk.Frame(export_window, padding="20")
+        frame.pack(expand=True, fill=tk.BOTH)
+        what_choices = {"Sessions": ex.SESSIONS, "Tasks": ex.TASKS}
+        format_choices = {"CSV": ex.CSV, "JSON Lines": ex.JSONL, "JSON (tasks and sessions)": ex.JSON}
+
+        ttk.Label(frame, text="Export:").grid(row=0, column=0, sticky=tk.W, pady=3)
+        what_var = tk.StringVar(value="Sessions")
+        ttk.Combobox(frame, textvariable=what_var, values=list(what_choices), state="readonly", width=24).grid(row=0, column=1, sticky=tk.W, pady=3)
+        ttk.Label(frame, text="Format:").grid(row=1, column=0, sticky=tk.W, pady=3)
+        format_var = tk.StringVar(value="CSV")
+        ttk.Combobox(frame, textvariable=format_var, values=list(format_choices), state="readonly", width=24).grid(row=1, column=1, sticky=tk.W, pady=3)
+        ttk.Label(frame, text="From (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, pady=3)
+        from_var = tk.StringVar()
+        ttk.Entry(frame, textvariable=from_var, width=12).grid(row=2, column=1, sticky=tk.W, pady=3)
+        ttk.Label(frame, text="To (YYYY-MM-DD):").grid(row=3, column=0, sticky=tk.W, pady=3)
+        to_var = tk.StringVar()
+        ttk.Entry(frame, textvariable=to_var, width=12).grid(row=3, column=1, sticky=tk.W, pady=3)
+        ttk.Label(frame, text="Tag:").grid(row=4, column=0, sticky=tk.W, pady=3)
+        tag_var = tk.StringVar(value=self.ALL_TAGS)
+        ttk.Combobox(frame, textvariable=tag_var, values=[self.ALL_TAGS] + [f"#{tag}" for tag in self.task_manager.tags.all_tags()],
+                     state="readonly", width=24).grid(row=4, column=1, sticky=tk.W, pady=3)
+
+        selected_item = self.task_tree.focus()
+        selected_tags = self.task_tree.item(selected_item, "tags") if selected_item else ()
+        selected_task = self.task_manager.get_task_by_id(selected_tags[0]) if selected_tags else None
+        only_selected_var = tk.BooleanVar(value=False)
+        if selected_task:
+            ttk.Checkbutton(frame, text=f"Only '{selected_task.text[:30]}'", variable=only_selected_var).grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=3)
+
+        def start_export():
+            dates = []
+            for var in (from_var, to_var):
+                value = var.get().strip()
+                try:
+                    dates.append(datetime.datetime.strptime(value, "%Y-%m-%d").date().isoformat() if value else None)
+                except ValueError:
+                    messagebox.showerror("Invalid Date", f"'{value}' is not a YYYY-MM-DD date.", parent=export_window)
+                    return
+            what, fmt = what_choices[what_var.get()], format_choices[format_var.get()]
+            extension = {ex.CSV: ".csv", ex.JSONL: ".jsonl", ex.JSON: ".json"}[fmt]
+            path = filedialog.asksaveasfilename(title="Export to", parent=export_window, defaultextension=extension,
+                                                initialfile=f"hyperpomo-{what if fmt != ex.JSON else 'export'}{extension}")
+            if not path: return
+            tag = tag_var.get()[1:] if tag_var.get() != self.ALL_TAGS else None
+            task_ids = {selected_task.id} if selected_task and only_selected_var.get() else None
+            export_window.destroy()
+
+            def done(counts):
+                task_count, session_count = counts
+                messagebox.showinfo("Export Complete", f"Exported {task_count} task(s) and {session_count} session(s) to {path}.", parent=self.root)
+            # The worker streams the session log from disk; only the task list is passed along
+            self.jobs.submit(ex.export_file, path, what, fmt, [task.to_dict() for task in self.task_manager.tasks],
+                             self.config_manager.get_session_log_path(), self.config_manager.get("work_duration"),
+                             dates[0], dates[1], task_ids, tag, on_done=done,
+                             on_error=lambda e: messagebox.showerror("Export Failed", f"Could not export to {path}:\n{e}", parent=self.root))
+
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=(15, 0))
+        ttk.Button(button_frame, text="Export...", command=start_export).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=export_window.destroy).pack(side=tk.LEFT, padx=5)
+
+    def sync_now(self):
+        if not self._data_loaded: return
+        sync_dir = self.config_manager.get("sync_dir", "")
+        if not sync_dir or not os.path.isdir(sync_dir):
+            sync_dir = filedialog.askdirectory(title="Choose a folder to sync through (USB stick, synced folder...)", parent=self.root)
+            if not sync_dir: return
+            self.config_manager.set("sync_dir", sync_dir)
+        try:
+            stats = SyncManager(self.config_manager, self.task_manager, self.session_log).sync(sync_dir)
+        except (IOError, OSError) as e:
+            messagebox.showerror("Sync Failed", f"Could not sync with {sync_dir}:\n{e}", parent=self.root)
+            return
+        if stats["sessions_added"]: self.timer.session_log_changed()
+        messagebox.showinfo("Sync Complete",
+                            f"Received {stats['tasks_updated']} task change(s), {stats['tasks_deleted']} deletion(s) "
+                            f"and {stats['sessions_added']} session(s).\nSent {stats['exported']} change(s).", parent=self.root)
+
     def _bind_shortcuts(self): 
         self.root.bind('<Control-s>', self.start_timer)
         self.root.bind('<Control-S>', self.start_timer) 
@@ -997,12 +1709,27 @@ class PomodoroApp:
 
 
     def on_close(self):
+        if not self._data_loaded:
+            # Nothing was loaded, so nothing to save; the crash checkpoint is kept for the next start
+            self._loader.shutdown(wait=True)
+            self.jobs.shutdown()
+            self.root.destroy()
+            return
         self.save_task_notes_auto()
         if self.is_running and not self.paused:
              if not messagebox.askyesno("Timer Running", "Timer is running. Quit anyway?", parent=self.root): return
         if self.timer_id: self.root.after_cancel(self.timer_id)
         self.config_manager.save_settings()
+        self.task_manager.compact()
         self.config_manager.save_session_log(self.session_log)
+        self.config_manager.compact_session_log(self.session_log)
+        self.timer.checkpoint.clear()
+        self.jobs.shutdown()
+        if self.control_server:
+            if self._control_fd is not None: self.root.tk.deletefilehandler(self._control_fd)
+            self.control_server.close()
+        if self._watcher_fd is not None: self.root.tk.deletefilehandler(self._watcher_fd)
+        self.file_watcher.close()
         self.root.destroy()
 
 def main():
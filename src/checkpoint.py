@@ -0,0 +1,110 @@
+# HyperPomo/src/checkpoint.py
+# Crash-safe record of the session in progress, so a killed app can pick up where it left off.
+#
+# The file holds two fixed-size slots. Each write overwrites the older slot in place with one
+# pwrite of SLOT_SIZE bytes: no rename, no fsync, nothing else on disk is touched. Every slot
+# carries a sequence number and a CRC32, so a torn write only costs that one update and the
+# reader falls back to the other slot.
+import os
+import struct
+import time
+import zlib
+
+MAGIC = b"HPCK"
+FORMAT_VERSION = 2 # 2: task ids widened to fit recurring occurrences; version 1 slots are ignored
+SESSION_TYPES = ("Work", "Short Break", "Long Break") # Stored as an index into this tuple
+FLAG_RUNNING = 0x01
+FLAG_PAUSED = 0x02
+TASK_ID_BYTES = 64 # A uuid4 (36), or a recurring occurrence "<template uuid>@YYYY-MM-DD" (47)
+
+# magic, version, seq, session type, flags, cycle, time_left, saved_at (unix time), task id
+_RECORD = struct.Struct(f"<4sHIBBxxIid{TASK_ID_BYTES}s")
+_CRC = struct.Struct("<I")
+SLOT_SIZE = _RECORD.size + _CRC.size
+
+def _decode_task_id(raw):
+    return raw.rstrip(b"\0").decode("utf-8", "ignore") or None
+
+class SessionCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._seq = None
+
+    def _open(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        return self._fd
+
+    def _read_slots(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read(2 * SLOT_SIZE)
+        except IOError:
+            return []
+        slots = []
+        for offset in (0, SLOT_SIZE):
+            chunk = data[offset:offset + SLOT_SIZE]
+            if len(chunk) < SLOT_SIZE: continue
+            body, (crc,) = chunk[:_RECORD.size], _CRC.unpack_from(chunk, _RECORD.size)
+            if zlib.crc32(body) != crc: continue # Torn or never written
+            fields = _RECORD.unpack(body)
+            if fields[0] != MAGIC or fields[1] != FORMAT_VERSION: continue
+            slots.append(fields)
+        return slots
+
+    def load(self):
+        # Returns the newest valid checkpoint as a dict, or None
+        slots = self._read_slots()
+        if not slots: return None
+        _, _, seq, type_index, flags, cycle, time_left, saved_at, task_id = max(slots, key=lambda fields: fields[2])
+        self._seq = seq
+        if type_index >= len(SESSION_TYPES): return None
+        return {
+            "session_type": SESSION_TYPES[type_index],
+            "running": bool(flags & FLAG_RUNNING), "paused": bool(flags & FLAG_PAUSED),
+            "pomodoros_completed_cycle": cycle, "time_left": time_left, "saved_at": saved_at,
+            "task_id": _decode_task_id(task_id),
+        }
+
+    def save(self, session_type, running, paused, pomodoros_completed_cycle, time_left, task_id):
+        if self._seq is None:
+            slots = self._read_slots()
+            self._seq = max((fields[2] for fields in slots), default=0)
+        self._seq += 1
+        task_bytes = (task_id or "").encode("utf-8")
+        if len(task_bytes) > TASK_ID_BYTES or _decode_task_id(task_bytes) != (task_id or None):
+            # Checked by round trip, so a session is never restored silently without its task
+            print(f"Warning: Task id {task_id!r} doesn't fit the session checkpoint; a restored session won't credit it.")
+            task_bytes = b""
+        type_index = SESSION_TYPES.index(session_type) if session_type in SESSION_TYPES else 0
+        flags = (FLAG_RUNNING if running else 0) | (FLAG_PAUSED if paused else 0)
+        body = _RECORD.pack(MAGIC, FORMAT_VERSION, self._seq & 0xFFFFFFFF, type_index, flags,
+                            max(0, int(pomodoros_completed_cycle)), int(time_left), time.time(), task_bytes)
+        record = body + _CRC.pack(zlib.crc32(body))
+        offset = (self._seq % 2) * SLOT_SIZE
+        try:
+            fd = self._open()
+            if hasattr(os, "pwrite"):
+                os.pwrite(fd, record, offset)
+            else: # Windows
+                os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, record)
+        except OSError as e:
+            print(f"Warning: Could not write session checkpoint {self.path}: {e}")
+
+    def clear(self):
+        # Called on a clean exit: there is nothing to recover next time
+        self.close()
+        self._seq = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not remove session checkpoint {self.path}: {e}")
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
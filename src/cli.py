@@ -0,0 +1,432 @@
+# HyperPomo/src/cli.py
+# Headless command line interface. This module must never import tkinter, tkcalendar or
+# playsound (directly or through src.app) so it starts fast and works over SSH.
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from .config_manager import ConfigManager
+from .task_manager import TaskManager
+from .task_query import ORDER_FIELDS
+from .paths import resource_path
+from . import session_log as sl
+from . import recurrence as rec
+from . import export as ex
+from . import serializers
+from .session_index import open_index
+from .tags import parse_tags, format_tags, normalize_tag, normalize_tags
+
+def parse_date(value):
+    value = value.strip().lower()
+    today = datetime.date.today()
+    if value == "today": return today
+    if value == "yesterday": return today - datetime.timedelta(days=1)
+    if value == "tomorrow": return today + datetime.timedelta(days=1)
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (use YYYY-MM-DD, today, yesterday or tomorrow)")
+
+def _print_json(data):
+    json.dump(data, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+def _task_row(task, rollup=None):
+    # rollup: TaskManager.get_rollup() for tasks with subtasks
+    status = "[X]" if task.done else "[ ]"
+    schedule_info = f"  sch:{task.scheduled_date}" if task.scheduled_date else ""
+    due_info = f"  due:{task.due_date}" if task.due_date else ""
+    repeat_info = f"  repeats:{rec.describe(task.recurrence)}" if task.recurrence else ""
+    marker = "↻ " if task.recurrence_id else ""
+    tag_info = f"  {format_tags(task.tags)}" if task.tags else ""
+    parent_info = f"  sub of:{task.parent_id[:8]}" if task.parent_id else ""
+    subtask_info = ""
+    if rollup and rollup["children"]:
+        subtask_info = f"  subtasks:{rollup['children_done']}/{rollup['children']} ({rollup['completed']}/{rollup['estimated']} in all)"
+    return (f"{status} {task.id[:8]}  {task.completed_pomodoros}/{task.estimated_pomodoros}  {marker}{task.text}"
+            f"{tag_info}{schedule_info}{due_info}{repeat_info}{parent_info}{subtask_info}")
+
+def _find_task(task_manager, id_or_prefix):
+    # Full id or an unambiguous id prefix, as shown by 'tasks'
+    task = task_manager.get_task_by_id(id_or_prefix)
+    if task: return task
+    matches = [t for t in task_manager.tasks if t.id.startswith(id_or_prefix)]
+    return matches[0] if len(matches) == 1 else None
+
+def cmd_report(args, config_manager):
+    if args.date_from or args.date_to:
+        start = args.date_from or args.date_to
+        end = args.date_to or args.date_from
+    else:
+        start = end = args.date
+    if start > end: start, end = end, start
+
+    # Only the requested days are read, through the session index, not the whole log
+    try:
+        with open_index(config_manager.get_session_log_path(), config_manager.get_session_index_path()) as index:
+            days = index.summarize_range(start, end, config_manager.get("work_duration"))
+    except ValueError as e:
+        print(f"Could not read the session log: {e}", file=sys.stderr)
+        return 1
+    totals = sl.summarize_entries([], 0)
+    for day in days:
+        for key in totals: totals[key] += day[key]
+
+    if args.json:
+        _print_json({"from": start.isoformat(), "to": end.isoformat(), "days": days, "totals": totals})
+        return 0
+
+    for day in days:
+        if start != end and not (day["pomodoros"] or day["break_minutes"] or day["skipped"]):
+            continue # Keep range reports short, empty days add nothing
+        print(f"{day['date']}  Pomodoros: {day['pomodoros']:3d}  Focus: {sl.format_minutes(day['focus_minutes']):>8}  Breaks: {sl.format_minutes(day['break_minutes'])}")
+    if start != end:
+        print(f"Total {start.isoformat()} .. {end.isoformat()}  Pomodoros: {totals['pomodoros']}  Focus: {sl.format_minutes(totals['focus_minutes'])}")
+    return 0
+
+def cmd_tasks(args, config_manager):
+    task_manager = TaskManager(config_manager)
+    if args.recurring:
+        tasks = task_manager.get_recurring_tasks()
+    else:
+        # The options combine, e.g. --overdue --tag acme --sort due --limit 10
+        query = task_manager.query()
+        if args.done: query = query.done()
+        elif not args.all: query = query.active()
+        if args.date: query = query.scheduled_on(args.date)
+        if args.overdue: query = query.overdue()
+        elif args.due_within is not None: query = query.due_within(args.due_within)
+        if args.tag: query = query.tagged(normalize_tag(args.tag))
+        if args.search: query = query.containing(args.search)
+        if args.sort: query = query.order_by(args.sort, descending=args.reverse)
+        if args.limit is not None: query = query.limit(args.limit)
+        tasks = query.list()
+
+    if args.json:
+        _print_json([task.to_dict() for task in tasks])
+    elif tasks:
+        for task in tasks: print(_task_row(task, task_manager.get_rollup(task.id)))
+    else:
+        print("No matching tasks.")
+    return 0
+
+def cmd_add(args, config_manager):
+    task_manager = TaskManager(config_manager)
+    text, task_tags = parse_tags(" ".join(args.text))
+    estimate, matches = (args.est, []) if args.est is not None else task_manager.suggest_estimate(text)
+    recurrence = None
+    if args.every:
+        recurrence = rec.make_rule(rec.INTERVAL, args.date or datetime.date.today(), interval=args.every, until=args.until)
+    elif args.repeat:
+        recurrence = rec.make_rule(args.repeat, args.date or datetime.date.today(), until=args.until)
+    parent_id = None
+    if args.parent:
+        parent = _find_task(task_manager, args.parent)
+        if parent is None:
+            print(f"Error: no task matches '{args.parent}'.", file=sys.stderr)
+            return 1
+        parent_id = parent.id
+    task = task_manager.add_task(text, estimate or 1, notes=args.notes or "",
+                                 scheduled_date=args.date, due_date=args.due, recurrence=recurrence, parent_id=parent_id,
+                                 tags=task_tags + normalize_tags(args.tag))
+    if task is None:
+        print("Error: Task text cannot be empty.", file=sys.stderr)
+        return 1
+    if args.json: _print_json(task.to_dict())
+    else:
+        print(f"Added: {_task_row(task)}")
+        if matches: print(f"Estimate suggested from {len(matches)} similar completed task(s), e.g. '{matches[0][3]}'")
+    return 0
+
+def cmd_export(args, config_manager):
+    task_manager = TaskManager(config_manager)
+    task_ids = None
+    if args.task:
+        task_ids = set()
+        for id_or_prefix in args.task:
+            task = _find_task(task_manager, id_or_prefix)
+            if not task:
+                print(f"No task matches '{id_or_prefix}'", file=sys.stderr)
+                return 1
+            task_ids.add(task.id)
+    start_str = args.date_from.isoformat() if args.date_from else None
+    end_str = args.date_to.isoformat() if args.date_to else None
+    tag = normalize_tag(args.tag) if args.tag else None
+    to_file = args.output and args.output != "-"
+    if to_file:
+        out = open(args.output, 'w', encoding='utf-8', newline="" if args.format == ex.CSV else None)
+    else:
+        out = sys.stdout
+    try:
+        # Sessions are streamed from the log file, never loaded as a whole
+        task_count, session_count = ex.export(out, args.what, args.format, [task.to_dict() for task in task_manager.tasks],
+                                              ex.iter_session_file(config_manager.get_session_log_path()),
+                                              config_manager.get("work_duration"), start_str, end_str, task_ids, tag)
+    except ValueError as e:
+        print(f"Could not read the session log: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if to_file: out.close()
+    if to_file and args.format == ex.JSON:
+        print(f"Exported {task_count} tasks and {session_count} sessions to {args.output}")
+    elif to_file:
+        print(f"Exported {task_count or session_count} {args.what} to {args.output}")
+    return 0
+
+def cmd_plan(args, config_manager):
+    from . import planner
+    task_manager = TaskManager(config_manager)
+    capacity = args.capacity or config_manager.get("daily_pomodoro_capacity")
+    unscheduled = task_manager.get_unscheduled_active_tasks()
+    assignments, late, unplanned = planner.plan_days(unscheduled, capacity, args.start,
+                                                     planner.scheduled_load(task_manager.tasks))
+    if args.apply:
+        task_manager.schedule_tasks(assignments)
+
+    if args.json:
+        _print_json({"capacity": capacity, "applied": args.apply, "assignments": assignments,
+                     "late": [{"id": task.id, "due_date": task.due_date, "scheduled_date": date_str} for task, date_str in late],
+                     "unplanned": [task.id for task in unplanned]})
+        return 0
+    if not unscheduled:
+        print("No unscheduled active tasks to plan.")
+        return 0
+    by_date = {}
+    for task in unscheduled:
+        if task.id in assignments: by_date.setdefault(assignments[task.id], []).append(task)
+    for date_str in sorted(by_date):
+        planned = by_date[date_str]
+        print(f"{date_str}  ({sum(planner.remaining_pomodoros(task) for task in planned)} pomodoros)")
+        for task in planned: print(f"    {_task_row(task)}")
+    for task, date_str in late:
+        print(f"Warning: '{task.text}' is due {task.due_date} but only fits on {date_str}.")
+    if unplanned:
+        print(f"{len(unplanned)} task(s) didn't fit within {planner.MAX_DAYS} days (every day is already full):")
+        for task in unplanned: print(f"    {_task_row(task)}")
+    print(f"Scheduled {len(assignments)} task(s)." if args.apply else "Nothing changed yet; run again with --apply to schedule these.")
+    return 0
+
+def cmd_estimates(args, config_manager):
+    stats = TaskManager(config_manager).estimate_stats
+    if args.json:
+        _print_json(stats.summary(weeks=args.weeks))
+    else:
+        for line in stats.describe(weeks=args.weeks): print(line)
+    return 0
+
+def cmd_tags(args, config_manager):
+    task_manager = TaskManager(config_manager)
+    tag_index = task_manager.tags
+    tag_index.rebuild_sessions(config_manager.load_session_log(), config_manager.get("work_duration"), task_manager.get_task_tags)
+    start = args.date_from.isoformat() if args.date_from else None
+    end = args.date_to.isoformat() if args.date_to else None
+    rows = []
+    for tag in tag_index.all_tags():
+        row = tag_index.summary(tag)
+        if start or end:
+            row["session_pomodoros"], minutes = tag_index.focus_between(tag, start, end)
+            row["focus_minutes"] = round(minutes, 1)
+        rows.append(row)
+    if args.json:
+        _print_json(rows)
+    elif rows:
+        for row in rows:
+            print(f"#{row['tag']:<16} tasks: {row['active']} active / {row['tasks']}  pomodoros: {row['completed']}/{row['estimated']}  "
+                  f"focus: {sl.format_minutes(row['focus_minutes'])} ({row['session_pomodoros']} sessions)")
+    else:
+        print("No tags yet. Add one with '#tag' in a task's text or --tag.")
+    return 0
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024: return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def cmd_storage(args, config_manager):
+    if args.convert:
+        # Rewrites both files now rather than at the next save
+        config_manager.set("storage_format", args.convert)
+        TaskManager(config_manager).compact()
+        config_manager.save_session_log(config_manager.load_session_log())
+    files = {"session_log": config_manager.get_session_log_path(), "tasks": config_manager.get_tasks_snapshot_path()}
+    result = {"storage_format": config_manager.storage_serializer().name, "json_library": serializers.json_library(),
+              "files": {name: {"path": path, "format": serializers.format_of(path),
+                               "bytes": os.path.getsize(path) if os.path.exists(path) else 0}
+                        for name, path in files.items()}}
+    if args.benchmark:
+        # On this data directory's own contents, so the numbers reflect real history
+        datasets = {"session_log": config_manager.load_session_log(),
+                    "tasks": [task.to_dict() for task in TaskManager(config_manager).tasks]}
+        result["benchmark"] = {name: {"items": len(data), "results": serializers.benchmark(data, args.repeat)}
+                               for name, data in datasets.items()}
+    if args.json:
+        _print_json(result)
+        return 0
+    print(f"Storage format: {result['storage_format']}   JSON library: {result['json_library']}")
+    for name, info in result["files"].items():
+        print(f"  {name}: {info['format'] or 'not written yet'}, {_format_size(info['bytes'])}  ({info['path']})")
+    for name, bench in result.get("benchmark", {}).items():
+        print(f"\n{name} ({bench['items']} items, best of {args.repeat}):")
+        print(f"  {'format':<12}{'size':>10}{'save':>12}{'load':>12}")
+        for row in bench["results"]:
+            print(f"  {row['format']:<12}{_format_size(row['bytes']):>10}{row['save_ms']:>9.1f} ms{row['load_ms']:>9.1f} ms")
+    return 0
+
+def cmd_tui(args, config_manager):
+    from .tui import run # curses is only needed for this command
+    run(config_manager)
+    return 0
+
+def cmd_ctl(args, config_manager):
+    from . import control
+    path = config_manager.get("control_socket_path") or control.default_socket_path(config_manager.data_dir)
+    try:
+        if args.action == "subscribe":
+            for line in control.iter_events(path):
+                print(line, flush=True)
+            return 0
+        line = " ".join([args.action] + args.argument)
+        response = control.send_command(path, line)
+    except OSError as e:
+        print(f"Error: Could not reach a running HyperPomo at {path} ({e}). Is control_socket_enabled set?", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    print(response)
+    return 0 if response.startswith("OK") else 1
+
+def cmd_sync(args, config_manager):
+    from .sync import SyncManager
+    sync_dir = args.directory or config_manager.get("sync_dir")
+    if not sync_dir:
+        print("Error: No sync folder given and none saved yet. Pass one: sync /path/to/folder", file=sys.stderr)
+        return 1
+    if args.directory and not config_manager.get("sync_dir"):
+        config_manager.set("sync_dir", os.path.abspath(args.directory)) # Remember it for next time and for the app
+    task_manager = TaskManager(config_manager)
+    sync_manager = SyncManager(config_manager, task_manager, config_manager.load_session_log())
+    if args.export_only:
+        path, exported = sync_manager.export_changes(sync_dir)
+        stats = {"files": 0, "tasks_updated": 0, "tasks_deleted": 0, "sessions_added": 0, "exported": exported, "export_file": path}
+    elif args.import_only:
+        stats = sync_manager.import_changes(sync_dir)
+        stats["exported"], stats["export_file"] = 0, None
+    else:
+        stats = sync_manager.sync(sync_dir)
+    if args.json:
+        _print_json(stats)
+    else:
+        print(f"Imported {stats['files']} change file(s): {stats['tasks_updated']} task(s) updated, "
+              f"{stats['tasks_deleted']} deleted, {stats['sessions_added']} session(s) added.")
+        print(f"Exported {stats['exported']} change(s)" + (f" to {stats['export_file']}" if stats['export_file'] else " (nothing new)") + ".")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hyperpomo", description="HyperPomo command line tools. Run without arguments to start the app.")
+    parser.add_argument("--data-dir", default=None, help="Data directory (default: the app's data/ folder)")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    report = subparsers.add_parser("report", help="Show focus time for a date or a date range")
+    report.add_argument("date", nargs="?", type=parse_date, default=datetime.date.today(), help="Date to report (default: today)")
+    report.add_argument("--from", dest="date_from", type=parse_date, help="Start of range")
+    report.add_argument("--to", dest="date_to", type=parse_date, help="End of range")
+    report.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    report.set_defaults(func=cmd_report)
+
+    tasks = subparsers.add_parser("tasks", help="List tasks (active ones by default)")
+    tasks.add_argument("--date", type=parse_date, help="Only tasks scheduled on this date")
+    tasks.add_argument("--done", action="store_true", help="List completed tasks")
+    tasks.add_argument("--all", action="store_true", help="Include completed tasks")
+    tasks.add_argument("--overdue", action="store_true", help="Active tasks past their due date")
+    tasks.add_argument("--due-within", type=int, metavar="DAYS", help="Active tasks due from today through DAYS days ahead")
+    tasks.add_argument("--recurring", action="store_true", help="List recurring tasks and their rules")
+    tasks.add_argument("--tag", help="Only tasks with this tag")
+    tasks.add_argument("--search", metavar="TEXT", help="Only tasks whose text contains TEXT")
+    tasks.add_argument("--sort", choices=sorted(ORDER_FIELDS), help="Order by this field")
+    tasks.add_argument("--reverse", action="store_true", help="Reverse the --sort order")
+    tasks.add_argument("--limit", type=int, metavar="N", help="Show at most N tasks")
+    tasks.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    tasks.set_defaults(func=cmd_tasks)
+
+    add = subparsers.add_parser("add", help="Add a task")
+    add.add_argument("text", nargs="+", help="Task text")
+    add.add_argument("--est", type=int, default=None, help="Estimated pomodoros (default: suggested from similar completed tasks, else 1)")
+    add.add_argument("--date", type=parse_date, help="Scheduled date")
+    add.add_argument("--due", type=parse_date, help="Due date")
+    add.add_argument("--notes", help="Task notes")
+    add.add_argument("--parent", metavar="ID", help="Add as a subtask of this task (id or id prefix)")
+    add.add_argument("--tag", action="append", default=[], help="Tag the task (repeatable; '#tag' in the text works too)")
+    add_repeat = add.add_mutually_exclusive_group()
+    add_repeat.add_argument("--repeat", choices=[rec.DAILY, rec.WEEKDAYS, rec.WEEKLY], help="Repeat the task, starting on --date (default: today)")
+    add_repeat.add_argument("--every", type=int, metavar="DAYS", help="Repeat the task every DAYS days")
+    add.add_argument("--until", type=parse_date, help="Last day a repeating task occurs")
+    add.add_argument("--json", action="store_true", help="Print the new task as JSON")
+    add.set_defaults(func=cmd_add)
+
+    export = subparsers.add_parser("export", help="Export tasks and sessions as JSON, CSV or JSON Lines")
+    export.add_argument("-o", "--output", help="Output file (default: stdout)")
+    export.add_argument("--format", choices=ex.FORMATS, default=ex.JSON, help="json: tasks and sessions in one document (default); csv, jsonl: one row per item")
+    export.add_argument("--what", choices=[ex.SESSIONS, ex.TASKS], default=ex.SESSIONS, help="Rows to write for csv and jsonl (default: sessions)")
+    export.add_argument("--from", dest="date_from", type=parse_date, help="Only sessions (and tasks scheduled) from this date")
+    export.add_argument("--to", dest="date_to", type=parse_date, help="Only sessions (and tasks scheduled) up to this date")
+    export.add_argument("--task", action="append", metavar="ID", help="Only this task and its sessions (id or id prefix, repeatable)")
+    export.add_argument("--tag", help="Only tasks and sessions with this tag")
+    export.set_defaults(func=cmd_export)
+
+    plan = subparsers.add_parser("plan", help="Spread unscheduled tasks over the coming days by due date")
+    plan.add_argument("--capacity", type=int, help="Pomodoros per day (default: the daily_pomodoro_capacity setting)")
+    plan.add_argument("--from", dest="start", type=parse_date, default=datetime.date.today(), help="First day to plan (default: today)")
+    plan.add_argument("--apply", action="store_true", help="Save the plan (otherwise only show it)")
+    plan.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    plan.set_defaults(func=cmd_plan)
+
+    estimates = subparsers.add_parser("estimates", help="Show how actual pomodoros compare with estimates")
+    estimates.add_argument("--weeks", type=int, default=8, help="Weeks of trend to show (default: 8)")
+    estimates.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    estimates.set_defaults(func=cmd_estimates)
+
+    tags = subparsers.add_parser("tags", help="Show tasks, pomodoros and focus time per tag")
+    tags.add_argument("--from", dest="date_from", type=parse_date, help="Only count focus time from this date")
+    tags.add_argument("--to", dest="date_to", type=parse_date, help="Only count focus time up to this date")
+    tags.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    tags.set_defaults(func=cmd_tags)
+
+    storage = subparsers.add_parser("storage", help="Show or change how the session log and task snapshot are stored")
+    storage.add_argument("--convert", choices=sorted(serializers.SERIALIZERS), help="Switch to this format and rewrite both files now")
+    storage.add_argument("--benchmark", action="store_true", help="Time saving and loading this data in each format")
+    storage.add_argument("--repeat", type=int, default=3, help="Benchmark runs per format, best one kept (default: 3)")
+    storage.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    storage.set_defaults(func=cmd_storage)
+
+    tui = subparsers.add_parser("tui", help="Run the timer in the terminal (no display needed)")
+    tui.set_defaults(func=cmd_tui)
+
+    ctl = subparsers.add_parser("ctl", help="Send a command to the running app over its control socket")
+    ctl.add_argument("action", choices=["status", "start", "pause", "reset", "skip", "set-task", "subscribe", "help"])
+    ctl.add_argument("argument", nargs="*", help="Task id (or id prefix) for set-task")
+    ctl.set_defaults(func=cmd_ctl)
+
+    sync = subparsers.add_parser("sync", help="Exchange changes with other machines through a shared folder")
+    sync.add_argument("directory", nargs="?", help="Shared folder (default: the saved sync folder)")
+    sync_mode = sync.add_mutually_exclusive_group()
+    sync_mode.add_argument("--export-only", action="store_true", help="Only write this machine's changes")
+    sync_mode.add_argument("--import-only", action="store_true", help="Only apply other machines' changes")
+    sync.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    sync.set_defaults(func=cmd_sync)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    config_manager = ConfigManager(data_dir=args.data_dir or resource_path("data"))
+    try:
+        return args.func(args, config_manager)
+    except BrokenPipeError: # e.g. piped into head
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
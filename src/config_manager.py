@@ -1,6 +1,15 @@
 # HyperPomo/src/config_manager.py
+import datetime
 import json
 import os
+import struct
+
+from .file_lock import FileLock
+from . import session_log as sl
+from . import serializers
+from . import events
+from . import session_index
+from .serializers import SerializationError
 
 DEFAULT_SETTINGS = {
     "work_duration": 25,
@@ -12,8 +21,13 @@ DEFAULT_SETTINGS = {
     "work_end_sound": "sounds/work_end.mp3", # Default relative path
     "break_end_sound": "sounds/break_end.mp3", # Default relative path
     "always_on_top": False,
-    "tasks": [], 
-    "user_name": "User" 
+    "user_name": "User",
+    "control_socket_enabled": False,
+    "control_socket_path": "", # Empty means data/control.sock
+    "sync_dir": "", # Folder shared between machines (USB stick, synced folder); empty until first sync
+    "session_log_raw_days": 90, # Older sessions are folded into per-day, per-task rollups; 0 keeps everything
+    "daily_pomodoro_capacity": 8, # Used by the day planner
+    "storage_format": "json" # Session log and task snapshot: "json" (compact), "json-pretty" or "binary"
 }
 
 class ConfigManager:
@@ -23,46 +37,83 @@ class ConfigManager:
         # app.py now passes an absolute path via resource_path("data").
         self.data_dir = data_dir 
         self.filepath = os.path.join(self.data_dir, filename)
+        self._file_stamps = {} # path -> (mtime_ns, size) as of our last read or write
+        self._changed_keys = set() # Keys set() by this process, re-applied if another instance saved meanwhile
+        self.events = events.EventBus() # Shared by the TaskManager and PomodoroTimer built on this ConfigManager
         self._ensure_data_dir_exists() # Call this before loading
-        self.settings = self._load_settings()
+        # Held around every read-merge-write so several instances can share one data dir
+        self.lock = FileLock(os.path.join(self.data_dir, ".hyperpomo.lock"))
+        with self.lock:
+            self.settings = self._load_settings()
 
     def _ensure_data_dir_exists(self):
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True) 
 
+    def file_stamp(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _remember_stamp(self, path):
+        self._file_stamps[path] = self.file_stamp(path)
+
+    def known_stamp(self, path):
+        # file_stamp() as of this process's last read or write of the file
+        return self._file_stamps.get(path)
+
+    def has_external_change(self, path):
+        # True if the file differs from what this process last read or wrote
+        return self.file_stamp(path) != self._file_stamps.get(path)
+
+    def watched_files(self):
+        return [self.filepath, self.get_tasks_snapshot_path(), self.get_task_journal_path(), self.get_session_log_path()]
+
+    def storage_serializer(self):
+        return serializers.get(self.get("storage_format"))
+
+    def _write_atomic(self, path, data, serializer=serializers.PRETTY_JSON):
+        # Temp file + os.replace: readers (and other instances) never see a half-written file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(serializer.dumps(data))
+        os.replace(tmp_path, path)
+        self._remember_stamp(path)
+
+    def _with_defaults(self, loaded_settings):
+        # Returns (settings, whether any default had to be added); one dict merge, not a key-by-key pass
+        missing = DEFAULT_SETTINGS.keys() - loaded_settings.keys()
+        return ({**DEFAULT_SETTINGS, **loaded_settings} if missing else loaded_settings), bool(missing)
+
     def _load_settings(self):
         # _ensure_data_dir_exists() is called in __init__ before this now
         if not os.path.exists(self.filepath):
             # If settings file doesn't exist, create it with defaults
             current_settings = DEFAULT_SETTINGS.copy()
             try:
-                with open(self.filepath, 'w', encoding='utf-8') as f:
-                    json.dump(current_settings, f, indent=4)
+                self._write_atomic(self.filepath, current_settings)
                 return current_settings
             except IOError:
                 print(f"Error: Could not create default settings file at {self.filepath}")
                 return DEFAULT_SETTINGS.copy() # Fallback to in-memory defaults
 
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                loaded_settings = json.load(f)
-                # Ensure all default keys are present in loaded settings
-                # This is a simple merge; more complex merging might be needed for nested dicts if any
-                updated = False
-                for key, value in DEFAULT_SETTINGS.items():
-                    if key not in loaded_settings:
-                        loaded_settings[key] = value
-                        updated = True
-                if updated: # If we added missing keys, save the updated settings back
-                    self.save_settings(loaded_settings) # Pass the dict to save
-                return loaded_settings
-        except (json.JSONDecodeError, IOError):
+            self._remember_stamp(self.filepath)
+            loaded_settings = serializers.load_file(self.filepath)
+            if not isinstance(loaded_settings, dict): raise SerializationError("settings are not a JSON object")
+            # Ensure all default keys are present in loaded settings
+            loaded_settings, updated = self._with_defaults(loaded_settings)
+            if updated: # If we added missing keys, save the updated settings back
+                self.save_settings(loaded_settings) # Pass the dict to save
+            return loaded_settings
+        except (SerializationError, IOError):
             print(f"Warning: Could not load or parse {self.filepath}. Using default settings.")
             # Optionally, attempt to save defaults back to a potentially corrupted file or a new one
             current_settings = DEFAULT_SETTINGS.copy()
             try:
-                with open(self.filepath, 'w', encoding='utf-8') as f: # Overwrite/create with defaults
-                    json.dump(current_settings, f, indent=4)
+                self._write_atomic(self.filepath, current_settings) # Overwrite/create with defaults
             except IOError:
                 print(f"Error: Could not write default settings to {self.filepath} after load failure.")
             return current_settings
@@ -70,12 +121,45 @@ class ConfigManager:
 
     def save_settings(self, settings_to_save=None): # Allow passing specific dict to save
         self._ensure_data_dir_exists()
-        data_to_write = settings_to_save if settings_to_save is not None else self.settings
+        with self.lock:
+            if settings_to_save is None and self.has_external_change(self.filepath):
+                # Another instance saved since we last looked: keep its values, re-apply only ours
+                on_disk = self._read_settings_file()
+                if on_disk is not None:
+                    for key in self._changed_keys:
+                        if key in self.settings: on_disk[key] = self.settings[key]
+                    if "tasks" not in self.settings: on_disk.pop("tasks", None)
+                    self.settings.clear()
+                    self.settings.update(on_disk)
+            data_to_write = settings_to_save if settings_to_save is not None else self.settings
+            try:
+                self._write_atomic(self.filepath, data_to_write)
+                self._changed_keys.clear()
+            except IOError:
+                print(f"Error: Could not save settings to {self.filepath}")
+
+    def _read_settings_file(self):
         try:
-            with open(self.filepath, 'w', encoding='utf-8') as f:
-                json.dump(data_to_write, f, indent=4)
-        except IOError:
-            print(f"Error: Could not save settings to {self.filepath}")
+            stamp = self.file_stamp(self.filepath)
+            loaded_settings = serializers.load_file(self.filepath)
+        except (SerializationError, IOError):
+            return None
+        if not isinstance(loaded_settings, dict): return None
+        self._file_stamps[self.filepath] = stamp
+        return self._with_defaults(loaded_settings)[0]
+
+    def reload_settings(self):
+        # Picks up settings.json changes made by another instance or by hand.
+        # Returns the set of keys whose values changed (empty if the file is untouched).
+        if not self.has_external_change(self.filepath): return set()
+        with self.lock:
+            on_disk = self._read_settings_file()
+        if on_disk is None: return set()
+        changed = {key for key in set(on_disk) | set(self.settings) if on_disk.get(key) != self.settings.get(key)}
+        self.settings.clear()
+        self.settings.update(on_disk)
+        for key in changed: self.events.publish(events.SETTING_CHANGED, key)
+        return changed
 
     def get(self, key, default=None):
         # Ensure self.settings is initialized
@@ -87,39 +171,193 @@ class ConfigManager:
     def set(self, key, value):
         if self.settings is None: # Should not happen
              self.settings = DEFAULT_SETTINGS.copy()
+        changed = self.settings.get(key) != value
         self.settings[key] = value
+        self._changed_keys.add(key)
         self.save_settings() # This will save the entire self.settings dictionary
+        if changed: self.events.publish(events.SETTING_CHANGED, key)
+
+    def get_tasks_snapshot_path(self):
+        self._ensure_data_dir_exists()
+        return os.path.join(self.data_dir, "tasks.json")
+
+    def get_task_journal_path(self):
+        self._ensure_data_dir_exists()
+        return os.path.join(self.data_dir, "tasks_journal.jsonl")
 
     def get_all_tasks(self):
         if self.settings is None: self.settings = DEFAULT_SETTINGS.copy()
+        snapshot_path = self.get_tasks_snapshot_path()
+        if os.path.exists(snapshot_path):
+            try:
+                tasks = serializers.load_file(snapshot_path)
+                return tasks if isinstance(tasks, list) else []
+            except (SerializationError, IOError):
+                print(f"Warning: Could not load task snapshot {snapshot_path}.")
+                return []
+        # Older versions kept the task list inside settings.json
         tasks = self.settings.get("tasks")
         return tasks if isinstance(tasks, list) else []
 
 
     def save_tasks(self, tasks):
+        # Writes the full task snapshot. Written to a temp file first so a crash can't leave half a snapshot.
         if self.settings is None: self.settings = DEFAULT_SETTINGS.copy()
-        self.settings["tasks"] = tasks
-        self.save_settings()
+        snapshot_path = self.get_tasks_snapshot_path()
+        with self.lock:
+            try:
+                self._write_atomic(snapshot_path, tasks, self.storage_serializer())
+            except IOError:
+                print(f"Error: Could not save task snapshot to {snapshot_path}")
+                return False
+            if "tasks" in self.settings: # Migrated out of settings.json
+                del self.settings["tasks"]
+                self.save_settings()
+        return True
+
+    def read_task_journal(self, offset=0):
+        # Returns (records, end_offset) for the journal from byte offset onwards. An incomplete last
+        # line (another instance mid-append, or a crash) is left for the next read.
+        journal_path = self.get_task_journal_path()
+        records = []
+        try:
+            with open(journal_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return records, 0
+        except IOError:
+            print(f"Warning: Could not read task journal {journal_path}.")
+            return records, offset
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            line = line.strip()
+            if not line: continue
+            try:
+                records.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print(f"Warning: Skipping unreadable line in task journal {journal_path}.")
+        return records, offset + complete
+
+    def task_journal_size(self):
+        stamp = self.file_stamp(self.get_task_journal_path())
+        return stamp[1] if stamp else 0
+
+    def append_task_journal(self, records):
+        if not records: return
+        journal_path = self.get_task_journal_path()
+        try:
+            with self.lock, open(journal_path, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(record, separators=(',', ':')) + "\n" for record in records))
+        except IOError:
+            print(f"Error: Could not append to task journal {journal_path}")
+
+    def clear_task_journal(self):
+        journal_path = self.get_task_journal_path()
+        try:
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+        except OSError:
+            print(f"Error: Could not clear task journal {journal_path}")
+
+    def get_checkpoint_path(self):
+        self._ensure_data_dir_exists()
+        return os.path.join(self.data_dir, "session_checkpoint.bin")
+
+    def get_sync_state_path(self):
+        self._ensure_data_dir_exists()
+        return os.path.join(self.data_dir, "sync_state.json")
+
+    def load_json_file(self, path, default=None):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+        except (json.JSONDecodeError, IOError):
+            print(f"Warning: Could not load {path}.")
+            return default
+
+    def save_json_file(self, path, data):
+        try:
+            with self.lock:
+                self._write_atomic(path, data)
+            return True
+        except IOError:
+            print(f"Error: Could not save {path}")
+            return False
 
     def get_session_log_path(self):
         self._ensure_data_dir_exists()
         return os.path.join(self.data_dir, "session_log.json")
 
-    def load_session_log(self):
+    def get_session_index_path(self):
+        # Fixed-width index of the session log by date (session_index.py), rebuilt from the log when stale
+        self._ensure_data_dir_exists()
+        return os.path.join(self.data_dir, "session_index.bin")
+
+    def load_session_log(self, locked=True):
+        # locked=False skips the lock for a plain read: the log is only ever replaced atomically, so
+        # a reader sees either the old or the new file. Startup uses that to overlap it with task loading.
         log_path = self.get_session_log_path()
+        if not locked: return self._read_session_log_file(log_path)
+        with self.lock:
+            return self._read_session_log_file(log_path)
+
+    def _read_session_log_file(self, log_path):
         if os.path.exists(log_path):
             try:
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                self._remember_stamp(log_path)
+                return serializers.load_file(log_path)
+            except (SerializationError, IOError):
                 print(f"Warning: Could not load session log {log_path}.")
                 return []
         return []
 
-    def save_session_log(self, log_data):
+    def merge_session_entries(self, log_data, other_entries):
+        # Adds entries we don't have yet (matched by id) and keeps the log in timestamp order
+        return sl.merge_entries(log_data, other_entries)
+
+    def reload_session_log(self, log_data):
+        # Merges sessions logged by another instance into log_data in place; returns the new entries
         log_path = self.get_session_log_path()
-        try:
-            with open(log_path, 'w', encoding='utf-8') as f:
-                json.dump(log_data, f, indent=4)
-        except IOError:
-            print(f"Error: Could not save session log to {log_path}")
\ No newline at end of file
+        if not self.has_external_change(log_path): return []
+        with self.lock:
+            return self.merge_session_entries(log_data, self._read_session_log_file(log_path))
+
+    def save_session_log(self, log_data, new_entries=()):
+        # new_entries: sessions just appended to log_data, added to the session index in place.
+        # Returns the entries merged in from another instance's writes, if any
+        log_path = self.get_session_log_path()
+        merged = []
+        with self.lock:
+            if self.has_external_change(log_path):
+                # Don't clobber sessions another instance logged since our last read
+                merged = self.merge_session_entries(log_data, self._read_session_log_file(log_path))
+            old_stamp = self.file_stamp(log_path)
+            try:
+                self._write_atomic(log_path, log_data, self.storage_serializer())
+            except IOError:
+                print(f"Error: Could not save session log to {log_path}")
+                return merged
+            # A merged rollup may have changed an entry the index already has; it is rebuilt instead
+            if new_entries and not any(entry.get("type") == sl.ROLLUP for entry in merged):
+                try:
+                    session_index.append(log_path, self.get_session_index_path(), old_stamp, log_data, new_entries)
+                except (OSError, ValueError, struct.error) as e: # Left stale, so it is rebuilt on next use
+                    print(f"Warning: Could not update session index: {e}")
+        return merged
+
+    def compact_session_log(self, log_data):
+        # Folds sessions older than the "session_log_raw_days" horizon into daily rollups and saves
+        # if anything changed. Returns the number of entries folded.
+        raw_days = self.get("session_log_raw_days", 0)
+        if not raw_days or raw_days <= 0: return 0
+        cutoff = (datetime.date.today() - datetime.timedelta(days=raw_days)).isoformat()
+        with self.lock:
+            log_path = self.get_session_log_path()
+            if self.has_external_change(log_path):
+                self.merge_session_entries(log_data, self._read_session_log_file(log_path))
+            folded = sl.compact_entries(log_data, cutoff, self.get("work_duration"))
+            if folded: self.save_session_log(log_data)
+        return folded
@@ -0,0 +1,210 @@
+# HyperPomo/src/control.py
+# Optional local control socket so scripts, status bars and WM keybindings can read and drive
+# the running timer. Line based protocol over a Unix domain socket:
+#
+#   request:   <command> [argument]\n
+#   response:  OK <json>\n   or   ERR <message>\n
+#   events:    EVENT <name> <json>\n   (only sent after "subscribe")
+#
+# Commands: status, start, pause, reset, skip, set-task <task id or id prefix>, subscribe, help.
+# Everything runs on the caller's thread: the front end calls poll() when the socket is readable.
+import json
+import os
+import selectors
+import socket
+
+CONTROL_SOCKET_AVAILABLE = hasattr(socket, "AF_UNIX")
+
+MAX_LINE_LENGTH = 4096
+MAX_PENDING_OUTPUT = 256 * 1024 # A subscriber that stops reading is dropped past this
+
+def default_socket_path(data_dir):
+    return os.path.join(data_dir, "control.sock")
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b""
+        self.outbuf = b""
+        self.subscribed = False
+
+class ControlServer:
+    def __init__(self, path, handlers):
+        # handlers: {"command": callable(argument_string) -> dict}. A handler reports a failure
+        # by raising ValueError with the message to send back.
+        self.path = path
+        self.handlers = dict(handlers)
+        self.selector = None
+        self.listener = None
+        self.clients = {}
+        self.subscriber_count = 0
+
+    def start(self):
+        if not CONTROL_SOCKET_AVAILABLE:
+            print("Warning: Unix domain sockets are not available on this platform. Control socket disabled.")
+            return False
+        if os.path.exists(self.path):
+            if _socket_is_live(self.path):
+                print(f"Warning: Another HyperPomo instance is already listening on {self.path}. Control socket disabled.")
+                return False
+            try: os.unlink(self.path) # Left behind by a crashed instance
+            except OSError: pass
+        try:
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self.path)
+            os.chmod(self.path, 0o600) # Only the current user may drive the timer
+            listener.listen(8)
+            listener.setblocking(False)
+        except OSError as e:
+            print(f"Error: Could not open control socket at {self.path}: {e}")
+            return False
+        self.listener = listener
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(listener, selectors.EVENT_READ)
+        return True
+
+    def fileno(self):
+        # epoll/kqueue selectors expose one fd that turns readable whenever any socket is ready,
+        # so a GUI loop can watch that single fd. Returns None for selectors without one.
+        try:
+            return self.selector.fileno() if self.selector else None
+        except (AttributeError, NotImplementedError):
+            return None
+
+    def poll(self):
+        if not self.selector: return
+        for key, events in self.selector.select(0):
+            if key.fileobj is self.listener:
+                self._accept()
+                continue
+            client = self.clients.get(key.fileobj)
+            if not client: continue
+            if events & selectors.EVENT_READ:
+                self._read(client)
+            if events & selectors.EVENT_WRITE and client.sock in self.clients:
+                self._flush(client)
+
+    def publish(self, event_name, payload):
+        if not self.subscriber_count: return # Cheap no-op for the common case
+        line = f"EVENT {event_name} {json.dumps(payload, separators=(',', ':'))}\n".encode("utf-8")
+        for client in list(self.clients.values()):
+            if client.subscribed:
+                self._send(client, line)
+
+    def close(self):
+        for client in list(self.clients.values()):
+            self._drop(client)
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+            try: os.unlink(self.path)
+            except OSError: pass
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        self.clients[sock] = _Client(sock)
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        client.inbuf += data
+        while b"\n" in client.inbuf:
+            line, client.inbuf = client.inbuf.split(b"\n", 1)
+            self._handle_line(client, line.decode("utf-8", "replace").strip())
+            if client.sock not in self.clients: return
+        if len(client.inbuf) > MAX_LINE_LENGTH:
+            self._send(client, b"ERR line too long\n")
+            self._drop(client)
+
+    def _handle_line(self, client, line):
+        if not line: return
+        command, _, argument = line.partition(" ")
+        command = command.lower()
+        if command == "help":
+            result = {"commands": sorted(list(self.handlers) + ["subscribe", "help"])}
+        elif command == "subscribe":
+            if not client.subscribed:
+                client.subscribed = True
+                self.subscriber_count += 1
+            result = {"subscribed": True}
+        elif command in self.handlers:
+            try:
+                result = self.handlers[command](argument.strip())
+            except ValueError as e:
+                self._send(client, f"ERR {e}\n".encode("utf-8"))
+                return
+        else:
+            self._send(client, f"ERR unknown command '{command}'\n".encode("utf-8"))
+            return
+        self._send(client, f"OK {json.dumps(result, separators=(',', ':'))}\n".encode("utf-8"))
+
+    def _send(self, client, data):
+        client.outbuf += data
+        if len(client.outbuf) > MAX_PENDING_OUTPUT:
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client):
+        try:
+            sent = client.sock.send(client.outbuf) if client.outbuf else 0
+            client.outbuf = client.outbuf[sent:]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._drop(client)
+            return
+        # Only ask for write readiness while there is something queued
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbuf else 0)
+        self.selector.modify(client.sock, events)
+
+    def _drop(self, client):
+        if client.sock not in self.clients: return
+        del self.clients[client.sock]
+        if client.subscribed: self.subscriber_count -= 1
+        try: self.selector.unregister(client.sock)
+        except (KeyError, ValueError): pass
+        client.sock.close()
+
+def _socket_is_live(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+def send_command(path, line, timeout=2.0):
+    # Sends one command and returns the response line (without the trailing newline)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(line.strip().encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            return reader.readline().rstrip("\n")
+
+def iter_events(path):
+    # Subscribes and yields raw response/event lines until the app goes away
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(b"subscribe\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                yield line.rstrip("\n")
@@ -0,0 +1,201 @@
+# HyperPomo/src/daily_summary.py
+# The daily summary panel as a model of independent sections, and a view that patches a Text widget
+# section by section.
+#
+# DailySummary holds each section's lines for one day. A new session appends one line to "sessions"
+# and recomputes the two "totals" lines. The task sections keep the day's tasks by id, so a changed
+# task is patched into them (update_tasks) without querying the day again. SummaryView knows how many
+# characters each section occupies in the widget and edits only the lines of a section that differ,
+# leaving the rest of the text (and the scroll position) alone.
+# No tkinter import: the view only calls methods on the widget it is given.
+from . import session_log as sl
+
+SECTIONS = ("sessions", "totals", "completed", "active", "tags", "estimates")
+
+class DailySummary:
+    def __init__(self, date_str, work_duration, session_log_version=None):
+        self.date_str = date_str
+        self.work_duration = work_duration
+        self.session_log_version = session_log_version # PomodoroTimer.session_log_version it was built from
+        self.lines = {name: [] for name in SECTIONS}
+        self.pomodoros = 0
+        self.focus_minutes = 0.0
+        self.logged_task_texts = set()
+        self._session_lines = []
+        self._completed = {} # Task id -> task, for tasks of the day completed on it; listed in completion order
+        # Task id -> task: the day's active tasks scheduled on it, then unscheduled ones, each listed oldest first
+        self._active = ({}, {})
+        self.active_limit = 0
+        self._update_totals()
+
+    # Sessions and totals
+    def _entry_lines(self, entry):
+        if entry.get("type") == sl.ROLLUP:
+            # Older days only keep per-task totals
+            self.pomodoros += entry.get("pomodoros", 0)
+            self.focus_minutes += entry.get("focus_minutes", 0.0)
+            lines = []
+            if entry.get("pomodoros"):
+                task_info = f" (Task: {entry['task_text'][:30]})" if entry.get("task_text") else ""
+                lines.append(f"  - Work: {entry['pomodoros']} x, {entry['focus_minutes']:.1f} min{task_info}")
+            if entry.get("break_minutes"):
+                lines.append(f"  - Breaks: {entry['break_minutes']:.1f} min")
+            return lines
+        if entry.get("skipped", False):
+            return []
+        if entry.get("type") == sl.WORK:
+            minutes = sl.entry_minutes(entry, self.work_duration)
+            self.pomodoros += 1
+            self.focus_minutes += minutes
+            if entry.get("task_text"): self.logged_task_texts.add(entry["task_text"])
+            task_info = f" (Task: {entry['task_text'][:30]})" if entry.get("task_text") else ""
+            return [f"  - Work: {minutes:.1f} min{task_info}"]
+        return [f"  - {entry['type']}: {sl.entry_minutes(entry, self.work_duration):.1f} min"]
+
+    def _update_sessions_section(self):
+        self.lines["sessions"] = (["--- Pomodoro Sessions ---"] + self._session_lines + [""]) if self._session_lines else []
+
+    def _update_totals(self):
+        self.lines["totals"] = [f"Total Pomodoros Completed: {self.pomodoros}",
+                                f"Total Focus Time: {sl.format_minutes(self.focus_minutes)}"]
+
+    def set_sessions(self, entries):
+        self.pomodoros, self.focus_minutes = 0, 0.0
+        self.logged_task_texts = set()
+        self._session_lines = []
+        for entry in entries: self._session_lines.extend(self._entry_lines(entry))
+        self._update_sessions_section()
+        self._update_totals()
+
+    def add_session(self, entry):
+        # Returns the lines to append to "sessions", or None when the section needs redrawing
+        # (its heading appears with the first line)
+        logged_before = len(self.logged_task_texts)
+        new_lines = self._entry_lines(entry)
+        had_lines = bool(self._session_lines)
+        self._session_lines.extend(new_lines)
+        self._update_sessions_section()
+        self._update_totals()
+        if len(self.logged_task_texts) != logged_before: self._update_active_section() # Logged tasks leave "active"
+        return new_lines if had_lines else None
+
+    # Task sections
+    def _completed_on_day(self, task):
+        # Scheduled for the day and also completed on it
+        return task.done and task.scheduled_date == self.date_str and bool(task.completed_at) \
+            and task.completed_at.startswith(self.date_str)
+
+    def _update_completed_section(self):
+        self.lines["completed"] = ["", "--- Tasks Completed on this Day ---"]
+        done_in_order = sorted(self._completed.values(), key=lambda task: task.completed_at)
+        self.lines["completed"].extend(f"  [X] {task.text} (Actual Pomos: {task.completed_pomodoros})" for task in done_in_order)
+        if not self._completed: self.lines["completed"].append("  No tasks marked complete for this day.")
+
+    def _update_active_section(self):
+        self.lines["active"] = ["", "--- Active Tasks Scheduled for this Day ---"]
+        hidden = 0
+        for group in self._active:
+            for task in sorted(group.values(), key=lambda task: (task.created_at or "", task.id)):
+                if task.done or task.text in self.logged_task_texts: continue
+                if len(self.lines["active"]) - 2 < self.active_limit:
+                    self.lines["active"].append(f"  [ ] {task.text} (Est: {task.estimated_pomodoros})")
+                else:
+                    hidden += 1
+        if hidden:
+            self.lines["active"].append(f"  ... and {hidden} more")
+        elif not (self._active[0] or self._active[1]):
+            self.lines["active"].append("  None.")
+
+    def set_completed(self, tasks):
+        # tasks: the day's completed tasks
+        self._completed = {task.id: task for task in tasks if self._completed_on_day(task)}
+        self._update_completed_section()
+
+    def set_active(self, tasks, limit):
+        self.active_limit = limit
+        self._active = ({}, {})
+        for task in tasks: self._active[not task.scheduled_date][task.id] = task
+        self._update_active_section()
+
+    def update_tasks(self, changed):
+        # changed: (task id, task or None if removed, whether it is among the day's active tasks)
+        # for each task that changed
+        for task_id, task, listed in changed:
+            if task is not None and self._completed_on_day(task): self._completed[task_id] = task
+            else: self._completed.pop(task_id, None)
+            group = self._active[not task.scheduled_date] if listed else None
+            for other in self._active:
+                if other is not group: other.pop(task_id, None)
+            if group is not None: group[task_id] = task # May be a new object, e.g. a materialized occurrence
+        self._update_completed_section()
+        self._update_active_section()
+
+    def set_tag_focus(self, tag_focus):
+        # tag -> (pomodoros, focus minutes) for the day
+        self.lines["tags"] = []
+        if tag_focus:
+            self.lines["tags"] = ["", "--- Focus by Tag ---"]
+            for tag, (pomodoros, minutes) in sorted(tag_focus.items(), key=lambda item: -item[1][1]):
+                self.lines["tags"].append(f"  #{tag}: {pomodoros} pomodoro(s), {sl.format_minutes(minutes)}")
+
+    def set_estimates(self, lines):
+        self.lines["estimates"] = ["", "--- Estimate Accuracy ---"] + [f"  {line}" for line in lines]
+
+    def text(self, name):
+        return "".join(line + "\n" for line in self.lines[name])
+
+class SummaryView:
+    def __init__(self, text_widget):
+        self.widget = text_widget
+        self._rendered = {name: "" for name in SECTIONS} # What each section currently shows
+
+    def _offset(self, name):
+        offset = 0
+        for section in SECTIONS:
+            if section == name: break
+            offset += len(self._rendered[section])
+        return offset
+
+    def _start(self, name):
+        return f"1.0 + {self._offset(name)} chars"
+
+    def _edit(self, change):
+        scroll_at = self.widget.yview()[0]
+        self.widget.config(state="normal")
+        change()
+        self.widget.config(state="disabled")
+        self.widget.yview_moveto(scroll_at)
+
+    def show(self, summary, names=SECTIONS):
+        # Redraws the given sections, each only from its first to its last changed line
+        for name in names:
+            new_text = summary.text(name)
+            old_text = self._rendered[name]
+            if new_text == old_text: continue
+            old_lines, new_lines = old_text.splitlines(True), new_text.splitlines(True)
+            same_head = 0
+            while same_head < min(len(old_lines), len(new_lines)) and old_lines[same_head] == new_lines[same_head]:
+                same_head += 1
+            same_tail = 0
+            while same_tail < min(len(old_lines), len(new_lines)) - same_head and old_lines[-1 - same_tail] == new_lines[-1 - same_tail]:
+                same_tail += 1
+            start = self._offset(name) + sum(len(line) for line in old_lines[:same_head])
+            removed = "".join(old_lines[same_head:len(old_lines) - same_tail])
+            added = "".join(new_lines[same_head:len(new_lines) - same_tail])
+            def replace(start=start, removed=removed, added=added):
+                if removed: self.widget.delete(f"1.0 + {start} chars", f"1.0 + {start + len(removed)} chars")
+                if added: self.widget.insert(f"1.0 + {start} chars", added)
+            self._edit(replace)
+            self._rendered[name] = new_text
+
+    def append(self, name, lines):
+        # Adds lines at the end of a section's body, before its trailing blank line
+        if not lines: return
+        added = "".join(line + "\n" for line in lines)
+        body_end = len(self._rendered[name]) - 1 # The section ends with one blank line
+        self._edit(lambda: self.widget.insert(f"{self._start(name)} + {body_end} chars", added))
+        self._rendered[name] = self._rendered[name][:body_end] + added + self._rendered[name][body_end:]
+
+    def clear(self):
+        self._edit(lambda: self.widget.delete("1.0", "end"))
+        self._rendered = {name: "" for name in SECTIONS}
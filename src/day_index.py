@@ -0,0 +1,54 @@
+# HyperPomo/src/day_index.py
+# Per-day activity for the calendar: focus from the session log, plus scheduled and due tasks.
+#
+# DailyFocus keeps date -> [pomodoros, focus minutes], grown one entry per logged session and only
+# rebuilt when entries from elsewhere are merged in. month_activity() then answers for the days of
+# one month from DailyFocus and TaskManager's schedule, deadline and recurrence indexes, so the cost
+# is per day shown, not per task or session.
+import calendar
+import datetime
+
+from . import session_log as sl
+
+class DailyFocus:
+    def __init__(self):
+        self.days = {} # date string -> [pomodoros, focus minutes]
+
+    def add(self, entry, work_duration):
+        if entry.get("type") == sl.ROLLUP:
+            pomodoros, minutes = entry.get("pomodoros", 0), entry.get("focus_minutes", 0.0)
+        elif entry.get("type") == sl.WORK and not entry.get("skipped", False):
+            pomodoros, minutes = 1, sl.entry_minutes(entry, work_duration)
+        else:
+            return None
+        date_str = entry.get("session_for_date")
+        if not date_str: return None
+        day = self.days.setdefault(date_str, [0, 0.0])
+        day[0] += pomodoros; day[1] += minutes
+        return date_str
+
+    def rebuild(self, session_log, work_duration):
+        self.days = {}
+        for entry in session_log: self.add(entry, work_duration)
+
+    def on(self, date_str):
+        return tuple(self.days.get(date_str, (0, 0.0)))
+
+def month_days(year, month):
+    return [datetime.date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+
+def month_activity(task_manager, daily_focus, year, month):
+    # date -> {"scheduled", "due", "pomodoros", "focus_minutes"}, for the days of the month with any.
+    # "scheduled" counts open tasks only; unstored recurring occurrences are never done.
+    days = month_days(year, month)
+    due_counts = task_manager.deadlines.due_counts_between(days[0].isoformat(), days[-1].isoformat())
+    activity = {}
+    for day in days:
+        date_str = day.isoformat()
+        scheduled = sum(1 for task_id in task_manager.schedule.ids_on(date_str) if not task_manager.get_task_by_id(task_id).done)
+        scheduled += len(task_manager.occurrences_on(day))
+        pomodoros, minutes = daily_focus.on(date_str)
+        due = due_counts.get(date_str, 0)
+        if scheduled or due or pomodoros:
+            activity[day] = {"scheduled": scheduled, "due": due, "pomodoros": pomodoros, "focus_minutes": minutes}
+    return activity
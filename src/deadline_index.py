@@ -0,0 +1,80 @@
+# HyperPomo/src/deadline_index.py
+# Sorted (due date, task id) index of active tasks that have a due date. TaskManager keeps it
+# current task by task; queries are a bisect plus the matching slice, never a scan of all tasks.
+import bisect
+import datetime
+
+class DeadlineIndex:
+    def __init__(self):
+        self._entries = [] # Sorted (due date string, task id)
+        self._due_by_id = {} # task id -> due date string, to find a task's entry again
+
+    def update(self, task):
+        due = task.due_date if task.due_date and not task.done else None
+        old = self._due_by_id.get(task.id)
+        if old == due: return
+        if old is not None: self.discard(task.id)
+        if due is not None:
+            bisect.insort(self._entries, (due, task.id))
+            self._due_by_id[task.id] = due
+
+    def discard(self, task_id):
+        due = self._due_by_id.pop(task_id, None)
+        if due is None: return
+        i = bisect.bisect_left(self._entries, (due, task_id))
+        if i < len(self._entries) and self._entries[i] == (due, task_id):
+            del self._entries[i]
+
+    def rebuild(self, tasks):
+        self._due_by_id = {task.id: task.due_date for task in tasks if task.due_date and not task.done}
+        self._entries = sorted((due, task_id) for task_id, due in self._due_by_id.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def overdue_ids(self, today=None):
+        # Due before today, most overdue first
+        today_str = (today or datetime.date.today()).isoformat()
+        return [task_id for _, task_id in self._entries[:bisect.bisect_left(self._entries, (today_str,))]]
+
+    def overdue_count(self, today=None):
+        today_str = (today or datetime.date.today()).isoformat()
+        return bisect.bisect_left(self._entries, (today_str,))
+
+    def _window(self, days, today):
+        # Slice bounds of entries due from today up to and including today + days
+        today = today or datetime.date.today()
+        after_end_str = (today + datetime.timedelta(days=days + 1)).isoformat()
+        return (bisect.bisect_left(self._entries, (today.isoformat(),)),
+                bisect.bisect_left(self._entries, (after_end_str,)))
+
+    def due_within_ids(self, days, today=None):
+        start, end = self._window(days, today)
+        return [task_id for _, task_id in self._entries[start:end]]
+
+    def due_within_count(self, days, today=None):
+        start, end = self._window(days, today)
+        return end - start
+
+    def next_deadline(self, today=None):
+        # (due date string, task id) of the nearest deadline from today on, or None
+        today_str = (today or datetime.date.today()).isoformat()
+        i = bisect.bisect_left(self._entries, (today_str,))
+        return self._entries[i] if i < len(self._entries) else None
+
+    def due_counts_between(self, start_str, end_str):
+        # date string -> active tasks due that day, for an inclusive date range
+        counts = {}
+        start = bisect.bisect_left(self._entries, (start_str,))
+        for due, _ in self._entries[start:bisect.bisect_left(self._entries, (end_str + "~",))]:
+            counts[due] = counts.get(due, 0) + 1
+        return counts
+
+    def due_status(self, task_id, soon_days=2, today=None):
+        # "overdue", "due_soon" or None for one task, O(1)
+        due = self._due_by_id.get(task_id)
+        if due is None: return None
+        today = today or datetime.date.today()
+        if due < today.isoformat(): return "overdue"
+        if due <= (today + datetime.timedelta(days=soon_days)).isoformat(): return "due_soon"
+        return None
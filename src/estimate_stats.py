@@ -0,0 +1,122 @@
+# HyperPomo/src/estimate_stats.py
+# Running statistics on how completed pomodoros compare with estimates. TaskManager feeds every
+# task change through update()/discard(), each O(1); nothing here scans the task list.
+# A task counts once it is done with at least one pomodoro logged and a non-zero estimate.
+import datetime
+import heapq
+
+# Display buckets for the distribution of actual/estimated ratios: (label, upper bound inclusive)
+RATIO_BUCKETS = (("<= 0.5x", 0.5), ("0.5-1x", 0.99), ("on target", 1.0), ("1-1.5x", 1.5), ("1.5-2x", 2.0), ("> 2x", float("inf")))
+
+def _week_of(iso_timestamp):
+    try:
+        year, week, _ = datetime.date.fromisoformat(iso_timestamp[:10]).isocalendar()
+    except (TypeError, ValueError):
+        return None
+    return f"{year}-W{week:02d}"
+
+class EstimateStats:
+    def __init__(self):
+        self._contributions = {} # task id -> (ratio, week), what the task currently adds in
+        self.count = 0
+        self.ratio_sum = 0.0
+        self.on_target = 0
+        self.underestimated = 0 # Took more pomodoros than estimated
+        self.overestimated = 0
+        self.ratios = {} # ratio rounded to 2 places -> count; few distinct values, so the median stays cheap
+        self.weeks = {} # "YYYY-Www" of completion -> [count, ratio_sum]
+
+    @staticmethod
+    def _contribution(task):
+        if not task.done or task.estimated_pomodoros <= 0 or task.completed_pomodoros <= 0:
+            return None
+        return round(task.completed_pomodoros / task.estimated_pomodoros, 2), _week_of(task.completed_at)
+
+    def _apply(self, contribution, sign):
+        ratio, week = contribution
+        self.count += sign
+        self.ratio_sum += sign * ratio
+        if ratio == 1.0: self.on_target += sign
+        elif ratio > 1.0: self.underestimated += sign
+        else: self.overestimated += sign
+        self.ratios[ratio] = self.ratios.get(ratio, 0) + sign
+        if not self.ratios[ratio]: del self.ratios[ratio]
+        if week:
+            totals = self.weeks.setdefault(week, [0, 0.0])
+            totals[0] += sign; totals[1] += sign * ratio
+            if not totals[0]: del self.weeks[week]
+
+    def update(self, task):
+        old = self._contributions.pop(task.id, None)
+        if old: self._apply(old, -1)
+        new = self._contribution(task)
+        if new:
+            self._contributions[task.id] = new
+            self._apply(new, 1)
+
+    def discard(self, task_id):
+        old = self._contributions.pop(task_id, None)
+        if old: self._apply(old, -1)
+
+    def rebuild(self, tasks):
+        self.__init__()
+        for task in tasks: self.update(task)
+
+    @property
+    def mean_ratio(self):
+        return self.ratio_sum / self.count if self.count else None
+
+    @property
+    def median_ratio(self):
+        if not self.count: return None
+        seen = 0
+        ordered = sorted(self.ratios.items())
+        lower = upper = None
+        for ratio, n in ordered:
+            seen += n
+            if lower is None and seen >= (self.count + 1) // 2: lower = ratio
+            if seen >= self.count // 2 + 1:
+                upper = ratio
+                break
+        return (lower + upper) / 2
+
+    def distribution(self):
+        buckets = {label: 0 for label, _ in RATIO_BUCKETS}
+        for ratio, n in self.ratios.items():
+            for label, bound in RATIO_BUCKETS:
+                if ratio <= bound:
+                    buckets[label] += n
+                    break
+        return buckets
+
+    def weekly_trend(self, weeks=8):
+        # The most recent weeks with completed tasks, oldest first: (week, tasks, mean ratio)
+        recent = sorted(self.weeks.items())[-weeks:]
+        return [(week, n, total / n) for week, (n, total) in recent]
+
+    def furthest_off(self, get_task, count=5):
+        # The counted tasks whose pomodoros missed the estimate by the most, looked up through get_task(id)
+        tasks = (get_task(task_id) for task_id in self._contributions)
+        worst = heapq.nlargest(count, (task for task in tasks if task),
+                               key=lambda task: abs(task.completed_pomodoros - task.estimated_pomodoros))
+        return [task for task in worst if task.completed_pomodoros != task.estimated_pomodoros]
+
+    def summary(self, weeks=8):
+        return {
+            "tasks": self.count, "mean_ratio": self.mean_ratio, "median_ratio": self.median_ratio,
+            "on_target": self.on_target, "underestimated": self.underestimated, "overestimated": self.overestimated,
+            "distribution": self.distribution(),
+            "weekly_trend": [{"week": week, "tasks": n, "mean_ratio": mean} for week, n, mean in self.weekly_trend(weeks)],
+        }
+
+    def describe(self, weeks=0):
+        # Short text lines for the daily summary and the CLI
+        if not self.count:
+            return ["No completed tasks with logged pomodoros yet."]
+        lines = [f"Actual / estimated: {self.mean_ratio:.2f}x average, {self.median_ratio:.2f}x median over {self.count} task(s)",
+                 f"On target: {self.on_target}   Took longer: {self.underestimated}   Took less: {self.overestimated}"]
+        if weeks:
+            lines.append("Distribution: " + ", ".join(f"{label}: {n}" for label, n in self.distribution().items()))
+            for week, n, mean in self.weekly_trend(weeks):
+                lines.append(f"  {week}: {mean:.2f}x over {n} task(s)")
+        return lines
@@ -0,0 +1,155 @@
+# HyperPomo/src/estimate_suggester.py
+# Suggests a pomodoro estimate for a new task from completed tasks with similar text.
+#
+# Completed tasks (with at least one pomodoro) are kept in an inverted index, token -> {row: tf},
+# updated task by task through TaskManager, so nothing is rebuilt while the user types. A query
+# only touches the postings of its own tokens. Similarity is the cosine between the TF-IDF weighted
+# query and each task's term counts: idf is applied on the query side only, so stored document norms
+# never need recomputing as the corpus grows.
+# NumPy scores the candidates when it is installed; otherwise a plain dict accumulator does.
+# It is imported on the first query rather than at startup, since most sessions never ask for a suggestion.
+import heapq
+import importlib.util
+import math
+import re
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+STOP_WORDS = frozenset("a an and the to of for in on at with by from or my our is be do it this that".split())
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in STOP_WORDS]
+
+def _term_counts(text):
+    counts = {}
+    for token in tokenize(text): counts[token] = counts.get(token, 0) + 1
+    return counts
+
+class EstimateSuggester:
+    TOP_K = 5
+    MIN_SIMILARITY = 0.25
+
+    def __init__(self):
+        self._rows = {} # task id -> row
+        self._row_tasks = [] # row -> (task id, completed pomodoros, text) or None once freed
+        self._row_terms = [] # row -> {token: tf}
+        self._row_norms = [] # row -> L2 norm of the tf vector
+        self._free_rows = []
+        self._postings = {} # token -> {row: tf}
+        self._posting_arrays = {} # token -> (rows, tfs) as NumPy arrays, dropped when the postings change
+
+    @staticmethod
+    def _indexable(task):
+        return task.done and task.completed_pomodoros > 0
+
+    def update(self, task):
+        row = self._rows.get(task.id)
+        if not self._indexable(task):
+            if row is not None: self.discard(task.id)
+            return
+        terms = _term_counts(task.text)
+        if row is not None:
+            if self._row_terms[row] == terms:
+                self._row_tasks[row] = (task.id, task.completed_pomodoros, task.text) # Only the count changed
+                return
+            self.discard(task.id)
+        if not terms: return
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._row_tasks[row] = (task.id, task.completed_pomodoros, task.text)
+            self._row_terms[row] = terms
+            self._row_norms[row] = math.sqrt(sum(tf * tf for tf in terms.values()))
+        else:
+            row = len(self._row_tasks)
+            self._row_tasks.append((task.id, task.completed_pomodoros, task.text))
+            self._row_terms.append(terms)
+            self._row_norms.append(math.sqrt(sum(tf * tf for tf in terms.values())))
+        self._rows[task.id] = row
+        for token, tf in terms.items():
+            self._postings.setdefault(token, {})[row] = tf
+            self._posting_arrays.pop(token, None)
+
+    def discard(self, task_id):
+        row = self._rows.pop(task_id, None)
+        if row is None: return
+        for token in self._row_terms[row]:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(row, None)
+                if not postings: del self._postings[token]
+            self._posting_arrays.pop(token, None)
+        self._row_tasks[row] = None
+        self._row_terms[row] = {}
+        self._free_rows.append(row)
+
+    def rebuild(self, tasks):
+        self.__init__()
+        for task in tasks: self.update(task)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _query_weights(self, text):
+        # token -> idf-weighted query weight. Tokens no completed task uses still count towards the
+        # query's norm (with the highest idf), so a partial match never scores as a perfect one.
+        doc_count = len(self._rows)
+        return {token: tf * (math.log((1 + doc_count) / (1 + len(self._postings.get(token, ())))) + 1)
+                for token, tf in _term_counts(text).items()}
+
+    def _scores_numpy(self, weights):
+        import numpy as np
+        # Each query token adds weight * tf to the rows that contain it
+        n_rows = len(self._row_tasks)
+        scores = np.zeros(n_rows)
+        for token, weight in weights.items():
+            if token not in self._postings: continue
+            arrays = self._posting_arrays.get(token)
+            if arrays is None:
+                postings = self._postings[token]
+                arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                          np.fromiter(postings.values(), dtype=np.float64, count=len(postings)))
+                self._posting_arrays[token] = arrays
+            rows, tfs = arrays
+            scores += np.bincount(rows, weights=tfs * weight, minlength=n_rows)
+        candidates = np.flatnonzero(scores)
+        if not len(candidates): return []
+        norms = np.asarray(self._row_norms)[candidates]
+        similarity = scores[candidates] / norms
+        top = candidates[np.argsort(-similarity)[:self.TOP_K]]
+        return [(float(scores[row] / self._row_norms[row]), int(row)) for row in top]
+
+    def _scores_python(self, weights):
+        scores = {}
+        for token, weight in weights.items():
+            for row, tf in self._postings.get(token, {}).items():
+                scores[row] = scores.get(row, 0.0) + weight * tf
+        return heapq.nlargest(self.TOP_K, ((score / self._row_norms[row], row) for row, score in scores.items()))
+
+    def similar_tasks(self, text):
+        # [(similarity 0..1, task id, completed pomodoros, text)], most similar first
+        weights = self._query_weights(text)
+        if not weights or not self._rows: return []
+        query_norm = math.sqrt(sum(w * w for w in weights.values()))
+        ranked = self._scores_numpy(weights) if NUMPY_AVAILABLE else self._scores_python(weights)
+        results = []
+        for score, row in ranked:
+            similarity = min(1.0, score / query_norm)
+            if similarity < self.MIN_SIMILARITY: continue
+            task_id, completed, task_text = self._row_tasks[row]
+            results.append((similarity, task_id, completed, task_text))
+        return results
+
+    def suggest(self, text):
+        # (estimate, matches) from the similarity-weighted median of the matches' actual pomodoros,
+        # or (None, []) when nothing similar enough has been completed yet
+        matches = self.similar_tasks(text)
+        if not matches: return None, []
+        weighted = sorted((completed, similarity) for similarity, _, completed, _ in matches)
+        half = sum(similarity for _, similarity in weighted) / 2
+        running = 0.0
+        for completed, similarity in weighted:
+            running += similarity
+            if running >= half:
+                return completed, matches
+        return weighted[-1][0], matches
@@ -0,0 +1,90 @@
+# HyperPomo/src/events.py
+# Change notifications: TaskManager, PomodoroTimer and ConfigManager publish what changed, and front
+# ends subscribe to update just the parts of the screen it affects.
+#
+# The bus lives on ConfigManager (config_manager.events), which every component already shares.
+# Without a scheduler events are delivered as they are published. The app installs Tk's after_idle,
+# so every event published while one action runs is delivered as a single Changes batch once the
+# action is over: adding a task and then scheduling it redraws its row once, not twice.
+# With no subscribers, publishing is a dict check, so headless use pays nothing.
+import collections
+
+TASK_ADDED = "task_added" # subject: task id
+TASK_UPDATED = "task_updated" # subject: task id
+TASK_REMOVED = "task_removed" # subject: task id
+TASKS_RELOADED = "tasks_reloaded" # The whole list was replaced (another instance compacted); no subject
+SESSION_LOGGED = "session_logged" # subject: the new session log entry
+SESSION_LOG_CHANGED = "session_log_changed" # Entries merged in from elsewhere; no subject
+SETTING_CHANGED = "setting_changed" # subject: settings key
+TASK_EVENTS = frozenset({TASK_ADDED, TASK_UPDATED, TASK_REMOVED, TASKS_RELOADED})
+SESSION_EVENTS = frozenset({SESSION_LOGGED, SESSION_LOG_CHANGED})
+
+Event = collections.namedtuple("Event", "kind subject")
+
+class Changes:
+    # The net effect of a batch of events. A task added and removed in the same batch is left
+    # out; added then updated counts as added; removed then added again counts as updated.
+    def __init__(self, events):
+        self.events = events
+        self.kinds = {event.kind for event in events}
+        self.added_ids = {}
+        self.updated_ids = {}
+        self.removed_ids = {}
+        self.tasks_reloaded = TASKS_RELOADED in self.kinds
+        self.sessions = [event.subject for event in events if event.kind == SESSION_LOGGED]
+        self.session_log_changed = SESSION_LOG_CHANGED in self.kinds
+        self.settings = {event.subject for event in events if event.kind == SETTING_CHANGED}
+        for event in events:
+            task_id = event.subject
+            if event.kind == TASK_ADDED:
+                if self.removed_ids.pop(task_id, 0) is None: self.updated_ids[task_id] = None
+                else: self.added_ids[task_id] = None
+            elif event.kind == TASK_UPDATED:
+                if task_id not in self.added_ids: self.updated_ids[task_id] = None
+            elif event.kind == TASK_REMOVED:
+                self.updated_ids.pop(task_id, None)
+                if self.added_ids.pop(task_id, 0) is not None: self.removed_ids[task_id] = None
+
+    def tasks_changed(self):
+        return bool(self.tasks_reloaded or self.added_ids or self.updated_ids or self.removed_ids)
+
+    def task_ids(self):
+        # Every task id added, updated or removed
+        return self.added_ids.keys() | self.updated_ids.keys() | self.removed_ids.keys()
+
+class EventBus:
+    def __init__(self, schedule=None):
+        self._schedule = schedule
+        self._subscribers = {} # callback -> kinds it wants, or None for all
+        self._pending = []
+        self._flush_scheduled = False
+
+    def set_scheduler(self, schedule):
+        # schedule(callback) runs callback once the current burst of work is over, e.g. Tk's after_idle
+        self._schedule = schedule
+
+    def subscribe(self, callback, kinds=None):
+        # callback(changes) is called once per batch that has any of kinds
+        self._subscribers[callback] = frozenset(kinds) if kinds is not None else None
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.pop(callback, None)
+
+    def publish(self, kind, subject=None):
+        if not self._subscribers: return
+        self._pending.append(Event(kind, subject))
+        if self._schedule is None:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._schedule(self.flush)
+
+    def flush(self):
+        # Delivers what is pending now; events published by subscribers go out in the next batch
+        self._flush_scheduled = False
+        events, self._pending = self._pending, []
+        if not events: return
+        changes = Changes(events)
+        for callback, kinds in list(self._subscribers.items()):
+            if kinds is None or kinds & changes.kinds: callback(changes)
@@ -0,0 +1,154 @@
+# HyperPomo/src/export.py
+# Streaming export of sessions and tasks to CSV, JSON Lines or a JSON bundle, for the CLI and the app.
+#
+# Each export is a generator pipeline: session entries are read from the log file one at a time
+# (session_log.iter_json_array), filtered, joined to their task through a task id index and handed
+# straight to the writer, so memory stays flat however long the history is. Only the task list
+# (already small and in memory for the app) is held whole. No GUI imports: the app runs
+# export_file() in a JobRunner worker.
+import csv
+import datetime
+import json
+
+from . import session_log as sl
+from . import serializers
+
+SESSIONS = "sessions"
+TASKS = "tasks"
+CSV = "csv"
+JSONL = "jsonl"
+JSON = "json" # One {"exported_at", "tasks", "sessions"} document, entries as stored
+FORMATS = (CSV, JSONL, JSON)
+
+SESSION_FIELDS = ("id", "date", "timestamp", "type", "duration_minutes", "skipped",
+                  "pomodoros", "focus_minutes", "break_minutes",
+                  "task_id", "task_text", "tags", "task_done", "task_estimated", "task_completed",
+                  "task_scheduled", "task_due", "task_parent_id")
+TASK_FIELDS = ("id", "text", "done", "estimated_pomodoros", "completed_pomodoros", "scheduled_date",
+               "due_date", "created_at", "completed_at", "updated_at", "tags", "parent_id", "recurrence_id", "notes")
+
+# Filtering
+def filter_tasks(tasks, start_str=None, end_str=None, task_ids=None, tag=None):
+    # tasks: task dicts (Task.to_dict()). The date range applies to the scheduled date.
+    for task in tasks:
+        if task_ids is not None and task["id"] not in task_ids: continue
+        if tag and tag not in (task.get("tags") or ()): continue
+        if start_str or end_str:
+            date_str = task.get("scheduled_date")
+            if not date_str or (start_str and date_str < start_str) or (end_str and date_str > end_str): continue
+        yield task
+
+def filter_sessions(entries, tasks_by_id, start_str=None, end_str=None, task_ids=None, tag=None):
+    # A session matches a tag it was logged with, or (for entries from before sessions carried
+    # tags) one its task has now
+    for entry in entries:
+        date_str = entry.get("session_for_date") or (entry.get("timestamp") or "")[:10]
+        if (start_str and date_str < start_str) or (end_str and date_str > end_str): continue
+        if task_ids is not None and entry.get("task_id") not in task_ids: continue
+        if tag:
+            task = tasks_by_id.get(entry.get("task_id"))
+            tags = entry["tags"] if "tags" in entry else (task.get("tags") or () if task else ())
+            if tag not in tags: continue
+        yield entry
+
+# Flattening to rows
+def session_rows(entries, tasks_by_id, work_duration):
+    for entry in entries:
+        task = tasks_by_id.get(entry.get("task_id")) or {}
+        if entry.get("type") == sl.ROLLUP:
+            pomodoros, focus, breaks = entry.get("pomodoros", 0), entry.get("focus_minutes", 0.0), entry.get("break_minutes", 0.0)
+            duration = None
+        else:
+            duration = sl.entry_minutes(entry, work_duration)
+            counted = not entry.get("skipped", False)
+            is_work = entry.get("type") == sl.WORK
+            pomodoros = int(counted and is_work)
+            focus = duration if counted and is_work else 0.0
+            breaks = duration if counted and not is_work else 0.0
+        yield {
+            "id": sl.entry_key(entry), "date": entry.get("session_for_date"), "timestamp": entry.get("timestamp"),
+            "type": entry.get("type"), "duration_minutes": duration, "skipped": entry.get("skipped", False),
+            "pomodoros": pomodoros, "focus_minutes": focus, "break_minutes": breaks,
+            "task_id": entry.get("task_id"), "task_text": entry.get("task_text") or task.get("text"),
+            "tags": entry["tags"] if "tags" in entry else task.get("tags") or [],
+            "task_done": task.get("done"), "task_estimated": task.get("estimated_pomodoros"),
+            "task_completed": task.get("completed_pomodoros"), "task_scheduled": task.get("scheduled_date"),
+            "task_due": task.get("due_date"), "task_parent_id": task.get("parent_id"),
+        }
+
+def task_rows(tasks):
+    for task in tasks:
+        yield {field: task.get(field) for field in TASK_FIELDS}
+
+# Writers; each returns the number of rows written
+def _csv_value(value):
+    if value is None: return ""
+    if isinstance(value, list): return " ".join(str(item) for item in value)
+    return value
+
+def write_csv(rows, fields, out):
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        count += 1
+    return count
+
+def write_jsonl(rows, out):
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+def _write_json_items(items, out):
+    count = 0
+    for item in items:
+        out.write(",\n    " if count else "\n    ")
+        out.write(json.dumps(item, ensure_ascii=False))
+        count += 1
+    out.write("\n  ]" if count else "]")
+    return count
+
+def write_json_bundle(tasks, entries, out):
+    # Same shape as the CLI's original export, written item by item; returns (tasks, sessions)
+    out.write('{\n  "exported_at": ' + json.dumps(datetime.datetime.now().isoformat()) + ',\n  "tasks": [')
+    task_count = _write_json_items(tasks, out)
+    out.write(',\n  "sessions": [')
+    session_count = _write_json_items(entries, out)
+    out.write("\n}\n")
+    return task_count, session_count
+
+def iter_session_file(path):
+    # Entries of a session log file (JSON or binary snapshot), streamed; nothing if the file doesn't exist yet
+    try:
+        f = serializers.open_text(path)
+    except FileNotFoundError:
+        return
+    with f:
+        yield from sl.iter_json_array(f)
+
+def export(out, what, fmt, tasks, entries, work_duration, start_str=None, end_str=None, task_ids=None, tag=None):
+    # tasks: task dicts; entries: any iterable of session entries (read lazily).
+    # Returns (tasks written, sessions written).
+    tasks = list(tasks)
+    tasks_by_id = {task["id"]: task for task in tasks}
+    sessions = filter_sessions(entries, tasks_by_id, start_str, end_str, task_ids, tag)
+    if fmt == JSON:
+        return write_json_bundle(filter_tasks(tasks, start_str, end_str, task_ids, tag), sessions, out)
+    if what == SESSIONS:
+        rows, fields = session_rows(sessions, tasks_by_id, work_duration), SESSION_FIELDS
+    else:
+        rows, fields = task_rows(filter_tasks(tasks, start_str, end_str, task_ids, tag)), TASK_FIELDS
+    count = write_csv(rows, fields, out) if fmt == CSV else write_jsonl(rows, out)
+    return (0, count) if what == SESSIONS else (count, 0)
+
+def export_file(output_path, what, fmt, tasks, session_log_path, work_duration, start_str=None, end_str=None,
+                task_ids=None, tag=None):
+    # Picklable entry point for worker processes: reads the session log from disk itself
+    newline = "" if fmt == CSV else None # The csv module writes its own line endings
+    with open(output_path, "w", encoding="utf-8", newline=newline) as out:
+        return export(out, what, fmt, tasks, iter_session_file(session_log_path), work_duration,
+                      start_str, end_str, task_ids, tag)
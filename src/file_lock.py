@@ -0,0 +1,69 @@
+# HyperPomo/src/file_lock.py
+# Advisory lock shared by every HyperPomo process using the same data directory.
+# It only guards HyperPomo's own read-merge-write cycles; other programs can ignore it.
+# Threads of one process take turns through an RLock before the depth count, since flock()
+# can't tell them apart.
+import threading
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+try:
+    import msvcrt
+    MSVCRT_AVAILABLE = True
+except ImportError:
+    MSVCRT_AVAILABLE = False
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._depth = 0 # Re-entrant within one thread, e.g. save_tasks() calling save_settings()
+        self._thread_lock = threading.RLock()
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth > 1: return
+        try:
+            self._file = open(self.path, 'a+b')
+            if FCNTL_AVAILABLE:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            elif MSVCRT_AVAILABLE:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1) # Retries for ~10 s, then raises
+        except OSError as e:
+            # Never block saving because locking is unsupported (e.g. some network filesystems)
+            print(f"Warning: Could not lock {self.path}: {e}")
+
+    def release(self):
+        try:
+            self._release_file()
+        finally:
+            self._thread_lock.release()
+
+    def _release_file(self):
+        self._depth -= 1
+        if self._depth > 0 or self._file is None: return
+        try:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif MSVCRT_AVAILABLE:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
@@ -0,0 +1,73 @@
+# HyperPomo/src/file_watcher.py
+# Tells the app when files in the data directory were written by someone else.
+# Uses Linux inotify through ctypes when it is available. Elsewhere fileno() is None and
+# the caller falls back to comparing mtime/size stamps on a timer.
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+_libc = None
+INOTIFY_AVAILABLE = False
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        INOTIFY_AVAILABLE = hasattr(_libc, "inotify_init1") and hasattr(_libc, "inotify_add_watch")
+    except OSError:
+        INOTIFY_AVAILABLE = False
+
+class FileWatcher:
+    def __init__(self, directory, filenames):
+        self.directory = directory
+        self.filenames = set(filenames)
+        self._fd = None
+        if INOTIFY_AVAILABLE:
+            self._init_inotify()
+
+    def _init_inotify(self):
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            print(f"Warning: inotify unavailable ({os.strerror(ctypes.get_errno())}). Falling back to polling.")
+            return
+        if _libc.inotify_add_watch(fd, os.fsencode(self.directory), _WATCH_MASK) < 0:
+            print(f"Warning: Could not watch {self.directory} ({os.strerror(ctypes.get_errno())}). Falling back to polling.")
+            os.close(fd)
+            return
+        self._fd = fd
+
+    def fileno(self):
+        return self._fd
+
+    def read_events(self):
+        # Drains pending inotify events; returns the watched file names that were touched
+        touched = set()
+        if self._fd is None: return touched
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if not data: break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                name_start = offset + _EVENT_HEADER.size
+                name = data[name_start:name_start + name_len].split(b"\0", 1)[0].decode("utf-8", "replace")
+                if name in self.filenames: touched.add(name)
+                offset = name_start + name_len
+        return touched
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
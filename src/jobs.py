@@ -0,0 +1,92 @@
+# HyperPomo/src/jobs.py
+# Runs slow jobs (statistics, reports) off the UI thread so the countdown never stalls.
+#
+# Jobs go to a process pool, or a thread pool where worker processes can't be started. Results
+# are picked up by poll(), which the front end schedules on its own loop (Tk's after()), so
+# callbacks always run on the UI thread. Jobs belong to a group, typically the window that asked
+# for them; closing the window cancels the group and any late results are dropped.
+import concurrent.futures
+import multiprocessing
+
+class Job:
+    def __init__(self, future, group, on_done, on_error):
+        self.future = future
+        self.group = group
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+class JobRunner:
+    POLL_INTERVAL_MS = 100
+    MAX_WORKERS = 2
+
+    def __init__(self, after, use_processes=True):
+        # after(ms, callback) schedules a call on the UI loop, e.g. root.after
+        self.after = after
+        self.use_processes = use_processes
+        self._executor = None
+        self._jobs = []
+        self._polling = False
+
+    def _get_executor(self):
+        if self._executor is None and self.use_processes:
+            try:
+                # spawn, not fork: the parent holds Tk and open file handles
+                context = multiprocessing.get_context("spawn")
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.MAX_WORKERS, mp_context=context)
+            except (OSError, ValueError, NotImplementedError) as e:
+                print(f"Warning: Could not start worker processes ({e}). Using threads instead.")
+                self.use_processes = False
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="hyperpomo-job")
+        return self._executor
+
+    def submit(self, fn, *args, group=None, on_done=None, on_error=None):
+        # fn and args must be picklable: pass snapshots (lists of dicts), not live objects
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except concurrent.futures.BrokenExecutor:
+            self._executor = None; self.use_processes = False
+            future = self._get_executor().submit(fn, *args)
+        job = Job(future, group, on_done, on_error)
+        self._jobs.append(job)
+        if not self._polling:
+            self._polling = True
+            self.after(self.POLL_INTERVAL_MS, self.poll)
+        return job
+
+    def cancel(self, job):
+        job.cancelled = True
+        job.future.cancel() # Only stops jobs that haven't started; a running job's result is discarded
+
+    def cancel_group(self, group):
+        for job in self._jobs:
+            if job.group == group: self.cancel(job)
+
+    def poll(self):
+        pending = []
+        for job in self._jobs:
+            if job.cancelled: continue
+            if not job.future.done():
+                pending.append(job)
+                continue
+            try:
+                result = job.future.result()
+            except Exception as e:
+                if isinstance(e, concurrent.futures.BrokenExecutor):
+                    self._executor = None; self.use_processes = False
+                if job.on_error: job.on_error(e)
+                else: print(f"Warning: Background job failed: {e}")
+            else:
+                if job.on_done: job.on_done(result)
+        self._jobs = pending
+        self._polling = bool(pending)
+        if self._polling:
+            self.after(self.POLL_INTERVAL_MS, self.poll)
+
+    def shutdown(self):
+        for job in self._jobs: self.cancel(job)
+        self._jobs = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
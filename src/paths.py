@@ -0,0 +1,16 @@
+# HyperPomo/src/paths.py
+# Kept free of any GUI imports so the CLI and terminal front ends can use it.
+import os
+import sys
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        # Not running in a PyInstaller bundle
+        # Path relative to this file (which is in src/)
+        # We want the parent of src/, which is the application root (HyperPomo/)
+        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    return os.path.join(base_path, relative_path)
@@ -0,0 +1,58 @@
+# HyperPomo/src/planner.py
+# Spreads unscheduled tasks over the coming days, up to a daily pomodoro capacity.
+#
+# Earliest deadline first: tasks wait in a heap ordered by (due date, creation time), tasks
+# without a due date last. Each day takes tasks from the heap while they fit; a task too big
+# for what is left of the day waits for the next one, and a task bigger than the most room any
+# day has (capacity minus what is already scheduled there) goes on the first day with that much
+# room, so it is never stranded behind hand-scheduled work. O(n log n) in the number of tasks, so thousands plan instantly.
+import datetime
+import heapq
+
+NO_DUE_DATE = "9999-12-31"
+MAX_DAYS = 366 # Anything that doesn't fit within a year is left unscheduled
+
+def remaining_pomodoros(task):
+    return max(1, task.estimated_pomodoros - task.completed_pomodoros)
+
+def plan_days(unscheduled_tasks, capacity, start_date, existing_load=None, max_days=MAX_DAYS):
+    # existing_load: date string -> pomodoros already planned that day (tasks scheduled by hand)
+    # Returns (assignments {task id: date string}, late [(task, planned date string)], unplanned [task])
+    capacity = max(1, int(capacity))
+    existing_load = existing_load or {}
+    heap = [((task.due_date or NO_DUE_DATE), task.created_at or "", i, task) for i, task in enumerate(unscheduled_tasks)]
+    heapq.heapify(heap)
+    # Most free pomodoros any day of the horizon starts with
+    roomiest = capacity - min(existing_load.get((start_date + datetime.timedelta(days=offset)).isoformat(), 0)
+                              for offset in range(max(1, max_days)))
+
+    assignments, late = {}, []
+    day = start_date
+    for _ in range(max_days):
+        if not heap: break
+        date_str = day.isoformat()
+        free = capacity - existing_load.get(date_str, 0)
+        waiting = [] # Popped but too big for what's left today
+        while heap and free > 0:
+            item = heapq.heappop(heap)
+            task = item[3]
+            needed = remaining_pomodoros(task)
+            if needed <= free or (needed > roomiest and free == roomiest):
+                assignments[task.id] = date_str
+                free -= needed
+                if task.due_date and date_str > task.due_date: late.append((task, date_str))
+            else:
+                waiting.append(item)
+                if len(waiting) > 32: break # Today is nearly full; don't dig through the whole backlog for filler
+        for item in waiting: heapq.heappush(heap, item)
+        day += datetime.timedelta(days=1)
+    unplanned = [item[3] for item in sorted(heap)]
+    return assignments, late, unplanned
+
+def scheduled_load(tasks):
+    # date string -> remaining pomodoros of active tasks already scheduled that day
+    load = {}
+    for task in tasks:
+        if task.scheduled_date and not task.done:
+            load[task.scheduled_date] = load.get(task.scheduled_date, 0) + remaining_pomodoros(task)
+    return load
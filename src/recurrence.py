@@ -0,0 +1,78 @@
+# HyperPomo/src/recurrence.py
+# Recurrence rules for routine tasks.
+#
+# A recurring task is stored once, as a template carrying a rule. Its occurrences are never
+# stored ahead of time: TaskManager builds them on the fly for the date being looked at, with
+# the id "<template id>@<YYYY-MM-DD>". An occurrence becomes a real stored task (with that same
+# id) only when it is worked on, completed or edited, so a years-long daily routine costs one
+# record plus the days actually touched.
+import datetime
+
+DAILY = "daily"
+WEEKDAYS = "weekdays"
+WEEKLY = "weekly" # On the weekdays listed in "days" (0 = Monday)
+INTERVAL = "interval" # Every "interval" days from "start"
+FREQUENCIES = (DAILY, WEEKDAYS, WEEKLY, INTERVAL)
+DAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+def make_rule(freq, start_date, days=None, interval=1, until=None):
+    if freq not in FREQUENCIES: raise ValueError(f"unknown recurrence '{freq}'")
+    if isinstance(start_date, datetime.date): start_date = start_date.isoformat()
+    if isinstance(until, datetime.date): until = until.isoformat()
+    rule = {"freq": freq, "start": start_date, "until": until, "skipped": []}
+    if freq == WEEKLY:
+        rule["days"] = sorted(set(days if days else [datetime.date.fromisoformat(start_date).weekday()]))
+    if freq == INTERVAL:
+        rule["interval"] = max(1, int(interval))
+    return rule
+
+def occurs_on(rule, date_obj):
+    date_str = date_obj.isoformat()
+    if date_str < rule.get("start", "") or (rule.get("until") and date_str > rule["until"]):
+        return False
+    if date_str in rule.get("skipped", ()):
+        return False
+    freq = rule.get("freq")
+    if freq == DAILY: return True
+    if freq == WEEKDAYS: return date_obj.weekday() < 5
+    if freq == WEEKLY: return date_obj.weekday() in rule.get("days", ())
+    if freq == INTERVAL:
+        start = datetime.date.fromisoformat(rule["start"])
+        return (date_obj - start).days % rule.get("interval", 1) == 0
+    return False
+
+def describe(rule):
+    freq = rule.get("freq")
+    if freq == DAILY: return "Every day"
+    if freq == WEEKDAYS: return "Weekdays"
+    if freq == WEEKLY: return "Weekly on " + ", ".join(DAY_NAMES[day] for day in rule.get("days", ()))
+    if freq == INTERVAL: return f"Every {rule.get('interval', 1)} days"
+    return "Repeats"
+
+def occurrence_id(template_id, date_str):
+    return f"{template_id}@{date_str}"
+
+def parse_occurrence_id(task_id):
+    # (template id, date string) for an occurrence id, else None
+    template_id, sep, date_str = (task_id or "").rpartition("@")
+    if not sep or not template_id: return None
+    try:
+        datetime.date.fromisoformat(date_str)
+    except ValueError:
+        return None
+    return template_id, date_str
+
+class RecurrenceIndex:
+    # The live templates, so finding a day's occurrences only looks at recurring tasks
+    def __init__(self):
+        self.templates = {} # template id -> Task
+
+    def update(self, task):
+        if task.recurrence and not task.done: self.templates[task.id] = task
+        else: self.templates.pop(task.id, None)
+
+    def discard(self, task_id):
+        self.templates.pop(task_id, None)
+
+    def rebuild(self, tasks):
+        self.templates = {task.id: task for task in tasks if task.recurrence and not task.done}
@@ -0,0 +1,167 @@
+# HyperPomo/src/serializers.py
+# How data files are encoded on disk: pretty JSON, compact JSON, or a compressed binary snapshot.
+#
+# ConfigManager writes settings.json pretty-printed (people edit it by hand) and the session log
+# and task snapshot in the "storage_format" setting. Readers never need to be told the format:
+# binary snapshots start with MAGIC, anything else is read as JSON. JSON goes through orjson when
+# it is installed and the standard library otherwise; both produce the same documents.
+#
+# Binary snapshot layout: MAGIC, format version (uint16), codec (uint16), then the payload. Codec 1
+# is zlib-compressed compact JSON, so a snapshot can still be streamed item by item (open_text()).
+import io
+import json
+import struct
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAGIC = b"HPSB"
+FORMAT_VERSION = 1
+CODEC_ZLIB_JSON = 1
+_HEADER = struct.Struct("<4sHH")
+
+class SerializationError(ValueError):
+    pass
+
+def _dumps_json(data, pretty):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError: # e.g. integers beyond 64 bits; the standard library copes
+            pass
+    if pretty: return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(',', ':')).encode("utf-8")
+
+def _loads_json(raw):
+    try:
+        if orjson is not None: return orjson.loads(raw)
+        return json.loads(raw)
+    except ValueError as e: # Covers UnicodeDecodeError and orjson's JSONDecodeError
+        raise SerializationError(f"not valid JSON: {e}")
+
+class JsonSerializer:
+    def __init__(self, name, pretty):
+        self.name = name
+        self.pretty = pretty
+
+    def dumps(self, data):
+        return _dumps_json(data, self.pretty)
+
+    def loads(self, raw):
+        return _loads_json(raw)
+
+class BinarySnapshotSerializer:
+    name = "binary"
+    LEVEL = 1 # Fastest zlib level: most of the size win, little of the cost
+
+    def dumps(self, data):
+        return _HEADER.pack(MAGIC, FORMAT_VERSION, CODEC_ZLIB_JSON) + zlib.compress(_dumps_json(data, False), self.LEVEL)
+
+    def loads(self, raw):
+        return _loads_json(_payload(raw))
+
+PRETTY_JSON = JsonSerializer("json-pretty", pretty=True)
+COMPACT_JSON = JsonSerializer("json", pretty=False)
+BINARY = BinarySnapshotSerializer()
+SERIALIZERS = {serializer.name: serializer for serializer in (COMPACT_JSON, PRETTY_JSON, BINARY)}
+
+def get(name):
+    # Unknown names (a typo in settings.json) fall back to compact JSON
+    return SERIALIZERS.get(name, COMPACT_JSON)
+
+def _check_header(header):
+    if len(header) < _HEADER.size: raise SerializationError("truncated binary snapshot")
+    magic, version, codec = _HEADER.unpack(header)
+    if version > FORMAT_VERSION or codec != CODEC_ZLIB_JSON:
+        raise SerializationError(f"binary snapshot version {version}, codec {codec} is newer than this HyperPomo")
+
+def _payload(raw):
+    if not raw.startswith(MAGIC): raise SerializationError("not a HyperPomo binary snapshot")
+    _check_header(raw[:_HEADER.size])
+    try:
+        return zlib.decompress(raw[_HEADER.size:])
+    except zlib.error as e:
+        raise SerializationError(f"damaged binary snapshot: {e}")
+
+def loads(raw):
+    # Decodes bytes in any of the formats above
+    if raw.startswith(MAGIC): return BINARY.loads(raw)
+    return _loads_json(raw)
+
+def load_file(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+def format_of(path):
+    # Name of the format a file is in, or None if it doesn't exist
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(MAGIC))
+    except FileNotFoundError:
+        return None
+    return BINARY.name if head == MAGIC else COMPACT_JSON.name
+
+class _InflatingReader(io.RawIOBase):
+    # The JSON text inside a binary snapshot, decompressed as it is read
+    def __init__(self, f):
+        self._f = f
+        self._inflater = zlib.decompressobj()
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = self._f.read(1 << 16)
+            try:
+                self._pending = self._inflater.decompress(chunk) if chunk else self._inflater.flush()
+            except zlib.error as e:
+                raise SerializationError(f"damaged binary snapshot: {e}")
+            if not chunk:
+                if not self._inflater.eof and not self._pending: raise SerializationError("truncated binary snapshot")
+                break
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def open_text(path):
+    # A text stream of the JSON in a file of either kind, for session_log.iter_json_array()
+    f = open(path, 'rb')
+    if f.read(len(MAGIC)) != MAGIC:
+        f.seek(0)
+        return io.TextIOWrapper(f, encoding="utf-8")
+    try:
+        _check_header(MAGIC + f.read(_HEADER.size - len(MAGIC)))
+    except SerializationError:
+        f.close()
+        raise
+    return io.TextIOWrapper(io.BufferedReader(_InflatingReader(f)), encoding="utf-8")
+
+def benchmark(data, repeat=3):
+    # Encoded size and best-of-repeat save/load time (in ms) for each format, on data as given
+    results = []
+    for serializer in SERIALIZERS.values():
+        save_ms = load_ms = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            raw = serializer.dumps(data)
+            encoded = time.perf_counter()
+            serializer.loads(raw)
+            decoded = time.perf_counter()
+            save_ms = min(save_ms or float("inf"), (encoded - started) * 1000)
+            load_ms = min(load_ms or float("inf"), (decoded - encoded) * 1000)
+        results.append({"format": serializer.name, "bytes": len(raw), "save_ms": round(save_ms, 2), "load_ms": round(load_ms, 2)})
+    return results
+
+def json_library():
+    return "orjson" if orjson is not None else "json (standard library)"
@@ -0,0 +1,300 @@
+# HyperPomo/src/session_index.py
+# A fixed-width binary index of the session log, read through mmap, for per-day and date range stats.
+#
+# session_index.bin holds one RECORD per dated log entry, sorted by (date, timestamp). It stores the
+# date as an ordinal, the timestamp in seconds, the type, the minutes (rollup totals for rollups), the
+# entry's position in the log and the byte offset of its task id in session_index.bin.tasks (one id
+# per line, append only). Since every record has the same size, record i sits at
+# HEADER.size + i * RECORD.size, and binary search over the mapped file finds a day or range by
+# reading a few dozen records; only those pages are touched and nothing else is parsed.
+#
+# The header keeps the (mtime_ns, size) stamp and entry count of the session log the index describes.
+# A session logged at the end of the log is added in place (append(), called by ConfigManager while
+# it holds the data dir lock), moving only the records of later days. Anything else that rewrites
+# the log, compaction or a merge, leaves the stamp behind, and the index is rebuilt by streaming the
+# log once: open_index() does it on the spot, the app in a worker. Summaries follow
+# session_log.summarize_entries() exactly, including a missing work duration counting as a full
+# work session at the work_duration given at query time.
+import datetime
+import mmap
+import os
+import struct
+
+from . import session_log as sl
+from . import serializers
+
+MAGIC = b"HPSI"
+FORMAT_VERSION = 2
+# magic, version, record size, record count, log entry count, log mtime_ns, log size, task table size
+HEADER = struct.Struct("<4sHHIIqqQ")
+# date ordinal, timestamp (seconds since 1970-01-01 in the log's local time), kind, flags,
+# pomodoros and skipped (rollups), minutes (duration, or a rollup's focus), rollup break minutes,
+# task table offset, position in the log
+RECORD = struct.Struct("<iqBB2xIIddII")
+_SORT_KEY = struct.Struct("<iq") # The leading (date, timestamp) fields of RECORD
+_DAY = struct.Struct("<i")
+
+KINDS = (sl.WORK, sl.SHORT_BREAK, sl.LONG_BREAK, sl.ROLLUP)
+OTHER_KIND = 255
+_WORK_KIND, _ROLLUP_KIND = KINDS.index(sl.WORK), KINDS.index(sl.ROLLUP)
+SKIPPED = 1
+NO_DURATION = 2 # Logged without a usable duration; counted by entry_minutes()' rules at query time
+NO_TASK = 0xFFFFFFFF
+NO_STAMP = (0, 0) # Written while an update is under way, so a crash mid-update reads as stale
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+class SessionIndexError(ValueError):
+    pass
+
+def tasks_path_for(index_path):
+    return index_path + ".tasks"
+
+class _TaskTable:
+    # Task id -> byte offset in the task table file, as records refer to them
+    def __init__(self, raw=b""):
+        self.offsets = {}
+        self.size = 0
+        self.new_lines = []
+        for line in raw.splitlines(True):
+            self.offsets.setdefault(line.rstrip(b"\n").decode("utf-8"), self.size)
+            self.size += len(line)
+
+    def offset_of(self, task_id):
+        if task_id is None: return NO_TASK
+        offset = self.offsets.get(task_id)
+        if offset is None:
+            line = task_id.replace("\n", " ").encode("utf-8") + b"\n"
+            offset = self.offsets[task_id] = self.size
+            self.size += len(line)
+            self.new_lines.append(line)
+        return offset
+
+def _record_for(entry, position, task_table):
+    # Packed record for one entry, or None for entries without a usable date
+    try:
+        day = datetime.date.fromisoformat(entry.get("session_for_date") or "").toordinal()
+    except ValueError:
+        return None
+    try:
+        logged_at = datetime.datetime.fromisoformat(entry.get("timestamp") or "").replace(tzinfo=None)
+        seconds = int((logged_at - _EPOCH).total_seconds())
+    except ValueError:
+        seconds = 0
+    kind = KINDS.index(entry.get("type")) if entry.get("type") in KINDS else OTHER_KIND
+    task = task_table.offset_of(entry.get("task_id"))
+    if entry.get("type") == sl.ROLLUP:
+        return RECORD.pack(day, seconds, kind, 0, entry.get("pomodoros", 0), entry.get("skipped", 0),
+                           entry.get("focus_minutes", 0.0), entry.get("break_minutes", 0.0), task, position)
+    flags = SKIPPED if entry.get("skipped", False) else 0
+    logged = entry.get("duration_minutes")
+    if isinstance(logged, (int, float)) and logged >= 0:
+        minutes = float(logged)
+    else:
+        minutes, flags = 0.0, flags | NO_DURATION
+    return RECORD.pack(day, seconds, kind, flags, 0, 0, minutes, 0.0, task, position)
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _write_atomic(path, chunks):
+    tmp_path = f"{path}.{os.getpid()}.tmp" # Two processes rebuilding at once each write their own
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks: f.write(chunk)
+    os.replace(tmp_path, path)
+
+def build(log_path, index_path):
+    # Streams the session log once and writes a fresh index; returns the number of records
+    stamp = _stamp(log_path) # Taken first: a log replaced while we read only makes the index look stale
+    task_table = _TaskTable()
+    records = []
+    entry_count = 0
+    if stamp is not None:
+        with serializers.open_text(log_path) as f:
+            for entry_count, entry in enumerate(sl.iter_json_array(f), 1):
+                record = _record_for(entry, entry_count - 1, task_table)
+                if record is not None: records.append(record)
+    records.sort(key=_SORT_KEY.unpack_from) # Stable: same-second entries keep log order
+    _write_atomic(tasks_path_for(index_path), task_table.new_lines)
+    _write_atomic(index_path, [HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, len(records), entry_count,
+                                           *(stamp or NO_STAMP), task_table.size)] + records)
+    return len(records)
+
+def _read_header(f):
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size: raise SessionIndexError("truncated session index")
+    fields = HEADER.unpack(raw)
+    if fields[0] != MAGIC or fields[1] != FORMAT_VERSION or fields[2] != RECORD.size:
+        raise SessionIndexError("not a session index this HyperPomo can read")
+    return fields
+
+def append(log_path, index_path, old_stamp, log_data, new_entries):
+    # Adds new_entries, just written at the end of the log, to an index that described the log as it
+    # was (old_stamp) before that write. Returns False, leaving the index stale for a rebuild, when it
+    # didn't describe that log or the entries aren't the log's last ones.
+    start = len(log_data) - len(new_entries)
+    if not new_entries or any(log_data[start + i] is not entry for i, entry in enumerate(new_entries)):
+        return False
+    try:
+        f = open(index_path, 'r+b')
+    except OSError:
+        return False
+    with f:
+        try:
+            _, _, _, count, entry_count, mtime_ns, size, tasks_size = _read_header(f)
+        except SessionIndexError:
+            return False
+        if (mtime_ns, size) != tuple(old_stamp or NO_STAMP) or entry_count != start: return False
+        tasks_path = tasks_path_for(index_path)
+        with open(tasks_path, 'rb') as tasks_file:
+            task_table = _TaskTable(tasks_file.read(tasks_size))
+        if task_table.size != tasks_size: return False
+        new_records = [record for position, entry in enumerate(new_entries, start)
+                       for record in [_record_for(entry, position, task_table)] if record is not None]
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, count, entry_count, *NO_STAMP, tasks_size))
+        f.flush()
+        if task_table.new_lines:
+            with open(tasks_path, 'r+b') as tasks_file:
+                tasks_file.seek(tasks_size)
+                tasks_file.write(b"".join(task_table.new_lines))
+                tasks_file.truncate()
+        for record in new_records:
+            # Usually today's session, at the very end; a session for a task scheduled on another day
+            # moves the records of later days along by one
+            position = _insert_position(f, count, _SORT_KEY.unpack_from(record))
+            f.seek(HEADER.size + position * RECORD.size)
+            later = f.read((count - position) * RECORD.size)
+            f.seek(HEADER.size + position * RECORD.size)
+            f.write(record + later)
+            count += 1
+        f.truncate(HEADER.size + count * RECORD.size)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, count, len(log_data), *(_stamp(log_path) or NO_STAMP),
+                            task_table.size))
+    return True
+
+def _insert_position(f, count, key):
+    # First record sorting after key, by binary search with one small read per step
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(HEADER.size + mid * RECORD.size)
+        if _SORT_KEY.unpack(f.read(_SORT_KEY.size)) <= key: lo = mid + 1
+        else: hi = mid
+    return lo
+
+class SessionIndex:
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, 'rb') as f:
+            _, _, _, self.count, self.entry_count, mtime_ns, size, self._tasks_size = _read_header(f)
+            if os.fstat(f.fileno()).st_size < HEADER.size + self.count * RECORD.size:
+                raise SessionIndexError("truncated session index")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.log_stamp = (mtime_ns, size)
+        self._task_ids = None
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def describes(self, log_stamp, entry_count):
+        # Whether this index was built from (or kept up with) the log with this stamp and length
+        return self.log_stamp == tuple(log_stamp or NO_STAMP) and self.entry_count == entry_count
+
+    def _day_at(self, i):
+        return _DAY.unpack_from(self._map, HEADER.size + i * RECORD.size)[0]
+
+    def _first_on_or_after(self, day):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._day_at(mid) < day: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def records_between(self, start_date, end_date):
+        # Unpacked RECORD tuples for the days from start_date to end_date inclusive, in order
+        start = self._first_on_or_after(start_date.toordinal())
+        end = self._first_on_or_after(end_date.toordinal() + 1)
+        for i in range(start, end):
+            yield RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def positions_between(self, start_date, end_date):
+        # Log positions of the entries for those days, in log order
+        return sorted(record[-1] for record in self.records_between(start_date, end_date))
+
+    def date_span(self):
+        # (first date, last date) with entries, or None for an empty index
+        if not self.count: return None
+        return datetime.date.fromordinal(self._day_at(0)), datetime.date.fromordinal(self._day_at(self.count - 1))
+
+    def task_id(self, offset):
+        # The task id a record's task offset refers to; the table is read on first use
+        if offset == NO_TASK: return None
+        if self._task_ids is None:
+            with open(tasks_path_for(self.path), 'rb') as f:
+                table = _TaskTable(f.read(self._tasks_size))
+            self._task_ids = {offset: task_id for task_id, offset in table.offsets.items()}
+        return self._task_ids[offset]
+
+    def day_summaries(self, start_date, end_date, work_duration):
+        # date ordinal -> summarize_entries() result, for the days in the range that have entries
+        days = {}
+        for day, _, kind, flags, pomodoros, skipped, minutes, break_minutes, _, _ in self.records_between(start_date, end_date):
+            summary = days.get(day)
+            if summary is None:
+                summary = days[day] = sl.summarize_entries([], work_duration)
+            if kind == _ROLLUP_KIND:
+                summary["pomodoros"] += pomodoros
+                summary["focus_minutes"] += minutes
+                summary["break_minutes"] += break_minutes
+                summary["skipped"] += skipped
+            elif flags & SKIPPED:
+                summary["skipped"] += 1
+            elif kind == _WORK_KIND:
+                summary["pomodoros"] += 1
+                summary["focus_minutes"] += float(work_duration) if flags & NO_DURATION else minutes
+            else:
+                summary["break_minutes"] += minutes
+        return days
+
+    def summarize_range(self, start_date, end_date, work_duration):
+        # Same result as session_log.summarize_range() over the whole log
+        days = self.day_summaries(start_date, end_date, work_duration)
+        result = []
+        for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+            summary = days.get(ordinal) or sl.summarize_entries([], work_duration)
+            summary["date"] = datetime.date.fromordinal(ordinal).isoformat()
+            result.append(summary)
+        return result
+
+    def summarize_day(self, date, work_duration):
+        return self.summarize_range(date, date, work_duration)[0]
+
+def is_current(log_path, index_path):
+    # Cheap header check: whether the index matches the session log on disk
+    try:
+        with open(index_path, 'rb') as f:
+            header = _read_header(f)
+    except (OSError, SessionIndexError):
+        return False
+    return (header[5], header[6]) == (_stamp(log_path) or NO_STAMP)
+
+def open_index(log_path, index_path):
+    # The index for the session log as it is now, rebuilt first if the log changed since it was built
+    if not is_current(log_path, index_path): build(log_path, index_path)
+    return SessionIndex(index_path)
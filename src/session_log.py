@@ -0,0 +1,236 @@
+# HyperPomo/src/session_log.py
+# Helpers for reading session log entries. No GUI imports, so the CLI can use these too.
+import datetime
+import hashlib
+import json
+
+WORK = "Work"
+SHORT_BREAK = "Short Break"
+LONG_BREAK = "Long Break"
+# Per-day, per-task totals that replace raw entries older than the "session_log_raw_days" horizon.
+# session_ids lists the folded entries (space separated short keys), so a merge never adds them back;
+# session_parts keeps each one's [pomodoros, focus minutes, break minutes, skipped], so two rollups
+# of the same day folded on different machines can be combined exactly.
+ROLLUP = "Daily Rollup"
+ROLLUP_TOTALS = ("pomodoros", "focus_minutes", "break_minutes", "skipped")
+
+def entry_key(entry):
+    # Entries logged since ids were introduced carry one; older ones get a stable id from their
+    # contents so every machine derives the same key for them
+    if entry.get("id"): return entry["id"]
+    content = f"{entry.get('timestamp')}|{entry.get('type')}|{entry.get('session_for_date')}"
+    return "legacy-" + hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+def entry_minutes(entry, work_duration):
+    # Same rules the daily summary has always used: a work entry without a usable
+    # duration counts as a full work session, a break without one counts as 0.
+    logged = entry.get("duration_minutes")
+    if isinstance(logged, (int, float)) and logged >= 0:
+        return float(logged)
+    return float(work_duration) if entry.get("type") == WORK else 0.0
+
+def iter_json_array(f, chunk_size=1 << 16):
+    # Yields the items of a JSON array read from a text file, one at a time, holding about a chunk
+    # of text in memory rather than the whole list. Raises ValueError if the file isn't a JSON array.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect = "[" # then "value or ]", then ", or ]" and "value" in turn
+    need_more = False
+    while True:
+        if not eof and (need_more or len(buffer) - pos < chunk_size // 2):
+            # Top up early, so an item rarely straddles the end of the buffer
+            more = f.read(chunk_size)
+            if more: buffer, pos = buffer[pos:] + more, 0
+            else: eof = True
+            need_more = False
+        while pos < len(buffer) and buffer[pos].isspace(): pos += 1
+        if pos == len(buffer):
+            if eof: raise ValueError("unexpected end of JSON array")
+            need_more = True
+            continue
+        char = buffer[pos]
+        if expect == "[":
+            if char != "[": raise ValueError("expected a JSON array")
+            pos += 1; expect = "value or ]"
+        elif char == "]" and expect != "value":
+            return
+        elif expect == ", or ]":
+            if char != ",": raise ValueError(f"expected ',' or ']' in JSON array, found {char!r}")
+            pos += 1; expect = "value"
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof: raise
+                need_more = True
+                continue
+            if end == len(buffer) and not eof: # A number could go on in the next chunk
+                need_more = True
+                continue
+            yield item
+            pos = end; expect = ", or ]"
+
+def entries_for_date(session_log, date_str):
+    return [entry for entry in session_log if entry.get("session_for_date") == date_str]
+
+def summarize_entries(entries, work_duration):
+    summary = {"pomodoros": 0, "focus_minutes": 0.0, "break_minutes": 0.0, "skipped": 0}
+    for entry in entries:
+        if entry.get("type") == ROLLUP:
+            for key in summary: summary[key] += entry.get(key, 0)
+        elif entry.get("skipped", False):
+            summary["skipped"] += 1
+        elif entry.get("type") == WORK:
+            summary["pomodoros"] += 1
+            summary["focus_minutes"] += entry_minutes(entry, work_duration)
+        else:
+            summary["break_minutes"] += entry_minutes(entry, work_duration)
+    return summary
+
+def summarize_range(session_log, start_date, end_date, work_duration):
+    # Returns one summary per day from start_date to end_date inclusive, days without sessions included
+    start_str, end_str = start_date.isoformat(), end_date.isoformat()
+    entries_by_date = {}
+    for entry in session_log:
+        date_str = entry.get("session_for_date")
+        if date_str and start_str <= date_str <= end_str:
+            entries_by_date.setdefault(date_str, []).append(entry)
+
+    days = []
+    day = start_date
+    while day <= end_date:
+        date_str = day.isoformat()
+        summary = summarize_entries(entries_by_date.get(date_str, []), work_duration)
+        summary["date"] = date_str
+        days.append(summary)
+        day += datetime.timedelta(days=1)
+    return days
+
+def _entry_date(entry):
+    return entry.get("session_for_date") or (entry.get("timestamp") or "")[:10]
+
+def _short_key(entry):
+    # Tail of the entry key; uuid and legacy keys both end in random-looking hex
+    return entry_key(entry)[-12:]
+
+def _rolled_up_keys(rollup):
+    return rollup.get("session_ids", "").split()
+
+def _entry_part(entry, work_duration):
+    # What one raw entry adds to its rollup's totals, in ROLLUP_TOTALS order
+    if entry.get("skipped", False): return [0, 0.0, 0.0, 1]
+    if entry.get("type") == WORK: return [1, entry_minutes(entry, work_duration), 0.0, 0]
+    return [0, 0.0, entry_minutes(entry, work_duration), 0]
+
+def _rollup_parts(rollup):
+    # short key -> part for every session a rollup lists. Rollups folded before session_parts existed
+    # (or topped up since) only have totals for some keys; those keys share what the listed parts don't
+    # account for, evenly.
+    keys = _rolled_up_keys(rollup)
+    listed = rollup.get("session_parts") or {}
+    parts = {key: listed[key] for key in keys if key in listed}
+    unlisted = [key for key in keys if key not in parts]
+    if unlisted:
+        share = [(rollup.get(field, 0) - sum(part[i] for part in parts.values())) / len(unlisted)
+                 for i, field in enumerate(ROLLUP_TOTALS)]
+        for key in unlisted: parts[key] = [max(0, value) for value in share]
+    return parts, set(unlisted)
+
+def merge_rollups(first, second):
+    # One rollup with the sessions of both (same id), recomputed from the union of session_ids.
+    # The result depends only on the pair, not on which side is local, so every machine ends up
+    # with the same entry.
+    if first == second: return first
+    ordered = sorted((first, second), key=lambda rollup: (-len(_rolled_up_keys(rollup)), json.dumps(rollup, sort_keys=True)))
+    parts = {} # short key -> (part, exact)
+    for rollup in ordered: # Exact parts win over shares estimated for older rollups
+        rollup_parts, estimated = _rollup_parts(rollup)
+        for key, part in rollup_parts.items():
+            exact = key not in estimated
+            if key not in parts or (exact and not parts[key][1]): parts[key] = (part, exact)
+    merged = dict(ordered[0])
+    merged["task_text"] = next((rollup["task_text"] for rollup in ordered if rollup.get("task_text")), None)
+    tags = sorted(set(ordered[0].get("tags", ())) | set(ordered[1].get("tags", ())))
+    if tags: merged["tags"] = tags
+    keys = sorted(parts)
+    merged["session_ids"] = " ".join(keys)
+    merged["session_parts"] = {key: list(parts[key][0]) for key in keys}
+    for i, field in enumerate(ROLLUP_TOTALS):
+        total = sum(parts[key][0][i] for key in keys)
+        merged[field] = round(total, 1) if field.endswith("_minutes") else int(round(total))
+    return merged
+
+def _rollup_id(date_str, task_id):
+    return f"rollup-{date_str}-" + hashlib.sha1((task_id or "").encode("utf-8")).hexdigest()[:12]
+
+def compact_entries(session_log, cutoff_date_str, work_duration):
+    # Folds raw entries dated before cutoff_date_str into rollups, in place. Returns how many were folded.
+    rollups = {}
+    folded = 0
+    for entry in session_log:
+        if entry.get("type") == ROLLUP and _entry_date(entry) < cutoff_date_str:
+            rollups[entry_key(entry)] = entry
+    kept = []
+    for entry in session_log:
+        date_str = _entry_date(entry)
+        if entry.get("type") == ROLLUP or not date_str or date_str >= cutoff_date_str:
+            kept.append(entry)
+            continue
+        task_id = entry.get("task_id") if entry.get("type") == WORK else None
+        rollup_id = _rollup_id(date_str, task_id)
+        rollup = rollups.get(rollup_id)
+        if rollup is None:
+            rollup = {"id": rollup_id, "type": ROLLUP, "timestamp": f"{date_str}T23:59:59.999999",
+                      "session_for_date": date_str, "task_id": task_id, "task_text": None,
+                      "pomodoros": 0, "focus_minutes": 0.0, "break_minutes": 0.0, "skipped": 0, "session_ids": "",
+                      "session_parts": {}}
+            rollups[rollup_id] = rollup
+            kept.append(rollup)
+        if entry.get("task_text"): rollup["task_text"] = entry["task_text"]
+        if entry.get("tags"): rollup["tags"] = sorted(set(rollup.get("tags", ())) | set(entry["tags"]))
+        part = _entry_part(entry, work_duration)
+        for i, field in enumerate(ROLLUP_TOTALS):
+            rollup[field] = round(rollup[field] + part[i], 1) if field.endswith("_minutes") else rollup[field] + part[i]
+        rollup["session_ids"] = (rollup["session_ids"] + " " + _short_key(entry)).lstrip()
+        rollup.setdefault("session_parts", {})[_short_key(entry)] = part
+        folded += 1
+    if folded:
+        kept.sort(key=lambda entry: entry.get("timestamp") or "")
+        session_log[:] = kept
+    return folded
+
+def merge_entries(session_log, other_entries):
+    # Adds entries from other_entries that session_log doesn't have yet, in place, keeping timestamp order.
+    # Rollups with the same id are combined (merge_rollups) and supersede the raw entries they list.
+    # Returns the entries that were added or replaced.
+    positions = {entry_key(entry): i for i, entry in enumerate(session_log)}
+    covered = set()
+    for entry in session_log:
+        if entry.get("type") == ROLLUP: covered.update(_rolled_up_keys(entry))
+    added = []
+    for entry in other_entries:
+        key = entry_key(entry)
+        if entry.get("type") == ROLLUP:
+            pos = positions.get(key)
+            if pos is not None:
+                merged = merge_rollups(session_log[pos], entry)
+                if merged != session_log[pos]:
+                    session_log[pos] = merged
+                    covered.update(_rolled_up_keys(merged))
+                    added.append(merged)
+                continue
+            covered.update(_rolled_up_keys(entry))
+        elif key in positions or key[-12:] in covered:
+            continue
+        positions[key] = len(session_log)
+        session_log.append(entry)
+        added.append(entry)
+    if not added: return added
+    is_live = lambda entry: entry.get("type") == ROLLUP or _short_key(entry) not in covered
+    session_log[:] = [entry for entry in session_log if is_live(entry)]
+    session_log.sort(key=lambda entry: entry.get("timestamp") or "")
+    return [entry for entry in added if is_live(entry)]
+
+def format_minutes(minutes):
+    hours = int(minutes // 60)
+    return f"{hours}h {int(round(minutes % 60))}m"
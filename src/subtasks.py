@@ -0,0 +1,91 @@
+# HyperPomo/src/subtasks.py
+# Parent/child links between tasks and the pomodoro totals rolled up to each parent.
+#
+# Every task adds its own estimated and completed pomodoros to each of its ancestors. When a task
+# changes, TaskManager calls update() and only the difference is pushed up the parent chain:
+# O(depth) per change, never a walk over the tree below.
+MAX_DEPTH = 64 # Guards the ancestor walk against a parent cycle in hand-edited or merged data
+
+class SubtaskIndex:
+    def __init__(self):
+        self._own = {} # task id -> (parent id, estimated, completed, done) as last indexed
+        self._totals = {} # task id -> [estimated, completed] summed over all descendants
+        self._children = {} # parent id -> {child id: None}, in insertion order
+        self._done_children = {} # parent id -> direct children that are done
+
+    def _ancestors(self, parent_id):
+        seen = set()
+        while parent_id is not None and parent_id not in seen and len(seen) < MAX_DEPTH:
+            seen.add(parent_id)
+            yield parent_id
+            own = self._own.get(parent_id)
+            parent_id = own[0] if own else None
+
+    def _apply(self, task_id, own, sign, with_descendants=True, relink=True):
+        # relink=False leaves the child in its place among its parent's children (same parent before and after)
+        parent_id, estimated, completed, done = own
+        if parent_id is None: return
+        if with_descendants:
+            below = self._totals.get(task_id, (0, 0))
+            estimated += below[0]; completed += below[1]
+        for ancestor_id in self._ancestors(parent_id):
+            if ancestor_id == task_id: break
+            totals = self._totals.setdefault(ancestor_id, [0, 0])
+            totals[0] += sign * estimated; totals[1] += sign * completed
+        if relink:
+            children = self._children.setdefault(parent_id, {})
+            if sign > 0: children[task_id] = None
+            else:
+                children.pop(task_id, None)
+                if not children: del self._children[parent_id]
+        if done:
+            self._done_children[parent_id] = self._done_children.get(parent_id, 0) + sign
+            if not self._done_children[parent_id]: del self._done_children[parent_id]
+
+    def update(self, task):
+        new = (task.parent_id, task.estimated_pomodoros, task.completed_pomodoros, task.done)
+        old = self._own.get(task.id)
+        if old == new: return
+        relink = old is None or old[0] != new[0] # Only adding or reparenting moves the child
+        if old: self._apply(task.id, old, -1, relink=relink)
+        self._own[task.id] = new
+        self._apply(task.id, new, 1, relink=relink)
+
+    def discard(self, task_id):
+        # The task's own totals stay put: its children still point at it until they go too
+        old = self._own.pop(task_id, None)
+        if old: self._apply(task_id, old, -1)
+
+    def rebuild(self, tasks):
+        self.__init__()
+        for task in tasks:
+            self._own[task.id] = (task.parent_id, task.estimated_pomodoros, task.completed_pomodoros, task.done)
+        for task_id, own in self._own.items():
+            self._apply(task_id, own, 1, with_descendants=False)
+
+    def children_ids(self, task_id):
+        return list(self._children.get(task_id, ()))
+
+    def has_children(self, task_id):
+        return task_id in self._children
+
+    def descendant_ids(self, task_id):
+        result, stack, seen = [], self.children_ids(task_id), {task_id}
+        while stack:
+            child_id = stack.pop()
+            if child_id in seen: continue
+            seen.add(child_id)
+            result.append(child_id)
+            stack.extend(self.children_ids(child_id))
+        return result
+
+    def is_ancestor(self, ancestor_id, task_id):
+        own = self._own.get(task_id)
+        return own is not None and ancestor_id in self._ancestors(own[0])
+
+    def rollup(self, task_id):
+        # The task's own pomodoros plus everything below it, and how many direct children are done
+        own = self._own.get(task_id, (None, 0, 0, False))
+        below = self._totals.get(task_id, (0, 0))
+        return {"estimated": own[1] + below[0], "completed": own[2] + below[1],
+                "children": len(self._children.get(task_id, ())), "children_done": self._done_children.get(task_id, 0)}
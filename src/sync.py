@@ -0,0 +1,244 @@
+# HyperPomo/src/sync.py
+# Delta sync between machines through a shared folder (USB stick, Syncthing/Dropbox folder, ...).
+#
+# Each export writes one immutable change file into <sync_dir>/hyperpomo-sync/ holding only the
+# task records and sessions that changed since this machine's last export:
+#
+#   changes-<machine id>-<seq>-<sha1 of content>.jsonl
+#
+# Imports read only the files this machine hasn't applied yet. Merging is deterministic, so
+# every machine converges:
+#   - tasks: three-way merge per field against the version both sides last agreed on, so edits
+#     to different fields are all kept; a field changed on both sides goes to the newer
+#     (updated_at, content hash) and pomodoros counted on both sides are added up
+#   - deletions: win unless the task was edited here since the deleting machine last saw it
+#   - sessions: union by session id
+import datetime
+import hashlib
+import json
+import os
+import re
+import socket
+import uuid
+
+from . import session_log as sl
+
+SYNC_SUBDIR = "hyperpomo-sync"
+FORMAT_VERSION = 1
+_CHANGE_FILE_RE = re.compile(r"^changes-(?P<machine>[A-Za-z0-9_.-]+)-(?P<seq>\d+)-(?P<digest>[0-9a-f]{16})\.jsonl$")
+
+def record_hash(data):
+    # Hash of a task's content; updated_at is left out so the same edit merged on two machines hashes the same
+    content = {key: value for key, value in data.items() if key != "updated_at"}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, separators=(',', ':')).encode("utf-8")).hexdigest()
+
+def merge_task_fields(base, local, remote):
+    # base is the version both sides last agreed on (None if they never did)
+    base = base or {}
+    local_key = (local.get("updated_at") or "", record_hash(local))
+    remote_key = (remote.get("updated_at") or "", record_hash(remote))
+    newer = remote if remote_key > local_key else local
+    merged = {}
+    for key in set(local) | set(remote):
+        if key == "updated_at": continue
+        ours, theirs, common = local.get(key), remote.get(key), base.get(key)
+        if key == "completed_pomodoros" and all(isinstance(v, int) for v in (ours, theirs, common)):
+            merged[key] = max(0, ours + theirs - common) # Pomodoros logged on both machines add up
+        elif ours == theirs or theirs == common: merged[key] = ours
+        elif ours == common: merged[key] = theirs
+        else:
+            merged[key] = newer.get(key)
+    merged["updated_at"] = max(local_key, remote_key)[0]
+    return merged
+
+def _first_index_after(session_log, timestamp):
+    # The log is kept in timestamp order, so the unsynced tail is found by binary search
+    lo, hi = 0, len(session_log)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (session_log[mid].get("timestamp") or "") <= timestamp: lo = mid + 1
+        else: hi = mid
+    return lo
+
+class SyncManager:
+    def __init__(self, config_manager, task_manager, session_log):
+        self.config_manager = config_manager
+        self.task_manager = task_manager
+        self.session_log = session_log
+        self.state_path = config_manager.get_sync_state_path()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        state = self.config_manager.load_json_file(self.state_path, {})
+        hostname = socket.gethostname()
+        if not isinstance(state, dict) or not state.get("machine_id") or state.get("hostname") != hostname:
+            # First sync on this machine, or a data dir copied over from another machine:
+            # take a new identity and start from scratch so nothing is assumed to be synced
+            slug = re.sub(r"[^A-Za-z0-9_.]", "", hostname)[:24] or "machine"
+            state = {"machine_id": f"{slug}-{uuid.uuid4().hex[:8]}", "hostname": hostname}
+        state.setdefault("seq", 0)
+        state.setdefault("task_base", {}) # task id -> version last exported or imported, the merge base
+        state.setdefault("last_export_at", "")
+        state.setdefault("session_watermark", "") # Timestamp of the newest session already exported
+        state.setdefault("imported_session_ids", []) # Imported past the watermark; not to be echoed back
+        state.setdefault("applied_files", [])
+        return state
+
+    def _save_state(self):
+        self.config_manager.save_json_file(self.state_path, self.state)
+
+    def export_changes(self, sync_dir):
+        # Returns (path of the new change file or None if nothing changed, number of records)
+        out_dir = os.path.join(sync_dir, SYNC_SUBDIR)
+        os.makedirs(out_dir, exist_ok=True)
+        now = datetime.datetime.now().isoformat()
+        bases = self.state["task_base"]
+        since = self.state["last_export_at"]
+
+        records = []
+        current_ids = set()
+        for task in self.task_manager.tasks:
+            current_ids.add(task.id)
+            base = bases.get(task.id)
+            if since and base is not None and (task.updated_at or "") < since:
+                continue # Untouched since the last export; skip hashing it
+            data = task.to_dict()
+            digest = record_hash(data)
+            if base is not None and record_hash(base) == digest: continue
+            records.append({"kind": "task", "id": task.id, "updated_at": task.updated_at, "hash": digest, "data": data})
+        deleted_ids = [task_id for task_id in bases if task_id not in current_ids]
+        for task_id in deleted_ids:
+            records.append({"kind": "task_deleted", "id": task_id, "deleted_at": now})
+
+        watermark = self.state["session_watermark"]
+        skip_ids = set(self.state["imported_session_ids"])
+        new_watermark = watermark
+        for entry in self.session_log[_first_index_after(self.session_log, watermark):]:
+            new_watermark = max(new_watermark, entry.get("timestamp") or "")
+            session_id = sl.entry_key(entry)
+            if session_id in skip_ids: continue
+            records.append({"kind": "session", "id": session_id, "data": entry})
+
+        if not records: return None, 0
+
+        seq = self.state["seq"] + 1
+        header = {"kind": "header", "version": FORMAT_VERSION, "machine_id": self.state["machine_id"],
+                  "seq": seq, "created_at": now, "records": len(records)}
+        body = "".join(json.dumps(record, sort_keys=True, separators=(',', ':')) + "\n" for record in [header] + records).encode("utf-8")
+        name = f"changes-{self.state['machine_id']}-{seq:06d}-{hashlib.sha1(body).hexdigest()[:16]}.jsonl"
+        path = os.path.join(out_dir, name)
+        tmp_path = path + ".part" # Never picked up by an importer, even if the folder syncs mid-write
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        # Only advance the watermarks once the change file is safely written
+        for record in records:
+            if record["kind"] == "task": bases[record["id"]] = record["data"]
+        for task_id in deleted_ids: del bases[task_id]
+        self.state.update(seq=seq, last_export_at=now, session_watermark=new_watermark, imported_session_ids=[])
+        self.state["applied_files"].append(name)
+        self._save_state()
+        return path, len(records)
+
+    def _read_change_file(self, path, expected_digest):
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except IOError:
+            return None
+        if hashlib.sha1(body).hexdigest()[:16] != expected_digest:
+            return None # Still being copied, or damaged: try again next time
+        try:
+            return [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    def import_changes(self, sync_dir):
+        stats = {"files": 0, "tasks_updated": 0, "tasks_deleted": 0, "sessions_added": 0}
+        in_dir = os.path.join(sync_dir, SYNC_SUBDIR)
+        if not os.path.isdir(in_dir): return stats
+
+        applied = set(self.state["applied_files"])
+        incoming_puts = {} # task id -> winning record among the new files
+        incoming_deletes = {} # task id -> latest deleted_at
+        incoming_sessions = []
+        newly_applied = []
+        for name in sorted(os.listdir(in_dir)):
+            match = _CHANGE_FILE_RE.match(name)
+            if not match or name in applied: continue
+            records = self._read_change_file(os.path.join(in_dir, name), match.group("digest"))
+            if records is None: continue
+            newly_applied.append(name)
+            if match.group("machine") == self.state["machine_id"]: continue
+            for record in records:
+                kind = record.get("kind")
+                if kind == "task" and isinstance(record.get("data"), dict):
+                    current = incoming_puts.get(record["id"])
+                    if current is None or (record["updated_at"] or "", record["hash"]) > (current["updated_at"] or "", current["hash"]):
+                        incoming_puts[record["id"]] = record
+                elif kind == "task_deleted":
+                    incoming_deletes[record["id"]] = max(incoming_deletes.get(record["id"], ""), record.get("deleted_at") or "")
+                elif kind == "session" and isinstance(record.get("data"), dict):
+                    incoming_sessions.append(record["data"])
+        if not newly_applied: return stats
+
+        bases = self.state["task_base"]
+        now = datetime.datetime.now().isoformat()
+        puts, removed_ids = [], []
+        for task_id, record in incoming_puts.items():
+            deleted_at = incoming_deletes.get(task_id)
+            if deleted_at and deleted_at >= (record["updated_at"] or ""):
+                continue # Deleted elsewhere after this edit; handled as a deletion below
+            local = self.task_manager.get_task_by_id(task_id)
+            base = bases.get(task_id)
+            if local is None:
+                if base is not None and record_hash(base) == record["hash"]:
+                    continue # We deleted it and the other machine hasn't touched it since
+                puts.append(record["data"])
+            else:
+                local_data = local.to_dict()
+                merged = merge_task_fields(base, local_data, record["data"])
+                digest = record_hash(merged)
+                if digest != record["hash"] and digest != record_hash(local_data):
+                    merged["updated_at"] = now # A mix of both sides; make sure the next export sends it
+                if digest != record_hash(local_data):
+                    puts.append(merged)
+            bases[task_id] = record["data"]
+        put_ids = {data["id"] for data in puts}
+        for task_id, deleted_at in incoming_deletes.items():
+            local = self.task_manager.get_task_by_id(task_id)
+            if task_id in put_ids: continue
+            if not local:
+                bases.pop(task_id, None) # Deleted on both sides
+                continue
+            base = bases.get(task_id)
+            if base is not None:
+                unchanged_here = record_hash(local.to_dict()) == record_hash(base)
+            else:
+                unchanged_here = (local.updated_at or "") <= deleted_at
+            if unchanged_here:
+                removed_ids.append(task_id)
+
+        if puts or removed_ids:
+            self.task_manager.apply_synced_changes(puts, removed_ids)
+        for task_id in removed_ids:
+            bases.pop(task_id, None)
+
+        added = self.config_manager.merge_session_entries(self.session_log, incoming_sessions)
+        if added:
+            self.config_manager.save_session_log(self.session_log)
+            self.state["imported_session_ids"].extend(sl.entry_key(entry) for entry in added)
+
+        self.state["applied_files"].extend(newly_applied)
+        self._save_state()
+        stats.update(files=len(newly_applied), tasks_updated=len(puts), tasks_deleted=len(removed_ids), sessions_added=len(added))
+        return stats
+
+    def sync(self, sync_dir):
+        # Import first so the export doesn't send back what we just received
+        stats = self.import_changes(sync_dir)
+        path, exported = self.export_changes(sync_dir)
+        stats["exported"] = exported
+        stats["export_file"] = path
+        return stats
@@ -0,0 +1,121 @@
+# HyperPomo/src/tags.py
+# Tags (projects, clients, ...) on tasks and work sessions, and running per-tag totals.
+#
+# TagIndex keeps two sets of counters. Task counters (tasks, active, estimated and completed
+# pomodoros) follow TaskManager's update()/discard() calls, each O(tags on the task). Session
+# counters (pomodoros and focus minutes per day) grow by one entry per add_session() call as
+# sessions are logged, and are only rebuilt when another machine or instance changes the log.
+# Per-tag questions are then answered from the counters, never by scanning tasks or sessions.
+import re
+
+from . import session_log as sl
+
+_HASHTAG_RE = re.compile(r"(?<!\S)#([^\s#]+)")
+
+def normalize_tag(tag):
+    return tag.strip().lstrip("#").strip().lower()
+
+def normalize_tags(tags):
+    # Lower-cased, without '#', duplicates and empties dropped, order kept
+    result = []
+    for tag in tags or ():
+        tag = normalize_tag(tag)
+        if tag and tag not in result: result.append(tag)
+    return result
+
+def parse_tags(text):
+    # "Write intro #book #Writing" -> ("Write intro", ["book", "writing"])
+    tags = normalize_tags(_HASHTAG_RE.findall(text))
+    return " ".join(_HASHTAG_RE.sub("", text).split()), tags
+
+def format_tags(tags):
+    return " ".join(f"#{tag}" for tag in tags)
+
+class TagIndex:
+    def __init__(self):
+        self._task_contributions = {} # task id -> (tags, active, estimated, completed)
+        self.task_totals = {} # tag -> {"tasks", "active", "estimated", "completed"}
+        self.task_ids = {} # tag -> {task id: None}
+        self.focus_by_day = {} # tag -> {date string: [pomodoros, focus minutes]}
+
+    # Task counters, kept current by TaskManager
+    def _apply_task(self, task_id, contribution, sign):
+        tags, active, estimated, completed = contribution
+        for tag in tags:
+            totals = self.task_totals.setdefault(tag, {"tasks": 0, "active": 0, "estimated": 0, "completed": 0})
+            totals["tasks"] += sign; totals["active"] += sign * active
+            totals["estimated"] += sign * estimated; totals["completed"] += sign * completed
+            ids = self.task_ids.setdefault(tag, {})
+            if sign > 0: ids[task_id] = None
+            else: ids.pop(task_id, None)
+            if not totals["tasks"]:
+                del self.task_totals[tag]
+                self.task_ids.pop(tag, None)
+
+    def update(self, task):
+        new = (tuple(task.tags), int(not task.done), task.estimated_pomodoros, task.completed_pomodoros)
+        old = self._task_contributions.get(task.id)
+        if old == new: return
+        if old: self._apply_task(task.id, old, -1)
+        if task.tags and not task.recurrence: # Templates count through their stored occurrences
+            self._task_contributions[task.id] = new
+            self._apply_task(task.id, new, 1)
+        else:
+            self._task_contributions.pop(task.id, None)
+
+    def discard(self, task_id):
+        old = self._task_contributions.pop(task_id, None)
+        if old: self._apply_task(task_id, old, -1)
+
+    def rebuild(self, tasks):
+        self._task_contributions = {}
+        self.task_totals = {}
+        self.task_ids = {}
+        for task in tasks: self.update(task)
+
+    # Session counters, kept current by PomodoroTimer.log_session
+    def add_session(self, entry, work_duration, fallback_tags=None):
+        # fallback_tags: for entries logged before sessions carried tags, the task's current tags
+        tags = entry["tags"] if "tags" in entry else (fallback_tags or ())
+        if not tags: return
+        if entry.get("type") == sl.ROLLUP:
+            pomodoros, minutes = entry.get("pomodoros", 0), entry.get("focus_minutes", 0.0)
+        elif entry.get("type") == sl.WORK and not entry.get("skipped", False):
+            pomodoros, minutes = 1, sl.entry_minutes(entry, work_duration)
+        else:
+            return
+        date_str = entry.get("session_for_date")
+        for tag in tags:
+            day = self.focus_by_day.setdefault(tag, {}).setdefault(date_str, [0, 0.0])
+            day[0] += pomodoros; day[1] += minutes
+
+    def rebuild_sessions(self, session_log, work_duration, tags_for_task=None):
+        # tags_for_task: task id -> tags, used for entries logged before sessions carried tags
+        self.focus_by_day = {}
+        for entry in session_log:
+            fallback = tags_for_task(entry.get("task_id")) if tags_for_task and "tags" not in entry else None
+            self.add_session(entry, work_duration, fallback)
+
+    # Queries
+    def all_tags(self):
+        return sorted(set(self.task_totals) | set(self.focus_by_day))
+
+    def active_tags(self):
+        return sorted(tag for tag, totals in self.task_totals.items() if totals["active"])
+
+    def focus_on(self, date_str):
+        # tag -> (pomodoros, focus minutes) for one day, tags with sessions that day only
+        return {tag: tuple(days[date_str]) for tag, days in self.focus_by_day.items() if date_str in days}
+
+    def focus_between(self, tag, start_str=None, end_str=None):
+        # (pomodoros, focus minutes) for one tag over an inclusive date range (open ends allowed)
+        pomodoros, minutes = 0, 0.0
+        for date_str, (day_pomodoros, day_minutes) in self.focus_by_day.get(tag, {}).items():
+            if (start_str is None or date_str >= start_str) and (end_str is None or date_str <= end_str):
+                pomodoros += day_pomodoros; minutes += day_minutes
+        return pomodoros, minutes
+
+    def summary(self, tag):
+        totals = self.task_totals.get(tag, {"tasks": 0, "active": 0, "estimated": 0, "completed": 0})
+        pomodoros, minutes = self.focus_between(tag)
+        return dict(totals, tag=tag, session_pomodoros=pomodoros, focus_minutes=round(minutes, 1))
@@ -2,10 +2,20 @@
 import uuid
 import datetime
 
+from .estimate_stats import EstimateStats
+from .estimate_suggester import EstimateSuggester
+from .deadline_index import DeadlineIndex
+from .subtasks import SubtaskIndex
+from .tags import TagIndex, normalize_tags
+from .task_query import TaskQuery, ScheduleIndex
+from . import recurrence as rec
+from . import events
+
 class Task:
     def __init__(self, text, estimated_pomodoros=1, completed_pomodoros=0,
                  done=False, id=None, notes="", scheduled_date=None, due_date=None,
-                 created_at=None, completed_at=None):
+                 created_at=None, completed_at=None, updated_at=None, recurrence=None, recurrence_id=None,
+                 parent_id=None, tags=None):
         self.id = id if id is not None else str(uuid.uuid4())
         self.text = text
         self.estimated_pomodoros = int(estimated_pomodoros)
@@ -19,6 +29,12 @@ class Task:
         
         self.created_at = created_at if created_at else datetime.datetime.now().isoformat()
         self.completed_at = completed_at # ISO string, set when task is marked done
+        # Last local or synced modification, used to merge edits from other machines
+        self.updated_at = updated_at if updated_at else (completed_at or self.created_at)
+        self.recurrence = recurrence # Rule dict (see recurrence.py) if this task is a recurring template
+        self.recurrence_id = recurrence_id # Template id, if this task is a stored occurrence of one
+        self.parent_id = parent_id # Id of the task this is a subtask of
+        self.tags = normalize_tags(tags) # Projects/clients, lower-case without '#'
 
     def to_dict(self):
         return {
@@ -29,7 +45,12 @@ class Task:
             "scheduled_date": self.scheduled_date,
             "due_date": self.due_date,
             "created_at": self.created_at,
-            "completed_at": self.completed_at
+            "completed_at": self.completed_at,
+            "updated_at": self.updated_at,
+            "recurrence": self.recurrence,
+            "recurrence_id": self.recurrence_id,
+            "parent_id": self.parent_id,
+            "tags": self.tags
         }
 
     @classmethod
@@ -44,7 +65,12 @@ class Task:
             scheduled_date=data.get("scheduled_date"),
             due_date=data.get("due_date"),
             created_at=data.get("created_at"),
-            completed_at=data.get("completed_at")
+            completed_at=data.get("completed_at"),
+            updated_at=data.get("updated_at"),
+            recurrence=data.get("recurrence"),
+            recurrence_id=data.get("recurrence_id"),
+            parent_id=data.get("parent_id"),
+            tags=data.get("tags")
         )
 
     def __str__(self):
@@ -53,76 +79,375 @@ class Task:
         return f"{{status}} {{self.text}}{{schedule_info}} (Est: {{self.estimated_pomodoros}}, Done: {{self.completed_pomodoros}})"
 
 class TaskManager:
-    def __init__(self, config_manager):
+    # Number of journal records after which the journal is folded back into the snapshot
+    JOURNAL_COMPACT_THRESHOLD = 200
+
+    def __init__(self, config_manager, load=True):
+        # load=False leaves the task list empty until load() is called, e.g. from a worker thread
         self.config_manager = config_manager
-        self.tasks = self._load_tasks_from_config()
+        self._dirty_ids = {} # task_id -> None, insertion-ordered so the journal follows mutation order
+        self._removed_ids = {}
+        self._journal_length = 0 # Records in the journal since the last snapshot
+        self._journal_offset = 0 # Bytes of the journal already applied to self.tasks
+        self._snapshot_stamp = None # (mtime_ns, size) of the snapshot we loaded, to notice another instance compacting
+        self.tasks = []
+        self._tasks_by_id = {}
+        # Derived views kept current task by task: each has update(task), discard(task_id) and rebuild(tasks)
+        self.estimate_stats = EstimateStats()
+        self.estimate_suggester = EstimateSuggester()
+        self.deadlines = DeadlineIndex()
+        self.recurring = rec.RecurrenceIndex()
+        self.subtasks = SubtaskIndex()
+        self.tags = TagIndex()
+        self.schedule = ScheduleIndex()
+        self._indexes = [self.estimate_stats, self.estimate_suggester, self.deadlines, self.recurring, self.subtasks, self.tags,
+                         self.schedule]
+        self.events = config_manager.events
+        if load: self.load()
+
+    def load(self):
+        # Reads the snapshot and journal and rebuilds every index
+        with self.config_manager.lock:
+            self._replace_all(self._load_tasks_from_config())
 
     def _load_tasks_from_config(self):
-        task_data_list = self.config_manager.get_all_tasks()
-        return [Task.from_dict(data) for data in task_data_list]
+        # Snapshot plus journal replay, as an insertion-ordered id -> Task dict. Caller holds the lock.
+        cm = self.config_manager
+        self._snapshot_stamp = cm.file_stamp(cm.get_tasks_snapshot_path())
+        tasks_by_id = {}
+        for data in cm.get_all_tasks():
+            task = Task.from_dict(data)
+            tasks_by_id[task.id] = task
+        # Replay changes made since the last snapshot on top of it
+        journal, self._journal_offset = cm.read_task_journal(0)
+        for record in journal:
+            op = record.get("op")
+            if op == "put" and isinstance(record.get("task"), dict):
+                task = Task.from_dict(record["task"])
+                tasks_by_id[task.id] = task
+            elif op == "del":
+                tasks_by_id.pop(record.get("id"), None)
+        self._journal_length = len(journal)
+        return tasks_by_id
+
+    def _replace_all(self, fresh_by_id):
+        # Existing Task objects are updated in place rather than swapped, since callers may hold them
+        for task_id, fresh in fresh_by_id.items():
+            existing = self._tasks_by_id.get(task_id)
+            if existing:
+                existing.__dict__.update(fresh.__dict__)
+                fresh_by_id[task_id] = existing
+        self.tasks = list(fresh_by_id.values())
+        self._tasks_by_id = fresh_by_id
+        for index in self._indexes: index.rebuild(self.tasks)
+        self.events.publish(events.TASKS_RELOADED)
+
+    # Every change to the task list, local or from elsewhere, goes through these two
+    def _task_changed(self, task, added=False):
+        for index in self._indexes: index.update(task)
+        self.events.publish(events.TASK_ADDED if added else events.TASK_UPDATED, task.id)
+
+    def _task_removed(self, task_id):
+        for index in self._indexes: index.discard(task_id)
+        self.events.publish(events.TASK_REMOVED, task_id)
+
+    def _apply_journal_records(self, records):
+        # Merges records written by another instance into the live task list
+        any_removed = False
+        for record in records:
+            op = record.get("op")
+            if op == "put" and isinstance(record.get("task"), dict):
+                fresh = Task.from_dict(record["task"])
+                existing = self._tasks_by_id.get(fresh.id)
+                if existing:
+                    existing.__dict__.update(fresh.__dict__)
+                else:
+                    self.tasks.append(fresh)
+                    self._tasks_by_id[fresh.id] = fresh
+                self._task_changed(existing or fresh, added=not existing)
+            elif op == "del" and record.get("id") in self._tasks_by_id:
+                del self._tasks_by_id[record["id"]]
+                self._task_removed(record["id"])
+                any_removed = True
+        if any_removed:
+            self.tasks = [task for task in self.tasks if self._tasks_by_id.get(task.id) is task]
+
+    def _catch_up_with_disk(self):
+        # Applies whatever other instances wrote since our last read. Caller holds the lock.
+        cm = self.config_manager
+        if cm.file_stamp(cm.get_tasks_snapshot_path()) != self._snapshot_stamp or cm.task_journal_size() < self._journal_offset:
+            # Someone compacted: the journal we were following is gone, start from the new snapshot
+            self._replace_all(self._load_tasks_from_config())
+            return True
+        records, self._journal_offset = cm.read_task_journal(self._journal_offset)
+        if not records: return False
+        self._journal_length += len(records)
+        self._apply_journal_records(records)
+        return True
+
+    def reload_external_changes(self):
+        # Cheap when nothing changed: two stat() calls, no parsing. Returns True if tasks changed.
+        cm = self.config_manager
+        if cm.file_stamp(cm.get_tasks_snapshot_path()) == self._snapshot_stamp and cm.task_journal_size() == self._journal_offset:
+            return False
+        with cm.lock:
+            return self._catch_up_with_disk()
+
+    def _mark_dirty(self, task_id):
+        self._dirty_ids[task_id] = None
+
+    def _touch(self, task, added=False):
+        # Every local change to a task ends here
+        task.updated_at = datetime.datetime.now().isoformat()
+        self._mark_dirty(task.id)
+        self._task_changed(task, added)
+
+    def _mark_removed(self, task_id):
+        self._task_removed(task_id)
+        self._dirty_ids.pop(task_id, None)
+        self._removed_ids[task_id] = None
 
     def _save_tasks_to_config(self):
-        self.config_manager.save_tasks([task.to_dict() for task in self.tasks])
+        # Only the tasks touched since the last save are written, as journal records
+        records = []
+        for task_id in self._dirty_ids:
+            task = self._tasks_by_id.get(task_id)
+            if task: records.append({"op": "put", "task": task.to_dict()})
+        for task_id in self._removed_ids:
+            records.append({"op": "del", "id": task_id})
+        self._dirty_ids.clear()
+        self._removed_ids.clear()
+        if not records: return
+
+        cm = self.config_manager
+        with cm.lock:
+            # Merge other instances' appends first, then re-apply ours on top so memory
+            # matches the order the records end up in on disk
+            if self._catch_up_with_disk():
+                self._apply_journal_records(records)
+            cm.append_task_journal(records)
+            self._journal_offset = cm.task_journal_size()
+        self._journal_length += len(records)
+        if self._journal_length >= self.JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        # Fold the journal into a fresh snapshot of all tasks
+        if self._dirty_ids or self._removed_ids:
+            self._save_tasks_to_config()
+        cm = self.config_manager
+        with cm.lock:
+            self._catch_up_with_disk()
+            if cm.save_tasks([task.to_dict() for task in self.tasks]):
+                cm.clear_task_journal()
+                self._snapshot_stamp = cm.file_stamp(cm.get_tasks_snapshot_path())
+                self._journal_offset = 0
+                self._journal_length = 0
 
-    def add_task(self, text, estimated_pomodoros=1, notes="", scheduled_date=None, due_date=None):
+    def add_task(self, text, estimated_pomodoros=1, notes="", scheduled_date=None, due_date=None, recurrence=None,
+                 parent_id=None, tags=None):
+        # recurrence: a rule from recurrence.make_rule(); the task is then stored once as a template
+        # parent_id: adds the task as a subtask of that task
         if not text.strip(): return None
+        if parent_id is not None and parent_id not in self._tasks_by_id: return None
         # Ensure date is in YYYY-MM-DD string format if provided
         if isinstance(scheduled_date, datetime.date):
             scheduled_date = scheduled_date.isoformat()
         if isinstance(due_date, datetime.date):
             due_date = due_date.isoformat()
+        if recurrence:
+            scheduled_date = None # Templates only show up through their occurrences
             
         new_task = Task(text.strip(), estimated_pomodoros, notes=notes, 
-                        scheduled_date=scheduled_date, due_date=due_date)
+                        scheduled_date=scheduled_date, due_date=due_date, recurrence=recurrence, parent_id=parent_id,
+                        tags=tags)
         self.tasks.append(new_task)
+        self._tasks_by_id[new_task.id] = new_task
+        self._touch(new_task, added=True)
+        self._roll_up_done(parent_id)
         self._save_tasks_to_config()
         return new_task
 
     def remove_task(self, task_id):
-        self.tasks = [task for task in self.tasks if task.id != task_id]
+        # Removing one occurrence of a recurring task skips that date in its template
+        occurrence = rec.parse_occurrence_id(task_id)
+        template = self.recurring.templates.get(occurrence[0]) if occurrence else None
+        if template and occurrence[1] not in template.recurrence["skipped"]:
+            template.recurrence = dict(template.recurrence, skipped=template.recurrence["skipped"] + [occurrence[1]])
+            self._touch(template)
+        if task_id in self._tasks_by_id:
+            # Subtasks go with their parent
+            parent_id = self._tasks_by_id[task_id].parent_id
+            removed = [task_id] + self.subtasks.descendant_ids(task_id)
+            for removed_id in removed:
+                if self._tasks_by_id.pop(removed_id, None): self._mark_removed(removed_id)
+            self.tasks = [task for task in self.tasks if task.id in self._tasks_by_id]
+            self._roll_up_done(parent_id)
         self._save_tasks_to_config()
 
+    def _virtual_occurrence(self, template, date_str):
+        return Task(template.text, template.estimated_pomodoros, notes=template.notes,
+                    id=rec.occurrence_id(template.id, date_str), scheduled_date=date_str,
+                    created_at=template.created_at, recurrence_id=template.id, tags=template.tags)
+
+    def _occurrence_for(self, task_id):
+        # The not-yet-stored occurrence an id refers to, or None
+        occurrence = rec.parse_occurrence_id(task_id)
+        if not occurrence or task_id in self._tasks_by_id: return None
+        template = self.recurring.templates.get(occurrence[0])
+        if not template or not rec.occurs_on(template.recurrence, datetime.date.fromisoformat(occurrence[1])):
+            return None
+        return self._virtual_occurrence(template, occurrence[1])
+
+    def _materialize(self, task_id):
+        # Stores an occurrence the first time it is worked on, completed or edited
+        task = self._occurrence_for(task_id)
+        if task:
+            self.tasks.append(task)
+            self._tasks_by_id[task.id] = task
+            self._touch(task, added=True)
+        return self._tasks_by_id.get(task_id)
+
+    def occurrences_on(self, date_obj):
+        # Occurrences of recurring tasks due on date_obj that haven't been stored yet
+        date_str = date_obj.isoformat()
+        return [self._virtual_occurrence(template, date_str) for template in self.recurring.templates.values()
+                if rec.occurs_on(template.recurrence, date_obj) and rec.occurrence_id(template.id, date_str) not in self._tasks_by_id]
+
+    def get_recurring_tasks(self):
+        return list(self.recurring.templates.values())
+
+    def _set_done(self, task, done):
+        task.done = done
+        task.completed_at = datetime.datetime.now().isoformat() if done else None
+        self._touch(task)
+
+    def _roll_up_done(self, parent_id):
+        # A parent is done exactly when all its subtasks are; walks up only while something changes
+        while parent_id is not None:
+            parent = self._tasks_by_id.get(parent_id)
+            if parent is None: return
+            rollup = self.subtasks.rollup(parent_id)
+            all_done = rollup["children"] > 0 and rollup["children_done"] == rollup["children"]
+            if not rollup["children"] or parent.done == all_done: return
+            self._set_done(parent, all_done)
+            parent_id = parent.parent_id
+
     def toggle_task_done(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                task.done = not task.done
-                task.completed_at = datetime.datetime.now().isoformat() if task.done else None
-                break
+        task = self._materialize(task_id)
+        if task:
+            self._set_done(task, not task.done)
+            self._roll_up_done(task.parent_id)
         self._save_tasks_to_config()
+
+    def set_parent(self, task_id, parent_id):
+        # Moves a task under parent_id (None for top level); refuses to create a cycle
+        task = self._tasks_by_id.get(task_id)
+        if not task or task.parent_id == parent_id: return bool(task)
+        if parent_id is not None and (parent_id == task_id or parent_id not in self._tasks_by_id
+                                      or self.subtasks.is_ancestor(task_id, parent_id)):
+            return False
+        old_parent_id = task.parent_id
+        task.parent_id = parent_id
+        self._touch(task)
+        self._roll_up_done(old_parent_id)
+        self._roll_up_done(parent_id)
+        self._save_tasks_to_config()
+        return True
+
+    def get_task_tags(self, task_id):
+        task = self._tasks_by_id.get(task_id) if task_id else None
+        return task.tags if task else []
+
+    def get_subtasks(self, task_id):
+        return [self._tasks_by_id[child_id] for child_id in self.subtasks.children_ids(task_id) if child_id in self._tasks_by_id]
+
+    def get_rollup(self, task_id):
+        # {"estimated", "completed", "children", "children_done"} for the task and its subtasks, O(1)
+        return self.subtasks.rollup(task_id)
     
     def increment_pomodoro_for_task(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                task.completed_pomodoros += 1
-                break
+        task = self._materialize(task_id)
+        if task:
+            task.completed_pomodoros += 1
+            self._touch(task)
+        self._save_tasks_to_config()
+
+    def apply_synced_changes(self, task_dicts, removed_ids):
+        # Stores records merged from another machine as-is (keeping their updated_at) in one journal write
+        for data in task_dicts:
+            fresh = Task.from_dict(data)
+            existing = self._tasks_by_id.get(fresh.id)
+            if existing:
+                existing.__dict__.update(fresh.__dict__)
+            else:
+                self.tasks.append(fresh)
+                self._tasks_by_id[fresh.id] = fresh
+            self._mark_dirty(fresh.id)
+            self._task_changed(existing or fresh, added=not existing)
+        removed = [task_id for task_id in removed_ids if task_id in self._tasks_by_id]
+        for task_id in removed:
+            del self._tasks_by_id[task_id]
+            self._mark_removed(task_id)
+        if removed:
+            self.tasks = [task for task in self.tasks if task.id in self._tasks_by_id]
         self._save_tasks_to_config()
 
+    def schedule_tasks(self, assignments):
+        # Applies {task id: date string or None} as one batch: a single journal write for all of them
+        changed = 0
+        for task_id, date_str in assignments.items():
+            task = self._tasks_by_id.get(task_id)
+            if task and task.scheduled_date != date_str:
+                task.scheduled_date = date_str
+                self._touch(task)
+                changed += 1
+        if changed: self._save_tasks_to_config()
+        return changed
+
+    def get_overdue_tasks(self, today=None):
+        return self.query().active().overdue(today).list()
+
+    def get_tasks_due_within(self, days, today=None):
+        # Active tasks due from today through today + days, soonest first
+        return self.query().active().due_within(days, today).list()
+
+    def get_next_deadline(self, today=None):
+        entry = self.deadlines.next_deadline(today)
+        return self._tasks_by_id[entry[1]] if entry else None
+
+    def suggest_estimate(self, text):
+        # (estimate, similar completed tasks) or (None, []); see EstimateSuggester
+        return self.estimate_suggester.suggest(text)
+
     def get_task_by_id(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
+        task = self._tasks_by_id.get(task_id)
+        if task is None and task_id and "@" in task_id:
+            return self._occurrence_for(task_id)
+        return task
+
+    def query(self):
+        # A lazy, composable TaskQuery over all tasks, e.g. query().active().scheduled_on(day).limit(20)
+        return TaskQuery(self)
 
     def get_tasks_by_scheduled_date(self, date_obj): # date_obj is datetime.date
-        date_str = date_obj.isoformat()
-        return [task for task in self.tasks if task.scheduled_date == date_str and not task.done]
+        return self.query().active().scheduled_on(date_obj).list()
     
     def get_unscheduled_active_tasks(self):
-        return [task for task in self.tasks if not task.scheduled_date and not task.done]
+        return self.query().active().unscheduled().list()
 
     def get_all_active_tasks(self): # All active, regardless of schedule
-        return [task for task in self.tasks if not task.done]
+        return self.query().active().list()
         
     def get_completed_tasks(self, scheduled_date_obj=None):
         if scheduled_date_obj:
-            date_str = scheduled_date_obj.isoformat()
-            return [task for task in self.tasks if task.done and task.scheduled_date == date_str]
-        return [task for task in self.tasks if task.done]
+            return self.query().done().scheduled_on(scheduled_date_obj).list()
+        return self.query().done().list()
 
 
     def update_task(self, task_id, text=None, estimated_pomodoros=None, notes=None, 
-                    scheduled_date=None, due_date=None):
-        task = self.get_task_by_id(task_id)
+                    scheduled_date=None, due_date=None, tags=None):
+        task = self._materialize(task_id)
         if task:
             if text is not None: task.text = text
             if estimated_pomodoros is not None: task.estimated_pomodoros = int(estimated_pomodoros)
@@ -131,6 +456,8 @@ class TaskManager:
                 task.scheduled_date = scheduled_date.isoformat() if isinstance(scheduled_date, datetime.date) else scheduled_date
             if due_date is not None:  # Can be datetime.date object or string or None
                 task.due_date = due_date.isoformat() if isinstance(due_date, datetime.date) else due_date
+            if tags is not None: task.tags = normalize_tags(tags)
+            self._touch(task)
             self._save_tasks_to_config()
             return True
         return False
@@ -0,0 +1,217 @@
+# HyperPomo/src/task_query.py
+# Composable, lazy task queries: TaskManager.query() returns a TaskQuery, each filter method returns
+# a new query, and iterating it yields matching tasks one at a time.
+#
+# A query starts from the narrowest index that covers one of its filters (scheduled date, due date,
+# tag, parent), falling back to the full task list, then checks every filter on each candidate, so
+# the result is the same whichever index served it. Without order_by(), "first N" stops after N
+# matches; with it, the matches are collected once and the top N picked with a heap.
+# Like iterating a dict, finish iterating (or take list()) before changing tasks.
+import copy
+import datetime
+import heapq
+import itertools
+
+class ScheduleIndex:
+    # Task ids by scheduled date (None for unscheduled), in the order tasks got that date.
+    # Recurring templates aren't listed: their occurrences are, once stored.
+    def __init__(self):
+        self._date_by_id = {}
+        self.by_date = {} # date string or None -> {task id: None}
+
+    def update(self, task):
+        indexed = task.id in self._date_by_id
+        if task.recurrence:
+            if indexed: self.discard(task.id)
+            return
+        if indexed and self._date_by_id[task.id] == task.scheduled_date: return
+        if indexed: self.discard(task.id)
+        self._date_by_id[task.id] = task.scheduled_date
+        self.by_date.setdefault(task.scheduled_date, {})[task.id] = None
+
+    def discard(self, task_id):
+        if task_id not in self._date_by_id: return
+        date_str = self._date_by_id.pop(task_id)
+        bucket = self.by_date.get(date_str)
+        if bucket is not None:
+            bucket.pop(task_id, None)
+            if not bucket: del self.by_date[date_str]
+
+    def rebuild(self, tasks):
+        self.__init__()
+        for task in tasks: self.update(task)
+
+    def ids_on(self, date_str):
+        return self.by_date.get(date_str, {})
+
+    def dates_between(self, start_str, end_str):
+        return sorted(date_str for date_str in self.by_date if date_str and start_str <= date_str <= end_str)
+
+# order_by() fields: task -> sort value, and the value used in place of a missing one
+ORDER_FIELDS = {
+    "text": (lambda task: task.text.lower(), ""),
+    "created": (lambda task: task.created_at, ""),
+    "updated": (lambda task: task.updated_at, ""),
+    "scheduled": (lambda task: task.scheduled_date, ""),
+    "due": (lambda task: task.due_date, ""),
+    "completed_at": (lambda task: task.completed_at, ""),
+    "estimated": (lambda task: task.estimated_pomodoros, 0),
+    "completed": (lambda task: task.completed_pomodoros, 0),
+}
+_ANY = object()
+
+class TaskQuery:
+    def __init__(self, task_manager):
+        self._tm = task_manager
+        self._date_range = None # (start, end) scheduled date objects, inclusive, or None for any
+        self._unscheduled = None # True: unscheduled only; "also": the date range plus unscheduled
+        self._done = None
+        self._due = None # ("overdue" | "within", days, today date)
+        self._tags = ()
+        self._text = None
+        self._parent_id = _ANY
+        self._occurrences = True
+        self._order = None # (field, descending)
+        self._limit = None
+
+    def _with(self, **changes):
+        query = copy.copy(self)
+        for name, value in changes.items(): setattr(query, "_" + name, value)
+        return query
+
+    # Filters
+    def scheduled_on(self, date_obj, or_unscheduled=False):
+        # or_unscheduled: the "today" view, the day's tasks followed by unscheduled ones
+        return self._with(date_range=(date_obj, date_obj), unscheduled="also" if or_unscheduled else None)
+
+    def scheduled_between(self, start_date, end_date):
+        if start_date > end_date: start_date, end_date = end_date, start_date
+        return self._with(date_range=(start_date, end_date), unscheduled=None)
+
+    def unscheduled(self):
+        return self._with(date_range=None, unscheduled=True)
+
+    def active(self):
+        return self._with(done=False)
+
+    def done(self, done=True):
+        return self._with(done=done)
+
+    def overdue(self, today=None):
+        return self._with(due=("overdue", 0, today or datetime.date.today()))
+
+    def due_within(self, days, today=None):
+        return self._with(due=("within", days, today or datetime.date.today()))
+
+    def tagged(self, tag):
+        return self._with(tags=self._tags + (tag,))
+
+    def containing(self, text):
+        return self._with(text=text.lower() if text else None)
+
+    def children_of(self, task_id):
+        return self._with(parent_id=task_id)
+
+    def top_level(self):
+        return self._with(parent_id=None)
+
+    def without_occurrences(self):
+        # Leaves out recurring task occurrences that haven't been stored yet
+        return self._with(occurrences=False)
+
+    def order_by(self, field, descending=False):
+        if field not in ORDER_FIELDS: raise ValueError(f"cannot order tasks by '{field}'")
+        return self._with(order=(field, descending))
+
+    def limit(self, count):
+        return self._with(limit=max(0, int(count)))
+
+    # Evaluation
+    def _due_bounds(self):
+        kind, days, today = self._due
+        if kind == "overdue": return None, today.isoformat()
+        return today.isoformat(), (today + datetime.timedelta(days=days + 1)).isoformat()
+
+    def _matches(self, task):
+        if task.recurrence: return False
+        if self._done is not None and task.done != self._done: return False
+        if self._unscheduled is True and task.scheduled_date: return False
+        if self._date_range is not None:
+            if not task.scheduled_date:
+                if self._unscheduled != "also": return False
+            elif not self._date_range[0].isoformat() <= task.scheduled_date <= self._date_range[1].isoformat():
+                return False
+        if self._due:
+            low, high = self._due_bounds()
+            if not task.due_date or task.due_date >= high or (low and task.due_date < low): return False
+        if self._tags and not all(tag in task.tags for tag in self._tags): return False
+        if self._parent_id is not _ANY and task.parent_id != self._parent_id: return False
+        if self._text and self._text not in task.text.lower(): return False
+        return True
+
+    def matches(self, task):
+        # Whether one task passes the filters (limit and order aside), e.g. to see if a changed task joins a listing
+        return self._matches(task)
+
+    def _occurrences_between(self, start_date, end_date):
+        day = start_date
+        while day <= end_date:
+            yield from self._tm.occurrences_on(day)
+            day += datetime.timedelta(days=1)
+
+    def _candidates(self):
+        tm = self._tm
+        by_id = tm._tasks_by_id
+        if self._due and self._done is False:
+            # The deadline index only holds active tasks, already in due date order
+            kind, days, today = self._due
+            ids = tm.deadlines.overdue_ids(today) if kind == "overdue" else tm.deadlines.due_within_ids(days, today)
+            return (by_id[task_id] for task_id in ids)
+        if self._date_range is not None:
+            start_date, end_date = self._date_range
+            dates = ([start_date.isoformat()] if start_date == end_date
+                     else tm.schedule.dates_between(start_date.isoformat(), end_date.isoformat()))
+            sources = [(by_id[task_id] for date_str in dates for task_id in tm.schedule.ids_on(date_str))]
+            if self._occurrences and self._done is not True:
+                sources.append(self._occurrences_between(start_date, end_date))
+            if self._unscheduled == "also":
+                sources.append(by_id[task_id] for task_id in tm.schedule.ids_on(None))
+            return itertools.chain(*sources)
+        if self._unscheduled is True:
+            return (by_id[task_id] for task_id in tm.schedule.ids_on(None))
+        if self._tags:
+            return (by_id[task_id] for task_id in tm.tags.task_ids.get(self._tags[0], ()))
+        if self._parent_id is not _ANY and self._parent_id is not None:
+            return (by_id[task_id] for task_id in tm.subtasks.children_ids(self._parent_id) if task_id in by_id)
+        return iter(tm.tasks)
+
+    def __iter__(self):
+        matches = (task for task in self._candidates() if self._matches(task))
+        if self._order:
+            field, descending = self._order
+            value_of, missing = ORDER_FIELDS[field]
+            # Tasks without the value sort last either way
+            if descending:
+                key = lambda task: (value_of(task) is not None, value_of(task) if value_of(task) is not None else missing)
+                pick = heapq.nlargest
+            else:
+                key = lambda task: (value_of(task) is None, value_of(task) if value_of(task) is not None else missing)
+                pick = heapq.nsmallest
+            if self._limit is not None:
+                return iter(pick(self._limit, matches, key=key))
+            return iter(sorted(matches, key=key, reverse=descending))
+        if self._limit is not None:
+            return itertools.islice(matches, self._limit)
+        return matches
+
+    def first(self):
+        return next(iter(self.limit(1)), None)
+
+    def exists(self):
+        return self.first() is not None
+
+    def count(self):
+        return sum(1 for _ in self)
+
+    def list(self):
+        return list(self)
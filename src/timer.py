@@ -0,0 +1,206 @@
+# HyperPomo/src/timer.py
+# The Pomodoro session state machine shared by the Tk app and the terminal front end.
+# It knows nothing about widgets or after() loops: the front end calls tick() once a second.
+import datetime
+import time
+import uuid
+
+from . import events
+from . import session_log as sl
+from .checkpoint import SessionCheckpoint
+from .day_index import DailyFocus
+
+DURATION_KEYS = {sl.WORK: "work_duration", sl.SHORT_BREAK: "short_break_duration", sl.LONG_BREAK: "long_break_duration"}
+
+class PomodoroTimer:
+    CHECKPOINT_INTERVAL_SECONDS = 15 # While counting down; state changes are written right away
+    CHECKPOINT_MAX_AGE_SECONDS = 12 * 3600 # Older checkpoints are not worth resuming
+
+    WORK = sl.WORK
+    SHORT_BREAK = sl.SHORT_BREAK
+    LONG_BREAK = sl.LONG_BREAK
+
+    def __init__(self, config_manager, task_manager, session_log=None):
+        self.config_manager = config_manager
+        self.task_manager = task_manager
+        self.session_log = session_log if session_log is not None else config_manager.load_session_log()
+        self.daily_focus = DailyFocus() # Focus per day, for the calendar
+        self.session_log_version = 0 # Bumped whenever the log changes other than by log_session appending
+        self.session_log_changed()
+
+        self.current_session_type = self.WORK
+        self.pomodoros_completed_cycle = 0
+        self.is_running = False
+        self.paused = False
+        self.current_task_id = None
+        self.time_left = self.session_duration_seconds()
+        self.checkpoint = SessionCheckpoint(config_manager.get_checkpoint_path())
+        self._last_checkpoint_at = None
+
+    def session_duration_seconds(self, session_type=None):
+        dur_key = DURATION_KEYS.get(session_type or self.current_session_type, "work_duration")
+        return self.config_manager.get(dur_key) * 60
+
+    def start(self):
+        # Starts a fresh session or resumes a paused one. Returns False if already counting down.
+        if self.is_running and self.paused:
+            self.paused = False
+            return True
+        if not self.is_running:
+            self.is_running = True; self.paused = False
+            return True
+        return False
+
+    def pause(self):
+        if self.is_running and not self.paused:
+            self.paused = True
+            return True
+        return False
+
+    def reset(self):
+        self.is_running = False; self.paused = False
+        self.time_left = self.session_duration_seconds()
+
+    def tick(self):
+        # Counts one second down. Returns True once the session has run out.
+        if self.is_running and not self.paused and self.time_left > 0:
+            self.time_left -= 1
+        return self.time_left <= 0
+
+    def save_checkpoint(self, force=False):
+        # Front ends call this on every tick and state change; ticks are only written every few seconds
+        now = time.monotonic()
+        if not force and self._last_checkpoint_at is not None and now - self._last_checkpoint_at < self.CHECKPOINT_INTERVAL_SECONDS:
+            return
+        self._last_checkpoint_at = now
+        self.checkpoint.save(self.current_session_type, self.is_running, self.paused,
+                             self.pomodoros_completed_cycle, self.time_left, self.current_task_id)
+
+    def restore_checkpoint(self):
+        # Picks up a session interrupted by a crash. A session that was counting down comes back paused.
+        state = self.checkpoint.load()
+        if not state or time.time() - state["saved_at"] > self.CHECKPOINT_MAX_AGE_SECONDS:
+            return False
+        self.current_session_type = state["session_type"]
+        self.pomodoros_completed_cycle = state["pomodoros_completed_cycle"]
+        task = self.task_manager.get_task_by_id(state["task_id"]) if state["task_id"] else None
+        self.current_task_id = task.id if task and not task.done else None
+        if state["running"] and 0 < state["time_left"] <= self.session_duration_seconds():
+            self.time_left = state["time_left"]
+            self.is_running = True; self.paused = True
+        else:
+            self.time_left = self.session_duration_seconds()
+            self.is_running = False; self.paused = False
+        return True
+
+    def session_log_changed(self):
+        # Call after entries were merged in from elsewhere; logging here keeps these totals current itself
+        work_duration = self.config_manager.get("work_duration")
+        self.task_manager.tags.rebuild_sessions(self.session_log, work_duration, self.task_manager.get_task_tags)
+        self.daily_focus.rebuild(self.session_log, work_duration)
+        self.session_log_version += 1
+        self.config_manager.events.publish(events.SESSION_LOG_CHANGED)
+
+    def current_task(self):
+        if not self.current_task_id: return None
+        return self.task_manager.get_task_by_id(self.current_task_id)
+
+    def log_session(self, skipped=False):
+        task_text = ""
+        task_tags = []
+        session_for_date_str = datetime.date.today().isoformat()
+
+        if self.current_session_type == self.WORK and self.current_task_id:
+            current_task_obj = self.task_manager.get_task_by_id(self.current_task_id)
+            if current_task_obj:
+                task_text = current_task_obj.text
+                task_tags = list(current_task_obj.tags)
+                if current_task_obj.scheduled_date:
+                    session_for_date_str = current_task_obj.scheduled_date
+
+        session_config_duration = self.config_manager.get(DURATION_KEYS.get(self.current_session_type, "work_duration"))
+
+        actual_duration_minutes = 0.0
+        if skipped:
+            actual_duration_minutes = 0.0
+        elif self.time_left > 0 :
+            completed_seconds = (session_config_duration * 60) - self.time_left
+            actual_duration_minutes = round(completed_seconds / 60.0, 1)
+        else:
+            actual_duration_minutes = float(session_config_duration)
+
+        log_entry = {
+            "id": uuid.uuid4().hex,
+            "timestamp": datetime.datetime.now().isoformat(), "type": self.current_session_type,
+            "duration_minutes": actual_duration_minutes,
+            "task_id": self.current_task_id if self.current_session_type == self.WORK else None,
+            "task_text": task_text if self.current_session_type == self.WORK else None,
+            "skipped": skipped,
+            "session_for_date": session_for_date_str
+        }
+        if task_tags: log_entry["tags"] = task_tags
+        self.session_log.append(log_entry)
+        if self.config_manager.save_session_log(self.session_log, [log_entry]):
+            self.session_log_changed() # Picked up other instances' sessions too
+        else:
+            self.task_manager.tags.add_session(log_entry, self.config_manager.get("work_duration"))
+            self.daily_focus.add(log_entry, self.config_manager.get("work_duration"))
+        self.config_manager.events.publish(events.SESSION_LOGGED, log_entry)
+        return log_entry
+
+    def skip_break(self):
+        # Logs the break as skipped and moves on to the next work session
+        if self.current_session_type == self.WORK: return False
+        self.is_running = False; self.paused = False
+        self.log_session(skipped=True)
+        self.advance(skipped_break=True)
+        return True
+
+    def advance(self, skipped_break=False):
+        # Moves to the next session type after the current one ended (or its break was skipped)
+        pomos_per_long_break = self.config_manager.get("pomodoros_per_long_break")
+        if self.current_session_type == self.WORK:
+            self.pomodoros_completed_cycle += 1
+            if self.current_task_id:
+                self.task_manager.increment_pomodoro_for_task(self.current_task_id)
+
+            if self.pomodoros_completed_cycle % pomos_per_long_break == 0:
+                self.current_session_type = self.LONG_BREAK
+            else:
+                self.current_session_type = self.SHORT_BREAK
+        else:
+            self.current_session_type = self.WORK
+            if skipped_break and self.pomodoros_completed_cycle > 0 and \
+               (self.pomodoros_completed_cycle % pomos_per_long_break == 0):
+                 self.pomodoros_completed_cycle = 0
+        self.time_left = self.session_duration_seconds()
+        self.is_running = False; self.paused = False
+
+    def status(self):
+        # Snapshot of the running state, used by the control socket
+        task = self.current_task()
+        current_cycle_pomos, pomos_per_cycle = self.cycle_progress()
+        return {
+            "session_type": self.current_session_type,
+            "remaining_seconds": int(self.time_left),
+            "running": self.is_running and not self.paused,
+            "paused": self.is_running and self.paused,
+            "task_id": task.id if task else None,
+            "task_text": task.text if task else None,
+            "cycle": current_cycle_pomos, "pomodoros_per_long_break": pomos_per_cycle,
+        }
+
+    def find_task(self, id_or_prefix):
+        # Full id or an unambiguous id prefix (the CLI shows the first 8 characters)
+        task = self.task_manager.get_task_by_id(id_or_prefix)
+        if task or not id_or_prefix: return task
+        matches = [t for t in self.task_manager.tasks if t.id.startswith(id_or_prefix)]
+        return matches[0] if len(matches) == 1 else None
+
+    def cycle_progress(self):
+        # (pomodoros done in the current cycle, pomodoros per cycle) as shown next to the timer
+        pomos_per_cycle = self.config_manager.get("pomodoros_per_long_break")
+        current_cycle_pomos = self.pomodoros_completed_cycle % pomos_per_cycle
+        if self.current_session_type != self.WORK and current_cycle_pomos == 0 and self.pomodoros_completed_cycle > 0:
+             current_cycle_pomos = pomos_per_cycle
+        return current_cycle_pomos, pomos_per_cycle
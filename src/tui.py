@@ -0,0 +1,272 @@
+# HyperPomo/src/tui.py
+# Terminal (curses) front end for machines without a display. Uses the same PomodoroTimer,
+# TaskManager and session log as the Tk app, and never imports tkinter.
+import curses
+import datetime
+import time
+
+from .config_manager import ConfigManager
+from .task_manager import TaskManager
+from .timer import PomodoroTimer
+from .paths import resource_path
+from .control import ControlServer, default_socket_path
+from . import session_log as sl
+
+KEY_HELP = "[s] start/pause  [r] reset  [k] skip break  [t] pick task  [a] add task  [q] quit"
+
+class TerminalApp:
+    def __init__(self, stdscr, config_manager):
+        self.stdscr = stdscr
+        self.config_manager = config_manager
+        self.task_manager = TaskManager(config_manager)
+        self.timer = PomodoroTimer(config_manager, self.task_manager)
+        self.next_tick_at = None # time.monotonic() of the next one-second tick while running
+        self.picking_task = False
+        self.pick_index = 0
+        self.message = ""
+        self.control_server = None
+        self.next_external_check_at = 0.0
+        # What draw() shows below the timer, kept between frames and dropped by _on_data_changed
+        self._today_summary = None # (date string, summarize_entries() of that day)
+        self._visible_tasks = None # (date string, visible_tasks() list)
+        # No scheduler: events arrive as they are published, including from the auto-start path
+        config_manager.events.subscribe(self._on_data_changed)
+        if self.timer.restore_checkpoint() and self.timer.is_running:
+            self.message = "Restored the interrupted session. Press [s] to resume."
+
+    def visible_tasks(self):
+        # Same list the Tk app shows for today: today's tasks followed by unscheduled active ones
+        today = datetime.date.today()
+        if self._visible_tasks is None or self._visible_tasks[0] != today:
+            self._visible_tasks = (today, self.task_manager.query().active().scheduled_on(today, or_unscheduled=True).list())
+        return self._visible_tasks[1]
+
+    def today_summary(self):
+        today_str = datetime.date.today().isoformat()
+        if self._today_summary is None or self._today_summary[0] != today_str:
+            entries = sl.entries_for_date(self.timer.session_log, today_str)
+            self._today_summary = (today_str, sl.summarize_entries(entries, self.config_manager.get("work_duration")))
+        return self._today_summary[1]
+
+    def _on_data_changed(self, changes):
+        if changes.tasks_changed(): self._visible_tasks = None
+        if changes.session_log_changed or "work_duration" in changes.settings:
+            self._today_summary = None
+        elif self._today_summary is not None:
+            # A newly logged session only adds to today's totals
+            date_str, summary = self._today_summary
+            for entry in changes.sessions:
+                if entry.get("session_for_date") != date_str: continue
+                added = sl.summarize_entries([entry], self.config_manager.get("work_duration"))
+                for key in summary: summary[key] += added[key]
+
+    def run(self):
+        curses.curs_set(0)
+        self.stdscr.timeout(250) # getch() returns -1 after 250 ms so the clock keeps moving
+        self._start_control_server()
+        try:
+            self._loop()
+        finally:
+            if self.control_server: self.control_server.close()
+        self.task_manager.compact()
+        self.config_manager.compact_session_log(self.timer.session_log)
+        self.timer.checkpoint.clear()
+
+    def _loop(self):
+        while True:
+            if self.control_server: self.control_server.poll()
+            self._check_external_changes()
+            self._advance_clock()
+            self.draw()
+            key = self.stdscr.getch()
+            if key == -1: continue
+            if self.picking_task:
+                self._handle_pick_key(key)
+            elif not self._handle_key(key):
+                break
+
+    def _check_external_changes(self):
+        # Another instance (or the Tk app) may share the data dir; a few stat() calls every 2 s
+        now = time.monotonic()
+        if now < self.next_external_check_at: return
+        self.next_external_check_at = now + 2
+        self.config_manager.reload_settings()
+        self.task_manager.reload_external_changes()
+        if self.config_manager.reload_session_log(self.timer.session_log):
+            self.timer.session_log_changed()
+
+    def _start_control_server(self):
+        if not self.config_manager.get("control_socket_enabled"): return
+        path = self.config_manager.get("control_socket_path") or default_socket_path(self.config_manager.data_dir)
+        server = ControlServer(path, {
+            "status": lambda arg: self.timer.status(),
+            "start": lambda arg: self._control(self.timer.start, "timer is already running"),
+            "pause": lambda arg: self._control(self.timer.pause, "timer is not running"),
+            "reset": lambda arg: self._control(lambda: self.timer.reset() or True, ""),
+            "skip": lambda arg: self._control(self.timer.skip_break, "only breaks can be skipped"),
+            "set-task": self._control_set_task,
+        })
+        if server.start(): self.control_server = server
+
+    def _control(self, action, error):
+        if not action(): raise ValueError(error)
+        self._on_timer_event("state")
+        return self.timer.status()
+
+    def _control_set_task(self, arg):
+        task = self.timer.find_task(arg)
+        if not task: raise ValueError(f"no task matches '{arg}'")
+        if task.done: raise ValueError("task is already completed")
+        self.timer.current_task_id = task.id
+        self._on_timer_event("state")
+        return self.timer.status()
+
+    def _on_timer_event(self, event_name):
+        # Every tick, transition and state change passes through here
+        self.timer.save_checkpoint(force=event_name != "tick")
+        if self.control_server and self.control_server.subscriber_count:
+            self.control_server.publish(event_name, self.timer.status())
+
+    def _advance_clock(self):
+        if not (self.timer.is_running and not self.timer.paused):
+            self.next_tick_at = None
+            return
+        now = time.monotonic()
+        if self.next_tick_at is None:
+            self.next_tick_at = now + 1
+        while self.next_tick_at is not None and now >= self.next_tick_at:
+            self.next_tick_at += 1
+            finished = self.timer.tick()
+            self._on_timer_event("tick")
+            if finished:
+                self._finish_session()
+
+    def _finish_session(self):
+        finished_type = self.timer.current_session_type
+        self.timer.is_running = False
+        self.timer.log_session()
+        self.timer.advance()
+        self._on_timer_event("transition")
+        self.next_tick_at = None
+        self.message = f"{finished_type} finished. Next: {self.timer.current_session_type}"
+        try: curses.beep()
+        except curses.error: pass
+        if self.config_manager.get("auto_start_next_session"):
+            self.timer.start()
+            self._on_timer_event("state")
+
+    def _handle_key(self, key):
+        if key in (ord('q'), ord('Q')):
+            if self.timer.is_running and not self.timer.paused and not self._confirm("Timer is running. Quit anyway? (y/n)"):
+                return True
+            return False
+        if key in (ord('s'), ord('S'), ord(' ')):
+            if self.timer.is_running and not self.timer.paused:
+                self.timer.pause(); self.message = "Paused."
+            else:
+                self.timer.start(); self.message = ""
+            self._on_timer_event("state")
+        elif key in (ord('r'), ord('R')):
+            self.timer.reset(); self.message = "Session reset."
+            self._on_timer_event("state")
+        elif key in (ord('k'), ord('K')):
+            if self.timer.skip_break():
+                self.message = "Break skipped."
+                self._on_timer_event("transition")
+            else: self.message = "Only breaks can be skipped."
+        elif key in (ord('t'), ord('T')):
+            if self.visible_tasks():
+                self.picking_task = True; self.pick_index = 0
+            else:
+                self.message = "No active tasks for today. Press [a] to add one."
+        elif key in (ord('a'), ord('A')):
+            text = self._prompt("New task: ")
+            if text:
+                task = self.task_manager.add_task(text, 1, scheduled_date=datetime.date.today())
+                if task: self.message = f"Added: {task.text}"
+        return True
+
+    def _handle_pick_key(self, key):
+        tasks = self.visible_tasks()
+        if key in (curses.KEY_UP, ord('k')):
+            self.pick_index = max(0, self.pick_index - 1)
+        elif key in (curses.KEY_DOWN, ord('j')):
+            self.pick_index = min(len(tasks) - 1, self.pick_index + 1)
+        elif key in (curses.KEY_ENTER, 10, 13):
+            if tasks:
+                task = tasks[min(self.pick_index, len(tasks) - 1)]
+                self.timer.current_task_id = task.id
+                self.message = f"Working on: {task.text}"
+                self._on_timer_event("state")
+            self.picking_task = False
+        elif key in (27, ord('q')): # Esc
+            self.picking_task = False
+
+    def _prompt(self, label):
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.timeout(-1)
+        curses.echo(); curses.curs_set(1)
+        try:
+            self.stdscr.move(height - 1, 0); self.stdscr.clrtoeol()
+            self.stdscr.addstr(height - 1, 0, label[:width - 1])
+            text = self.stdscr.getstr(height - 1, min(len(label), width - 1), 200).decode("utf-8", "replace")
+        finally:
+            curses.noecho(); curses.curs_set(0)
+            self.stdscr.timeout(250)
+        return text.strip()
+
+    def _confirm(self, question):
+        self.message = question
+        self.draw()
+        self.stdscr.timeout(-1)
+        key = self.stdscr.getch()
+        self.stdscr.timeout(250)
+        self.message = ""
+        return key in (ord('y'), ord('Y'))
+
+    def _addline(self, row, text, attr=0):
+        height, width = self.stdscr.getmaxyx()
+        if 0 <= row < height:
+            try: self.stdscr.addstr(row, 0, text[:width - 1], attr)
+            except curses.error: pass # Writing to the bottom-right cell raises; nothing lost
+        return row + 1
+
+    def draw(self):
+        self.stdscr.erase()
+        timer = self.timer
+        minutes, seconds = divmod(timer.time_left, 60)
+        state = "running" if timer.is_running and not timer.paused else ("paused" if timer.is_running else "stopped")
+        current_cycle_pomos, pomos_per_cycle = timer.cycle_progress()
+        task = timer.current_task()
+
+        row = self._addline(0, f"HyperPomo  {timer.current_session_type}  {int(minutes):02d}:{int(seconds):02d}  ({state})", curses.A_BOLD)
+        row = self._addline(row, f"Cycle: {current_cycle_pomos} / {pomos_per_cycle}    Current Task: {task.text if task else 'None'}")
+        row = self._addline(row, KEY_HELP, curses.A_DIM)
+        row += 1
+
+        today_str = datetime.date.today().isoformat()
+        summary = self.today_summary()
+        row = self._addline(row, f"--- Today ({today_str}) ---", curses.A_BOLD)
+        row = self._addline(row, f"Pomodoros: {summary['pomodoros']}   Focus: {sl.format_minutes(summary['focus_minutes'])}   Breaks: {sl.format_minutes(summary['break_minutes'])}")
+        row += 1
+
+        row = self._addline(row, "--- Tasks (Enter to select, Esc to cancel) ---" if self.picking_task else "--- Tasks ---", curses.A_BOLD)
+        height, _ = self.stdscr.getmaxyx()
+        tasks = self.visible_tasks()
+        for index, listed_task in enumerate(tasks[:max(0, height - row - 2)]):
+            marker = ">" if self.picking_task and index == self.pick_index else ("*" if listed_task.id == timer.current_task_id else " ")
+            attr = curses.A_REVERSE if self.picking_task and index == self.pick_index else 0
+            row = self._addline(row, f"{marker} {listed_task.completed_pomodoros}/{listed_task.estimated_pomodoros}  {listed_task.text}", attr)
+        if not tasks:
+            row = self._addline(row, "  No active tasks for today.")
+
+        if self.message:
+            self._addline(height - 1, self.message)
+        self.stdscr.refresh()
+
+def run(config_manager=None):
+    config_manager = config_manager or ConfigManager(data_dir=resource_path("data"))
+    curses.wrapper(lambda stdscr: TerminalApp(stdscr, config_manager).run())
+
+if __name__ == "__main__":
+    run()